@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Замер накладных расходов Python на построение запросов
+    DynamicBaseQuery с кэшем скомпилированных шаблонов и без него.
+    Подключение к базе не требуется: запросы не выполняются.
+    Значения Pg* создаются заранее, чтобы замер отражал только
+    построение текста запроса.
+
+    python benchmarks/bench_query_templates.py [число вызовов]
+"""
+import os
+import sys
+import timeit
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from caches import LRUCache
+from query_models import DynamicBaseQuery
+from translators import PgInt4, PgString
+
+
+class NullConnection(object):
+    """ Подключение, не выполняющее запросы """
+    def run_query(self, query, params=None):
+        return []
+
+
+ITEMS = ['id', 'client', 'state', 'total', 'discount', 'created', 'updated',
+         'comment']
+CONDITIONS = {'client': ('=', PgInt4(42)), 'state': ('=', PgString('new')),
+              'total': ('>', PgInt4(100)), 'discount': ('IS', 'NULL'),
+              'comment': ('LIKE', "'%urgent%'")}
+STATE = ('state', PgString('paid'))
+ID = ('=', PgInt4(7))
+
+
+def calls(model):
+    model.make_select('orders', 'shop', items=ITEMS,
+                      orders=['-created', 'id'], conditions=CONDITIONS)
+    model.make_update('orders', 'shop', STATE, id=ID)
+    model.make_delete('orders', 'shop', id=ID)
+
+
+def measure(templates, bind_params, number):
+    model = DynamicBaseQuery(NullConnection())
+    model.templates = templates
+    model.bind_params = bind_params
+    best = min(timeit.repeat(lambda: calls(model), number=number, repeat=5))
+    return best / number / 3 * 1e6
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for bind_params in (False, True):
+        before = measure(None, bind_params, number)
+        after = measure(LRUCache(512), bind_params, number)
+        print "bind_params=%-5s  без кэша: %6.2f мкс  с кэшем: %6.2f мкс  " \
+              "(x%.2f)" % (bind_params, before, after, before / after)
+
+
+if __name__ == '__main__':
+    main()
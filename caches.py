@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Ограниченные кэши с вытеснением по давности использования
+"""
+import threading
+import time
+
+# Признак отсутствия значения в кэше
+MISSING = object()
+
+
+class LRUCache(object):
+    """ Потокобезопасный кэш ограниченного размера.
+        При переполнении вытесняется запись, которая дольше всех
+        не запрашивалась. Порядок использования хранится в кольцевом
+        двусвязном списке звеньев [предыдущее, следующее, ключ, значение]
+    """
+    def __init__(self, size=512):
+        """ Конструктор класса
+            :param size: наибольшее число записей
+        """
+        self.size = size
+        self.__data = {}
+        self.__root = []
+        self.__root[:] = [self.__root, self.__root, None, None]
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        """ Получение значения по ключу
+            :param key: ключ
+            :param default: значение при отсутствии ключа
+        """
+        with self.__lock:
+            link = self.__data.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            prev, after = link[0], link[1]
+            prev[1] = after
+            after[0] = prev
+            root = self.__root
+            last = root[0]
+            last[1] = root[0] = link
+            link[0] = last
+            link[1] = root
+            return link[3]
+
+    def put(self, key, value):
+        """ Сохранение значения
+            :param key: ключ
+            :param value: значение
+        """
+        with self.__lock:
+            self.__unlink(key)
+            root = self.__root
+            last = root[0]
+            link = [last, root, key, value]
+            last[1] = root[0] = self.__data[key] = link
+            while len(self.__data) > self.size:
+                self.__unlink(root[1][2])
+                self.evictions += 1
+
+    def __unlink(self, key):
+        """ Исключение звена из списка (вызывается под блокировкой) """
+        link = self.__data.pop(key, None)
+        if link is None:
+            return MISSING
+        prev, after = link[0], link[1]
+        prev[1] = after
+        after[0] = prev
+        return link[3]
+
+    def pop(self, key, default=None):
+        """ Удаление записи из кэша """
+        with self.__lock:
+            value = self.__unlink(key)
+            return default if value is MISSING else value
+
+    def clear(self):
+        """ Очистка кэша """
+        with self.__lock:
+            self.__data.clear()
+            self.__root[:] = [self.__root, self.__root, None, None]
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
+
+    def hit_rate(self):
+        """ Доля попаданий среди всех обращений """
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def stats(self):
+        """ Счетчики попаданий, промахов и вытеснений """
+        return {'size': len(self.__data), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hit_rate()}
+
+
+class TTLCache(object):
+    """ Потокобезопасный кэш с ограниченным временем жизни записей
+        и вытеснением по давности использования. При промахе значение
+        вычисляется одним потоком, остальные потоки, запросившие тот же
+        ключ, дожидаются его результата
+    """
+    def __init__(self, size=512, ttl=60, clock=time.time):
+        """ Конструктор класса
+            :param size: наибольшее число записей
+            :param ttl: время жизни записи (секунд)
+            :param clock: функция текущего времени
+        """
+        self.ttl = ttl
+        self.__clock = clock
+        self.__entries = LRUCache(size)
+        # Вычисляемые значения {ключ: [событие, значение, исключение, метки]}
+        self.__loading = {}
+        # Ключи записей по меткам, счетчики сброса меток и очистки кэша
+        self.__tagged = {}
+        self.__versions = {}
+        self.__generation = 0
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def load(self, key, loader, tags=()):
+        """ Значение из кэша; при отсутствии или устаревании записи
+            значение вычисляется функцией loader и сохраняется
+            :param key: ключ
+            :param loader: функция без аргументов, вычисляющая значение
+            :param tags: метки записи для сброса методом invalidate
+        """
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is not None and entry[0] > self.__clock():
+                self.hits += 1
+                return entry[1]
+            waiter = self.__loading.get(key)
+            owner = waiter is None
+            if owner:
+                waiter = self.__loading[key] = [threading.Event(), None, None,
+                                                tags]
+                versions = [self.__generation] + \
+                    [self.__versions.get(i, 0) for i in tags]
+                self.misses += 1
+            else:
+                self.waits += 1
+
+        if not owner:
+            waiter[0].wait()
+            if waiter[2] is not None:
+                raise waiter[2]
+            return waiter[1]
+
+        try:
+            waiter[1] = loader()
+            with self.__lock:
+                # значение, вычисленное до удаления записи, сброса меток
+                # или очистки кэша, не сохраняется
+                if self.__loading.get(key) is waiter and \
+                        versions == [self.__generation] + \
+                        [self.__versions.get(i, 0) for i in tags]:
+                    self.__store(key, waiter[1], tags)
+            return waiter[1]
+        except Exception as err:
+            waiter[2] = err
+            raise
+        finally:
+            with self.__lock:
+                if self.__loading.get(key) is waiter:
+                    del self.__loading[key]
+            waiter[0].set()
+
+    def __store(self, key, value, tags):
+        """ Сохранение записи (вызывается под блокировкой) """
+        self.__entries.put(key, (self.__clock() + self.ttl, value, tags))
+        for tag in tags:
+            keys = self.__tagged.setdefault(tag, set())
+            keys.add(key)
+            if len(keys) > self.__entries.size:
+                # ключи вытесненных записей
+                keys.intersection_update(
+                    [i for i in keys if i in self.__entries])
+
+    def invalidate(self, tag):
+        """ Сброс всех записей с заданной меткой. Значения с этой меткой,
+            вычисляемые в момент сброса, не сохраняются, а новые запросы
+            не дожидаются их вычисления
+            :param tag: метка
+        """
+        with self.__lock:
+            self.__versions[tag] = self.__versions.get(tag, 0) + 1
+            for key in self.__tagged.pop(tag, ()):
+                self.__entries.pop(key)
+            for key, waiter in self.__loading.items():
+                if tag in waiter[3]:
+                    del self.__loading[key]
+
+    def pop(self, key, default=None):
+        """ Удаление записи из кэша. Значение ключа, вычисляемое в момент
+            удаления, не сохраняется
+        """
+        with self.__lock:
+            self.__loading.pop(key, None)
+            entry = self.__entries.pop(key)
+            if entry is None:
+                return default
+            for tag in entry[2]:
+                keys = self.__tagged.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.__tagged[tag]
+            return entry[1]
+
+    def clear(self):
+        """ Очистка кэша. Значения, вычисляемые в момент очистки,
+            не сохраняются, а новые запросы не дожидаются их вычисления
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.clear()
+            self.__tagged.clear()
+            self.__loading.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        entry = self.__entries.get(key, None)
+        return entry is not None and entry[0] > self.__clock()
+
+    def hit_rate(self):
+        """ Доля попаданий среди всех обращений """
+        total = self.hits + self.misses + self.waits
+        return float(self.hits + self.waits) / total if total else 0.0
+
+    def stats(self):
+        """ Счетчики попаданий, промахов, ожиданий и вытеснений """
+        return {'size': len(self.__entries), 'hits': self.hits,
+                'misses': self.misses, 'waits': self.waits,
+                'evictions': self.__entries.evictions,
+                'hit_rate': self.hit_rate()}
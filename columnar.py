@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Представление выборки по колонкам
+"""
+import array
+import datetime
+from collections import OrderedDict
+from decimal import Decimal
+from operator import itemgetter
+
+from content import ResultSet
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
+EPOCH = datetime.datetime(1970, 1, 1)
+NAN = float('nan')
+
+
+def transpose(result):
+    """ Разворот выборки по колонкам
+        :param result: результат выполнения запроса
+        :return: словарь {имя колонки: список значений}
+    """
+    if isinstance(result, ResultSet):
+        names, rows = result.columns, result.rows
+    else:
+        rows = [r.to_tuple() for r in result or ()]
+        names = result[0].columns if rows else ()
+
+    return OrderedDict((name, map(itemgetter(index), rows))
+                       for index, name in enumerate(names))
+
+
+def _kind(column):
+    """ Тип колонки по первому непустому значению и наличие NULL """
+    sample = None
+    for value in column:
+        if value is not None:
+            sample = value
+            break
+    has_null = None in column
+
+    if isinstance(sample, bool):
+        return 'bool', has_null
+    if isinstance(sample, (int, long)):
+        return 'int', has_null
+    if isinstance(sample, (float, Decimal)):
+        return 'float', has_null
+    if isinstance(sample, datetime.datetime):
+        return ('datetime' if sample.tzinfo is None else None), has_null
+    if isinstance(sample, datetime.date):
+        return 'date', has_null
+    return None, has_null
+
+
+def _numpy_array(column):
+    """ Колонка в виде массива NumPy """
+    kind, has_null = _kind(column)
+    try:
+        if kind == 'bool' and not has_null:
+            return numpy.array(column, dtype=numpy.bool_)
+        if kind == 'int' and not has_null:
+            return numpy.array(column, dtype=numpy.int64)
+        if kind in ('int', 'float'):
+            return numpy.array(column, dtype=numpy.float64)
+        if kind == 'date':
+            return numpy.array(column, dtype='datetime64[D]')
+        if kind == 'datetime':
+            return numpy.array(column, dtype='datetime64[us]')
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return numpy.array(column, dtype=object)
+
+
+def _std_array(column):
+    """ Колонка в виде array.array (без NumPy). Даты передаются числом
+        дней, метки времени - числом микросекунд от 1970-01-01
+    """
+    kind, has_null = _kind(column)
+    try:
+        if kind in ('bool', 'int') and not has_null:
+            return array.array('l', column)
+        if kind in ('int', 'float'):
+            return array.array('d', [NAN if i is None else i
+                                     for i in column])
+        if kind == 'date' and not has_null:
+            return array.array('l', [(i - EPOCH_DATE).days for i in column])
+        if kind == 'datetime' and not has_null:
+            delta = [i - EPOCH for i in column]
+            return array.array('l', [(i.days * 86400 + i.seconds) * 1000000
+                                     + i.microseconds for i in delta])
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return column
+
+
+def to_arrays(result):
+    """ Разворот выборки по колонкам с преобразованием каждой колонки
+        в непрерывный массив: numpy.ndarray при наличии NumPy,
+        иначе array.array. Колонки прочих типов остаются списками
+        (массивами object для NumPy)
+        :param result: результат выполнения запроса
+        :return: словарь {имя колонки: массив значений}
+    """
+    convert = _std_array if numpy is None else _numpy_array
+    columns = transpose(result)
+    for name, column in columns.items():
+        columns[name] = convert(column)
+    return columns
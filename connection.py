@@ -3,10 +3,15 @@
     Анти-ORM пакет для работы с базами данных PostgreSQL
     Классы подключения к хранилищу данных и управления транзакциями
 """
+import re
 import threading
+import time
+import weakref
 
 import content
+from transaction import Transaction
 from custom_errors import ConnectionError, RunQueryError
+from metrics import add_wait
 
 if content.MARKER is None:
     raise ConnectionError(type=0).\
@@ -16,6 +21,31 @@ if content.MARKER is None:
 Connection = content.MARKER
 
 
+# Типы подключения, порождаемые фабрикой Capstone
+SHARED = 0
+INSTANCE = 1
+POOL = 2
+LOCAL = 3
+
+# Запросы, не изменяющие данных: выполнение их на основном сервере
+# не считается записью (EXPLAIN ANALYZE выполняет запрос и считается)
+READ_ONLY = re.compile(r"\s*(?:SELECT|SHOW|EXPLAIN(?![^;]*\bANALYZE\b))\b",
+                       re.I)
+
+# Способы выбора реплики для чтения
+ROUND_ROBIN = 0
+LEAST_BUSY = 1
+
+
+def register_type(translator, *types):
+    """ Регистрация класса трансформации Ptn* как преобразователя типов
+        выбранного драйвера
+        :param translator: класс трансформации Ptn*
+        :param types: OID или имена типов PostgreSQL
+    """
+    Connection.register_type(translator, *types)
+
+
 class ConnectionClass(object):
     """ Реализация разделяемого подключения к базе данных """
     __counter = 0
@@ -57,6 +87,11 @@ class ConnectionClass(object):
             когда счетчик подключений равен 1 (наш объект - последний)
         """
 
+    @property
+    def is_opened(self):
+        """ Признак открытой транзакции на разделяемом соединении """
+        return bool(self.db_conn and self.db_conn.is_opened)
+
     def __init__(self, *args):
         """ Открытие подключения, если оно еще не открыто,
             и увеличение числа подключений
@@ -76,17 +111,20 @@ class ConnectionClass(object):
                 self.db_conn.disconnect()
                 self.db_conn = None
 
-    def run_query(self, query_string):
+    def run_query(self, query_string, params=None):
         """ Выполнение SQL запроса
             :param query_string: строка запроса
+            :param params: параметры запроса, передаваемые драйверу
         """
         err, res = None, None
         if self.db_conn:
+            started = time.time()
             with self.locker:
+                add_wait(time.time() - started)
                 try:
-                    res = self.db_conn.run_query(query_string)
+                    res = self.db_conn.run_query(query_string, params)
                 except Exception as exc:
-                    err = RunQueryError(exc.args, type=1).\
+                    err = RunQueryError(exc.args, type=1, cause=exc).\
                         describe(u"Ошибка выполнения запроса")
             if err:
                 raise err
@@ -94,6 +132,67 @@ class ConnectionClass(object):
 
         raise ConnectionError(type=1).describe(u"Соединение не открыто")
 
+    def run_prepared(self, query_string, params=None):
+        """ Выполнение запроса подготовленным оператором
+            :param query_string: строка запроса
+            :param params: параметры запроса
+        """
+        if not self.db_conn:
+            raise ConnectionError(type=1).describe(u"Соединение не открыто")
+
+        started = time.time()
+        with self.locker:
+            add_wait(time.time() - started)
+            return self.db_conn.run_prepared(query_string, params)
+
+    def copy_in(self, query_string, stream, size=65536):
+        """ Загрузка данных командой COPY ... FROM STDIN
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект с данными
+            :param size: размер порции чтения
+        """
+        if not self.db_conn:
+            raise ConnectionError(type=1).describe(u"Соединение не открыто")
+
+        with self.locker:
+            return self.db_conn.copy_in(query_string, stream, size)
+
+    def copy_out(self, query_string, stream, size=65536):
+        """ Выгрузка данных командой COPY ... TO STDOUT
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект для записи данных
+            :param size: размер порции
+        """
+        if not self.db_conn:
+            raise ConnectionError(type=1).describe(u"Соединение не открыто")
+
+        with self.locker:
+            return self.db_conn.copy_out(query_string, stream, size)
+
+    def stream_query(self, query_string, fetch_size=1000, params=None):
+        """ Построчная выборка через курсор на стороне сервера.
+            Разделяемое соединение блокируется на время получения
+            очередной строки, но не между строками
+            :param query_string: строка запроса
+            :param fetch_size: размер порции
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        if not self.db_conn:
+            raise ConnectionError(type=1).describe(u"Соединение не открыто")
+
+        rows = self.db_conn.stream_query(query_string, fetch_size, params)
+        try:
+            while True:
+                with self.locker:
+                    try:
+                        row = next(rows)
+                    except StopIteration:
+                        return
+                yield row
+        finally:
+            with self.locker:
+                rows.close()
+
 
 class ConnectionInstance(Connection):
     """ Реализация отдельного подключения на уровне экземпляра класса """
@@ -106,20 +205,700 @@ class ConnectionInstance(Connection):
         self.disconnect()
 
 
+class ConnectionPool(object):
+    """ Ограниченный пул подключений к базе данных """
+    def __init__(self, db_name, user, password, host, port, min_size=1,
+                 max_size=10, timeout=None, idle_timeout=300):
+        """ Конструктор класса
+            :param db_name: наименование базы данных
+            :param user: имя пользователя
+            :param password: пароль
+            :param host: хост
+            :param port: номер порта
+            :param min_size: число постоянно открытых подключений
+            :param max_size: предельное число подключений
+            :param timeout: время ожидания свободного подключения (секунды),
+                None - ждать без ограничений
+            :param idle_timeout: время простоя (секунды), по истечении
+                которого подключения сверх min_size закрываются
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ConnectionError(type=4).\
+                describe(u"Неверно заданы размеры пула подключений")
+
+        self.__args = (db_name, user, password, host, port)
+        self.__min_size = min_size
+        self.__max_size = max_size
+        self.__timeout = timeout
+        self.__idle_timeout = idle_timeout
+
+        self.__cond = threading.Condition(threading.Lock())
+        # свободные подключения в порядке возврата: [(подключение, время)]
+        self.__idle = []
+        self.__size = 0
+
+        for _ in range(min_size):
+            self.__idle.append((self.__open(), time.time()))
+            self.__size += 1
+
+    def __open(self):
+        """ Открытие нового подключения """
+        try:
+            conn = Connection(*self.__args)
+            conn.connect()
+        except Exception as err:
+            raise ConnectionError(*err.args, type=2).\
+                describe(u"Не удалось открыть соединение")
+        return conn
+
+    def __reap(self):
+        """ Отбор простаивающих подключений сверх минимального размера пула.
+            Вызывается под блокировкой, возвращает подключения на закрытие
+        """
+        if self.__idle_timeout is None:
+            return []
+
+        expired = []
+        border = time.time() - self.__idle_timeout
+        while self.__idle and self.__size > self.__min_size \
+                and self.__idle[0][1] < border:
+            expired.append(self.__idle.pop(0)[0])
+            self.__size -= 1
+        return expired
+
+    @staticmethod
+    def __close(connections):
+        for conn in connections:
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
+
+    def acquire(self):
+        """ Получение подключения из пула. Если свободных подключений нет
+            и пул заполнен, ожидаем возврата подключения не дольше timeout
+        """
+        deadline = None
+        if self.__timeout is not None:
+            deadline = time.time() + self.__timeout
+
+        with self.__cond:
+            expired = self.__reap()
+            while not self.__idle and self.__size >= self.__max_size:
+                if deadline is None:
+                    self.__cond.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.__close(expired)
+                    raise ConnectionError(type=3).\
+                        describe(u"Истекло время ожидания подключения")
+                self.__cond.wait(remaining)
+
+            conn = self.__idle.pop()[0] if self.__idle else None
+            if conn is None:
+                self.__size += 1
+        self.__close(expired)
+
+        if conn is None:
+            try:
+                conn = self.__open()
+            except ConnectionError:
+                with self.__cond:
+                    self.__size -= 1
+                    self.__cond.notify()
+                raise
+        return conn
+
+    def release(self, conn, discard=False):
+        """ Возврат подключения в пул
+            :param conn: подключение, полученное методом acquire
+            :param discard: закрыть подключение вместо возврата в пул
+        """
+        with self.__cond:
+            if discard:
+                self.__size -= 1
+            else:
+                self.__idle.append((conn, time.time()))
+            expired = self.__reap()
+            self.__cond.notify()
+
+        if discard:
+            expired.append(conn)
+        self.__close(expired)
+
+    def close(self):
+        """ Закрытие всех свободных подключений пула """
+        with self.__cond:
+            expired = [conn for conn, _ in self.__idle]
+            self.__size -= len(expired)
+            self.__idle = []
+        self.__close(expired)
+
+    @property
+    def size(self):
+        """ Число открытых подключений """
+        return self.__size
+
+    @property
+    def idle(self):
+        """ Число свободных подключений """
+        return len(self.__idle)
+
+
+class ConnectionPooled(Transaction):
+    """ Подключение, использующее пул. На время выполнения запроса
+        подключение берется из пула и сразу возвращается. Внутри транзакции
+        подключение закрепляется за объектом до commit или rollback
+    """
+    pool = None
+    # Подключение допускает одновременные запросы из разных потоков
+    concurrent = True
+
+    def __init__(self, *_):
+        super(ConnectionPooled, self).__init__()
+        self.__pinned = None
+
+    def __del__(self):
+        """ Незавершенная транзакция откатывается,
+            подключение возвращается в пул
+        """
+        if self.__pinned is not None:
+            try:
+                self.__pinned.run_query("rollback")
+            except Exception:
+                self.pool.release(self.__pinned, True)
+            else:
+                self.pool.release(self.__pinned)
+            self.__pinned = None
+
+    def disconnect(self):
+        """ Подключения пула закрываются самим пулом """
+
+    def __call(self, method, *args):
+        """ Вызов метода подключения: закрепленного за транзакцией
+            либо взятого из пула на время вызова. После ошибки драйвера
+            или подключения подключение закрывается, а не возвращается
+            в пул: его состояние неизвестно
+        """
+        if self.__pinned is not None:
+            return getattr(self.__pinned, method)(*args)
+
+        started = time.time()
+        conn = self.pool.acquire()
+        add_wait(time.time() - started)
+        discard = False
+        try:
+            return getattr(conn, method)(*args)
+        except (ConnectionError, RunQueryError):
+            discard = True
+            raise
+        finally:
+            self.pool.release(conn, discard)
+
+    def run_query(self, query_string, params=None):
+        """ Выполнение SQL запроса
+            :param query_string: строка запроса
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        return self.__call('run_query', query_string, params)
+
+    def run_prepared(self, query_string, params=None):
+        """ Выполнение запроса подготовленным оператором
+            :param query_string: строка запроса
+            :param params: параметры запроса
+        """
+        return self.__call('run_prepared', query_string, params)
+
+    def copy_in(self, query_string, stream, size=65536):
+        """ Загрузка данных командой COPY ... FROM STDIN
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект с данными
+            :param size: размер порции чтения
+        """
+        return self.__call('copy_in', query_string, stream, size)
+
+    def copy_out(self, query_string, stream, size=65536):
+        """ Выгрузка данных командой COPY ... TO STDOUT
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект для записи данных
+            :param size: размер порции
+        """
+        return self.__call('copy_out', query_string, stream, size)
+
+    def stream_query(self, query_string, fetch_size=1000, params=None):
+        """ Построчная выборка через курсор на стороне сервера.
+            Подключение из пула удерживается до окончания выборки
+            и используется только ею: курсор работает в транзакции этого
+            подключения, которая подтверждается по окончании выборки
+            :param query_string: строка запроса
+            :param fetch_size: размер порции
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        conn = self.__pinned
+        if conn is not None:
+            for row in conn.stream_query(query_string, fetch_size, params):
+                yield row
+            return
+
+        conn = self.pool.acquire()
+        discard = False
+        try:
+            conn.begin()
+            for row in conn.stream_query(query_string, fetch_size, params):
+                yield row
+            conn.commit()
+        finally:
+            if conn.is_opened:
+                try:
+                    conn.rollback()
+                except StandardError:
+                    discard = True
+            self.pool.release(conn, discard)
+
+    def begin(self):
+        """ Открытие транзакции с закреплением подключения """
+        if self.is_opened:
+            return super(ConnectionPooled, self).begin()
+
+        self.__pinned = self.pool.acquire()
+        try:
+            super(ConnectionPooled, self).begin()
+        except Exception:
+            self.pool.release(self.__pinned, True)
+            self.__pinned = None
+            raise
+
+    def commit(self):
+        """ Подтверждение транзакции и возврат подключения в пул """
+        super(ConnectionPooled, self).commit()
+        self.__unpin()
+
+    def rollback(self):
+        """ Откат транзакции и возврат подключения в пул """
+        super(ConnectionPooled, self).rollback()
+        self.__unpin()
+
+    def __unpin(self):
+        conn, self.__pinned = self.__pinned, None
+        if conn is not None:
+            self.pool.release(conn)
+
+
+class ThreadConnections(object):
+    """ Реестр подключений, открываемых отдельно для каждого потока.
+        Подключение открывается при первом запросе из потока
+        и закрывается при завершении потока
+    """
+    def __init__(self, db_name, user, password, host, port):
+        self.__args = (db_name, user, password, host, port)
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__opened = 0
+
+    def connection(self):
+        """ Подключение текущего потока """
+        holder = getattr(self.__local, 'holder', None)
+        if holder is None:
+            try:
+                conn = Connection(*self.__args)
+                conn.connect()
+            except Exception as err:
+                raise ConnectionError(*err.args, type=2).\
+                    describe(u"Не удалось открыть соединение")
+
+            holder = _ThreadConnection(conn, weakref.ref(self))
+            self.__local.holder = holder
+            with self.__lock:
+                self.__opened += 1
+        return holder.conn
+
+    def close(self):
+        """ Закрытие подключения текущего потока """
+        holder = getattr(self.__local, 'holder', None)
+        if holder is not None:
+            del self.__local.holder
+            holder.close()
+
+    def _forget(self):
+        """ Уменьшение счетчика при закрытии подключения потока """
+        with self.__lock:
+            self.__opened -= 1
+
+    @property
+    def opened(self):
+        """ Число открытых подключений """
+        return self.__opened
+
+
+class _ThreadConnection(object):
+    """ Подключение потока. Хранится в локальных данных потока
+        и закрывается при их уничтожении (завершении потока)
+    """
+    def __init__(self, conn, registry):
+        self.conn = conn
+        self.__registry = registry
+
+    def close(self):
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+        try:
+            conn.disconnect()
+        finally:
+            registry = self.__registry()
+            if registry is not None:
+                registry._forget()
+
+    def __del__(self):
+        self.close()
+
+
+class ConnectionLocal(object):
+    """ Подключение, использующее отдельное соединение каждого потока """
+    threads = None
+    # Подключение допускает одновременные запросы из разных потоков
+    concurrent = True
+
+    def __init__(self, *_):
+        pass
+
+    def disconnect(self):
+        """ Подключения потоков закрываются при завершении потоков """
+
+    @property
+    def is_opened(self):
+        """ Признак открытой транзакции на подключении текущего потока """
+        return self.threads.connection().is_opened
+
+    def run_query(self, query_string, params=None):
+        """ Выполнение SQL запроса
+            :param query_string: строка запроса
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        return self.threads.connection().run_query(query_string, params)
+
+    def run_prepared(self, query_string, params=None):
+        """ Выполнение запроса подготовленным оператором
+            :param query_string: строка запроса
+            :param params: параметры запроса
+        """
+        return self.threads.connection().run_prepared(query_string, params)
+
+    def copy_in(self, query_string, stream, size=65536):
+        """ Загрузка данных командой COPY ... FROM STDIN
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект с данными
+            :param size: размер порции чтения
+        """
+        return self.threads.connection().copy_in(query_string, stream, size)
+
+    def copy_out(self, query_string, stream, size=65536):
+        """ Выгрузка данных командой COPY ... TO STDOUT
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект для записи данных
+            :param size: размер порции
+        """
+        return self.threads.connection().copy_out(query_string, stream, size)
+
+    def stream_query(self, query_string, fetch_size=1000, params=None):
+        """ Построчная выборка через курсор на стороне сервера
+            :param query_string: строка запроса
+            :param fetch_size: размер порции
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        return self.threads.connection().stream_query(query_string,
+                                                      fetch_size, params)
+
+    def begin(self):
+        """ Открытие транзакции на подключении текущего потока """
+        self.threads.connection().begin()
+
+    def commit(self):
+        """ Подтверждение транзакции на подключении текущего потока """
+        self.threads.connection().commit()
+
+    def rollback(self):
+        """ Откат транзакции на подключении текущего потока """
+        self.threads.connection().rollback()
+
+
+class Replicas(object):
+    """ Набор реплик для чтения. Реплика выбирается по кругу (ROUND_ROBIN)
+        либо по наименьшему числу выполняемых запросов (LEAST_BUSY)
+    """
+    def __init__(self, factories, routing=ROUND_ROBIN):
+        """ Конструктор класса
+            :param factories: фабрики подключений Capstone к репликам
+            :param routing: способ выбора реплики
+        """
+        self.factories = factories
+        self.routing = routing
+        self.__lock = threading.Lock()
+        self.__next = 0
+        self.busy = [0] * len(factories)
+        self.served = [0] * len(factories)
+        # Время последней записи на основной сервер в каждом потоке
+        self.__local = threading.local()
+
+    def acquire(self):
+        """ Выбор реплики для очередного запроса
+            :return: номер реплики
+        """
+        with self.__lock:
+            if self.routing == LEAST_BUSY:
+                index = min(range(len(self.busy)),
+                            key=lambda i: (self.busy[i], self.served[i]))
+            else:
+                index = self.__next
+                self.__next = (index + 1) % len(self.busy)
+            self.busy[index] += 1
+            self.served[index] += 1
+            return index
+
+    def release(self, index):
+        """ Завершение запроса к реплике """
+        with self.__lock:
+            self.busy[index] -= 1
+
+    def mark_write(self):
+        """ Отметка записи на основной сервер в текущем потоке """
+        self.__local.written = time.time()
+
+    def since_write(self):
+        """ Время (секунд) с последней записи в текущем потоке
+            (None - поток не выполнял запись)
+        """
+        written = getattr(self.__local, 'written', None)
+        return None if written is None else time.time() - written
+
+    def __len__(self):
+        return len(self.factories)
+
+
+class ConnectionRouted(object):
+    """ Подключение с распределением чтения по репликам. Запросы на чтение
+        (методы read_*) выполняются на реплике, прочие запросы и все запросы
+        внутри транзакции - на основном сервере. В течение write_window
+        секунд после записи чтение также выполняется на основном сервере,
+        чтобы были видны собственные изменения. Время записи общее для
+        всех подключений фабрики Capstone и отмечается по потокам
+    """
+    def __init__(self, primary, replicas, write_window=1.0):
+        """ Конструктор класса
+            :param primary: подключение к основному серверу
+            :param replicas: набор реплик Replicas
+            :param write_window: время чтения с основного сервера
+                после записи (секунд)
+        """
+        self.__primary = primary
+        self.__replicas = replicas
+        self.__connections = {}
+        self.__in_transaction = False
+        self.write_window = write_window
+
+    def __getattr__(self, name):
+        return getattr(self.__primary, name)
+
+    @property
+    def is_opened(self):
+        """ Признак открытой транзакции на основном сервере """
+        return getattr(self.__primary, 'is_opened', False)
+
+    def disconnect(self):
+        """ Закрытие подключений к основному серверу и репликам """
+        connections, self.__connections = self.__connections, {}
+        for conn in connections.values():
+            conn.disconnect()
+        self.__primary.disconnect()
+
+    def __write(self, method, query_string, *args):
+        """ Вызов метода подключения к основному серверу с отметкой
+            времени записи. Для запросов, не изменяющих данных
+            (READ_ONLY), время записи не отмечается
+        """
+        try:
+            return getattr(self.__primary, method)(query_string, *args)
+        finally:
+            if not READ_ONLY.match(query_string):
+                self.__replicas.mark_write()
+
+    def __replica(self):
+        """ Номер реплики для чтения (None - чтение с основного сервера) """
+        if self.__in_transaction:
+            return None
+        since = self.__replicas.since_write()
+        if since is not None and since < self.write_window:
+            return None
+        return self.__replicas.acquire()
+
+    def __connection(self, index):
+        """ Подключение к реплике, открываемое при первом обращении """
+        conn = self.__connections.get(index)
+        if conn is None:
+            conn = self.__replicas.factories[index]()
+            self.__connections[index] = conn
+        return conn
+
+    def __read(self, method, *args):
+        """ Вызов метода подключения к реплике """
+        index = self.__replica()
+        if index is None:
+            return getattr(self.__primary, method)(*args)
+        try:
+            return getattr(self.__connection(index), method)(*args)
+        finally:
+            self.__replicas.release(index)
+
+    def run_query(self, query_string, params=None):
+        """ Выполнение SQL запроса на основном сервере
+            :param query_string: строка запроса
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        return self.__write('run_query', query_string, params)
+
+    def run_prepared(self, query_string, params=None):
+        """ Выполнение запроса подготовленным оператором
+            на основном сервере
+            :param query_string: строка запроса
+            :param params: параметры запроса
+        """
+        return self.__write('run_prepared', query_string, params)
+
+    def copy_in(self, query_string, stream, size=65536):
+        """ Загрузка данных командой COPY ... FROM STDIN
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект с данными
+            :param size: размер порции чтения
+        """
+        return self.__write('copy_in', query_string, stream, size)
+
+    def copy_out(self, query_string, stream, size=65536):
+        """ Выгрузка данных командой COPY ... TO STDOUT
+            :param query_string: текст команды COPY
+            :param stream: файлоподобный объект для записи данных
+            :param size: размер порции
+        """
+        return self.__primary.copy_out(query_string, stream, size)
+
+    def stream_query(self, query_string, fetch_size=1000, params=None):
+        """ Построчная выборка на основном сервере
+            :param query_string: строка запроса
+            :param fetch_size: размер порции
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        return self.__primary.stream_query(query_string, fetch_size, params)
+
+    def read_query(self, query_string, params=None):
+        """ Выполнение SQL запроса на чтение
+            :param query_string: строка запроса
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        return self.__read('run_query', query_string, params)
+
+    def read_prepared(self, query_string, params=None):
+        """ Выполнение запроса на чтение подготовленным оператором
+            :param query_string: строка запроса
+            :param params: параметры запроса
+        """
+        return self.__read('run_prepared', query_string, params)
+
+    def read_stream(self, query_string, fetch_size=1000, params=None):
+        """ Построчная выборка на чтение. Реплика считается занятой
+            до окончания выборки
+            :param query_string: строка запроса
+            :param fetch_size: размер порции
+            :param params: параметры запроса, передаваемые драйверу
+        """
+        index = self.__replica()
+        if index is None:
+            conn = self.__primary
+        else:
+            conn = self.__connection(index)
+        try:
+            for row in conn.stream_query(query_string, fetch_size, params):
+                yield row
+        finally:
+            if index is not None:
+                self.__replicas.release(index)
+
+    def begin(self):
+        """ Открытие транзакции на основном сервере """
+        self.__primary.begin()
+        self.__in_transaction = True
+
+    def commit(self):
+        """ Подтверждение транзакции """
+        try:
+            self.__primary.commit()
+        finally:
+            self.__in_transaction = False
+            self.__replicas.mark_write()
+
+    def rollback(self):
+        """ Откат транзакции """
+        try:
+            self.__primary.rollback()
+        finally:
+            self.__in_transaction = False
+
+
 class Capstone(object):
     """ Фабрика объектов. Класс-обертка над различными типами подключения:
         отдельное подключение или общее.
         Экземпляр класса при вызове порождает объекты,
         реализующие тот тип подключения, который был задан в конструкторе класса
     """
-    def __init__(self, conn_type, db_name, user, password, host, port):
+    def __init__(self, conn_type, db_name, user, password, host, port,
+                 replicas=None, routing=ROUND_ROBIN, write_window=1.0,
+                 **options):
+        """ Конструктор класса
+            :param conn_type: тип подключения: SHARED (False), INSTANCE (True),
+                POOL или LOCAL
+            :param replicas: список пар (хост, порт) реплик для чтения
+                с теми же базой данных и учетной записью
+            :param routing: способ выбора реплики: ROUND_ROBIN или LEAST_BUSY
+            :param write_window: время чтения с основного сервера
+                после записи (секунд)
+            :param options: параметры пула подключений (min_size, max_size,
+                timeout, idle_timeout)
+        """
         self.__db_name = db_name
         self.__user = user
         self.__password = password
         self.__host = host
         self.__port = port
+        self.__pool = None
+        self.__threads = None
+        self.__replicas = None
+        self.__write_window = write_window
+
+        if replicas:
+            self.__replicas = Replicas(
+                [Capstone(conn_type, db_name, user, password, r_host, r_port,
+                          **options) for r_host, r_port in replicas],
+                routing)
+
+        if conn_type == POOL:
+            pool = ConnectionPool(db_name, user, password, host, port,
+                                  **options)
 
-        if conn_type:
+            class ConnectionPoolDummy(ConnectionPooled):
+                """ Шаблон класса для использования пула подключений """
+            ConnectionPoolDummy.pool = pool
+
+            self.__pool = pool
+            self.__class = ConnectionPoolDummy
+        elif conn_type == LOCAL:
+            threads = ThreadConnections(db_name, user, password, host, port)
+
+            class ConnectionLocalDummy(ConnectionLocal):
+                """ Шаблон класса для использования подключений потоков """
+            ConnectionLocalDummy.threads = threads
+
+            self.__threads = threads
+            self.__class = ConnectionLocalDummy
+        elif conn_type:
             self.__class = ConnectionInstance
         else:
             class ConnectionDummy(ConnectionClass):
@@ -133,9 +912,27 @@ class Capstone(object):
             self.__class.connect(self.__db_name, self.__user, self.__password,
                                  self.__host, self.__port)
 
+    @property
+    def pool(self):
+        """ Пул подключений (только для типа POOL) """
+        return self.__pool
+
+    @property
+    def threads(self):
+        """ Реестр подключений потоков (только для типа LOCAL) """
+        return self.__threads
+
+    @property
+    def replicas(self):
+        """ Набор реплик для чтения (None, если реплики не заданы) """
+        return self.__replicas
+
     def __call__(self):
         """ Объекты, реализующее подключение к базе данных,
             порождаются путем вызова экземпляра класса
         """
-        return self.__class(self.__db_name, self.__user, self.__password,
+        conn = self.__class(self.__db_name, self.__user, self.__password,
                             self.__host, self.__port)
+        if self.__replicas is None:
+            return conn
+        return ConnectionRouted(conn, self.__replicas, self.__write_window)
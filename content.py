@@ -35,3 +35,84 @@ class DataContainer(object):
     def counter(self):
         """ Ширина выборки (количество столбцов) """
         return self.__counter
+
+
+class Row(object):
+    """ Легковесное представление строки выборки ResultSet.
+        Имена колонок не копируются, а берутся из выборки
+    """
+    __slots__ = ('__columns', '__content')
+
+    def __init__(self, columns, content):
+        """ Конструктор класса
+            :param columns: кортеж имен колонок выборки
+            :param content: кортеж значений строки
+        """
+        self.__columns = columns
+        self.__content = content
+
+    def to_tuple(self):
+        """ Преобразование к кортежу """
+        return self.__content
+
+    def to_dict(self):
+        """ Преобразование к словарю """
+        return dict(zip(self.__columns, self.__content))
+
+    @property
+    def columns(self):
+        """ Имена колонок """
+        return self.__columns
+
+    @property
+    def counter(self):
+        """ Ширина выборки (количество столбцов) """
+        return len(self.__content)
+
+    def __getitem__(self, index):
+        return self.__content[index]
+
+    def __len__(self):
+        return len(self.__content)
+
+    def __iter__(self):
+        return iter(self.__content)
+
+
+class ResultSet(object):
+    """ Результат выборки: имена колонок хранятся один раз,
+        строки - кортежами драйвера. Объекты Row создаются только
+        при обращении к отдельным строкам
+    """
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns, rows):
+        """ Конструктор класса
+            :param columns: имена колонок выборки
+            :param rows: список кортежей
+        """
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def tuples(self):
+        """ Строки выборки в виде кортежей """
+        return iter(self.rows)
+
+    def dicts(self):
+        """ Генератор строк выборки в виде словарей """
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        columns = self.columns
+        for row in self.rows:
+            yield Row(columns, row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ResultSet(self.columns, self.rows[index])
+        return Row(self.columns, self.rows[index])
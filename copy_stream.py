@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Потоковая передача данных командой COPY
+"""
+NULL = '\\N'
+# Символы, экранируемые в текстовом формате COPY
+ESCAPES = (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'))
+
+
+def encode_value(value, translator=None):
+    """ Представление значения в текстовом формате COPY
+        :param value: значение
+        :param translator: класс (или объект) преобразования Pg*,
+            которым предварительно обрабатывается значение
+        :return: строка в кодировке utf-8
+    """
+    if translator is not None:
+        value = translator(value).raw()
+
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    elif not isinstance(value, str):
+        value = str(value)
+
+    for char, escaped in ESCAPES:
+        if char in value:
+            value = value.replace(char, escaped)
+    return value
+
+
+def encode_row(row, translators=None):
+    """ Представление строки данных в текстовом формате COPY
+        :param row: кортеж значений
+        :param translators: кортеж классов преобразования Pg* по колонкам
+        :return: строка, завершенная переводом строки
+    """
+    if translators:
+        values = [encode_value(value, translator)
+                  for value, translator in zip(row, translators)]
+    else:
+        values = [encode_value(value) for value in row]
+    return '\t'.join(values) + '\n'
+
+
+class CopyReader(object):
+    """ Файлоподобный объект, отдающий строки данных в формате COPY
+        порциями по мере чтения. Строки запрашиваются у источника
+        по одной, поэтому в памяти находится не больше одной порции
+    """
+    def __init__(self, rows, translators=None):
+        """ Конструктор класса
+            :param rows: итерируемый источник кортежей
+            :param translators: кортеж классов преобразования Pg* по колонкам
+        """
+        self.__rows = iter(rows)
+        self.__translators = translators
+        self.__buffer = ''
+        self.__exhausted = False
+        self.rows = 0
+
+    def read(self, size=-1):
+        """ Чтение очередной порции данных
+            :param size: размер порции, отрицательное значение - все данные
+        """
+        if size is None or size < 0:
+            size = None
+
+        parts = [self.__buffer]
+        length = len(self.__buffer)
+        while not self.__exhausted and (size is None or length < size):
+            try:
+                row = next(self.__rows)
+            except StopIteration:
+                self.__exhausted = True
+                break
+            line = encode_row(row, self.__translators)
+            parts.append(line)
+            length += len(line)
+            self.rows += 1
+
+        data = ''.join(parts)
+        if size is None:
+            self.__buffer = ''
+            return data
+        self.__buffer = data[size:]
+        return data[:size]
+
+
+class CopyWriter(object):
+    """ Файлоподобный объект, накапливающий данные COPY TO STDOUT
+        в буфере фиксированного размера и передающий их приемнику.
+        Приемником может быть файлоподобный объект (метод write),
+        сокет (метод sendall) или функция обратного вызова
+    """
+    def __init__(self, sink, size=65536):
+        """ Конструктор класса
+            :param sink: приемник данных
+            :param size: размер буфера (байт)
+        """
+        if hasattr(sink, 'write'):
+            self.__send = sink.write
+        elif hasattr(sink, 'sendall'):
+            self.__send = sink.sendall
+        elif callable(sink):
+            self.__send = sink
+        else:
+            raise TypeError(u"Приемник данных должен быть файлом, "
+                            u"сокетом или функцией")
+
+        self.__size = size
+        self.__parts = []
+        self.__length = 0
+        self.bytes = 0
+
+    def write(self, data):
+        """ Запись очередной порции данных в буфер """
+        self.__parts.append(data)
+        self.__length += len(data)
+        while self.__length >= self.__size:
+            data = ''.join(self.__parts)
+            self.__send(data[:self.__size])
+            self.bytes += self.__size
+            rest = data[self.__size:]
+            self.__parts = [rest] if rest else []
+            self.__length = len(rest)
+
+    def flush(self):
+        """ Передача остатка буфера приемнику """
+        if self.__length:
+            self.__send(''.join(self.__parts))
+            self.bytes += self.__length
+        self.__parts = []
+        self.__length = 0
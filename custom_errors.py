@@ -65,6 +65,21 @@ class RunQueryError(CustomError):
     """ Ошибки выполнения запроса """
     __err_code = 300
 
+    def __init__(self, *args, **kwargs):
+        """ Конструктор класса
+            :param cause: исходное исключение (драйвера либо RunQueryError),
+                от которого наследуются sqlstate и origin
+            :param sqlstate: код SQLSTATE ошибки сервера
+        """
+        super(RunQueryError, self).__init__(*args, **kwargs)
+        cause = kwargs.get("cause")
+        # Код SQLSTATE ошибки сервера (если известен)
+        self.sqlstate = kwargs.get("sqlstate") or \
+            getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+        # Имя класса исходного исключения драйвера
+        self.origin = getattr(cause, 'origin', None) or \
+            (None if cause is None else cause.__class__.__name__)
+
 
 class TransactionError(CustomError):
     """ Ошибки выполнения транзакции """
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Метрики выполнения запросов: гистограммы времени по шаблонам запросов
+    и их представление в текстовом формате Prometheus
+"""
+import bisect
+import re
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from caches import LRUCache
+from content import ResultSet
+
+# Границы интервалов гистограмм времени (секунд)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0)
+
+# Литералы запроса, заменяемые при нормализации
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+SPACES = re.compile(r"\s+")
+
+# Время ожидания блокировки или пула подключений в текущем потоке
+_WAIT = threading.local()
+
+
+def add_wait(seconds):
+    """ Учет времени ожидания блокировки подключения или подключения
+        из пула (вызывается классами подключений)
+    """
+    _WAIT.seconds = getattr(_WAIT, 'seconds', 0.0) + seconds
+
+
+def take_wait():
+    """ Накопленное время ожидания текущего потока со сбросом счетчика """
+    seconds = getattr(_WAIT, 'seconds', 0.0)
+    _WAIT.seconds = 0.0
+    return seconds
+
+
+def normalize(query):
+    """ Шаблон запроса: литералы заменяются на '?', списки литералов
+        сворачиваются в один '?', пробельные символы сжимаются
+        :param query: текст запроса
+    """
+    return SPACES.sub(" ", LISTS.sub("?", LITERALS.sub("?", query))).strip()
+
+
+def row_count(result):
+    """ Число строк результата запроса: строк выборки либо строк,
+        измененных командой
+    """
+    if isinstance(result, ResultSet):
+        return len(result.rows)
+    if not result:
+        return 0
+    if len(result) == 1 and not result[0].columns:
+        return result[0].counter
+    return len(result)
+
+
+class Histogram(object):
+    """ Гистограмма наблюдаемых значений с накопленными суммой и числом """
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=BUCKETS):
+        """ Конструктор класса
+            :param bounds: возрастающие верхние границы интервалов
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """ Учет наблюдаемого значения """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """ Список (верхняя граница, число значений не больше границы),
+            последняя граница - бесконечность
+        """
+        result, total = [], 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """ Оценка квантиля линейной интерполяцией внутри интервала
+            :param q: уровень квантиля (0..1)
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.bounds, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            lower, seen = bound, seen + count
+        return self.bounds[-1]
+
+
+class QueryStats(object):
+    """ Накопленные метрики одного шаблона запроса """
+    __slots__ = ('seconds', 'wait', 'rows', 'errors')
+
+    def __init__(self, bounds):
+        self.seconds = Histogram(bounds)
+        self.wait = Histogram(bounds)
+        self.rows = 0
+        self.errors = {}
+
+
+class MetricsRegistry(object):
+    """ Потокобезопасный реестр метрик запросов. Метрики группируются
+        по нормализованному шаблону запроса (литералы заменяются на '?')
+    """
+    # Имя шаблона, объединяющего запросы сверх предельного числа шаблонов
+    OTHER = "other"
+
+    def __init__(self, bounds=BUCKETS, max_templates=1000, prefix='shoe2'):
+        """ Конструктор класса
+            :param bounds: границы интервалов гистограмм (секунд)
+            :param max_templates: предельное число шаблонов запросов
+            :param prefix: префикс имен метрик Prometheus
+        """
+        self.bounds = tuple(bounds)
+        self.max_templates = max_templates
+        self.prefix = prefix
+        self.__stats = {}
+        self.__templates = LRUCache(4096)
+        self.__lock = threading.Lock()
+
+    def template(self, query):
+        """ Нормализованный шаблон запроса
+            :param query: текст запроса
+        """
+        template = self.__templates.get(query, None)
+        if template is None:
+            template = normalize(query)
+            self.__templates.put(query, template)
+        return template
+
+    def observe(self, query, seconds, wait=0.0, rows=0, error=None):
+        """ Учет выполнения запроса
+            :param query: текст запроса
+            :param seconds: время выполнения (секунд)
+            :param wait: время ожидания блокировки или пула (секунд)
+            :param rows: число строк результата
+            :param error: имя класса исключения (None - без ошибки)
+        """
+        template = self.template(query)
+        with self.__lock:
+            stats = self.__stats.get(template)
+            if stats is None:
+                if len(self.__stats) >= self.max_templates:
+                    template = self.OTHER
+                    stats = self.__stats.get(template)
+                if stats is None:
+                    stats = self.__stats[template] = QueryStats(self.bounds)
+            stats.seconds.observe(seconds)
+            stats.wait.observe(wait)
+            stats.rows += rows
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def snapshot(self):
+        """ Снимок метрик
+            :return: словарь {шаблон запроса: {count, seconds, wait, rows,
+                errors, p50, p99, buckets}}
+        """
+        with self.__lock:
+            return dict((template, {
+                'count': stats.seconds.count,
+                'seconds': stats.seconds.sum,
+                'wait': stats.wait.sum,
+                'rows': stats.rows,
+                'errors': dict(stats.errors),
+                'p50': stats.seconds.quantile(0.5),
+                'p99': stats.seconds.quantile(0.99),
+                'buckets': stats.seconds.cumulative()})
+                for template, stats in self.__stats.items())
+
+    def reset(self):
+        """ Сброс накопленных метрик """
+        with self.__lock:
+            self.__stats.clear()
+
+    @staticmethod
+    def __label(value):
+        """ Значение метки Prometheus в кавычках """
+        if isinstance(value, str):
+            value = value.decode('utf-8', 'replace')
+        return u'"%s"' % value.replace(u'\\', u'\\\\').\
+            replace(u'"', u'\\"').replace(u'\n', u'\\n')
+
+    @staticmethod
+    def __number(value):
+        if value == float('inf'):
+            return u"+Inf"
+        return repr(float(value)) if isinstance(value, float) \
+            else unicode(value)
+
+    def prometheus(self):
+        """ Метрики в текстовом формате Prometheus (UTF-8) """
+        with self.__lock:
+            items = sorted([(template, stats.seconds.cumulative(),
+                             stats.seconds.sum, stats.wait.cumulative(),
+                             stats.wait.sum, stats.rows,
+                             sorted(stats.errors.items()))
+                            for template, stats in self.__stats.items()])
+        lines = []
+        histograms = (
+            ('query_duration_seconds', u"Query wall time", 1, 2),
+            ('query_wait_seconds',
+             u"Time waiting for a connection lock or pool", 3, 4))
+        for name, text, buckets, total in histograms:
+            name = u"%s_%s" % (self.prefix, name)
+            lines.append(u"# HELP %s %s" % (name, text))
+            lines.append(u"# TYPE %s histogram" % name)
+            for item in items:
+                label = self.__label(item[0])
+                for bound, count in item[buckets]:
+                    lines.append(u"%s_bucket{query=%s,le=\"%s\"} %d" % (
+                        name, label, self.__number(bound), count))
+                lines.append(u"%s_sum{query=%s} %s" % (
+                    name, label, self.__number(item[total])))
+                lines.append(u"%s_count{query=%s} %d" % (
+                    name, label, item[buckets][-1][1]))
+
+        name = u"%s_query_rows_total" % self.prefix
+        lines.append(u"# HELP %s Rows returned or affected" % name)
+        lines.append(u"# TYPE %s counter" % name)
+        for item in items:
+            lines.append(u"%s{query=%s} %d" % (name, self.__label(item[0]),
+                                                item[5]))
+
+        name = u"%s_query_errors_total" % self.prefix
+        lines.append(u"# HELP %s Failed queries by error class" % name)
+        lines.append(u"# TYPE %s counter" % name)
+        for item in items:
+            for error, count in item[6]:
+                lines.append(u"%s{query=%s,error=%s} %d" % (
+                    name, self.__label(item[0]), self.__label(error), count))
+        return (u"\n".join(lines) + u"\n").encode('utf-8')
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """ Обработчик HTTP запросов, отдающий метрики реестра registry """
+    registry = None
+
+    def do_GET(self):
+        body = self.registry.prometheus()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; '
+                                         'charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """ Журнал обращений не ведется """
+
+
+def serve(registry, port, host='127.0.0.1'):
+    """ Запуск HTTP сервера метрик в фоновом потоке
+        :param registry: реестр метрик
+        :param port: номер порта
+        :param host: адрес прослушивания
+        :return: сервер (остановка - методом shutdown)
+    """
+    class MetricsHandlerDummy(MetricsHandler):
+        """ Шаблон класса обработчика для заданного реестра """
+    MetricsHandlerDummy.registry = registry
+
+    server = HTTPServer((host, port), MetricsHandlerDummy)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
@@ -6,12 +6,33 @@
 import pg
 
 import content
+import pg_types
 from transaction import Transaction
+from statement_cache import StatementCache, numbered_query
 from custom_errors import ConnectionError, RunQueryError
+from profiler import MATERIALIZE, timed
+
+# Исходные функции преобразования драйвера для типов, переопределенных
+# через PgWrapper.register_type
+_BASE_CASTERS = {}
+
+
+def _typecaster(cast, base):
+    """ Функция преобразования драйвера: исходное преобразование
+        значения драйвером (если оно есть) и затем функция cast
+    """
+    if base is None:
+        return cast
+    return lambda value: cast(base(value))
 
 
 class PgWrapper(Transaction):
     """ Обертка над драйвером DB-API 2 """
+    # Размер кэша подготовленных операторов
+    statements_size = 100
+    # Форматы выгрузки COPY ... TO STDOUT, поддерживаемые драйвером
+    copy_formats = ('csv', 'text')
+
     def __init__(self, db_name, user, password, host, port):
         """ Конструктор класса
         :param db_name: наименование базы данных
@@ -22,6 +43,7 @@ class PgWrapper(Transaction):
         """
         super(PgWrapper, self).__init__()
         self.__conn = None
+        self.statements = StatementCache(self.statements_size)
 
         self.db_name = db_name
         self.user = user
@@ -33,6 +55,21 @@ class PgWrapper(Transaction):
         """ Отсоединяемся от базы, если пользователь сам забыл это сделать """
         self.disconnect()
 
+    @staticmethod
+    def register_type(translator, *types):
+        """ Регистрация класса трансформации Ptn* как функции преобразования
+            типов драйвера (pg.set_typecast). PyGreSQL определяет типы
+            по имени, OID переводятся в имена встроенных типов. Элементы
+            массивов преобразуются драйвером той же функцией
+            :param translator: класс трансформации Ptn*
+            :param types: OID или имена типов PostgreSQL
+        """
+        cast = translator.caster()
+        for name in [pg_types.type_name(i) for i in types]:
+            if name not in _BASE_CASTERS:
+                _BASE_CASTERS[name] = pg.get_typecast(name)
+            pg.set_typecast(name, _typecaster(cast, _BASE_CASTERS[name]))
+
     def connect(self):
         """ Открытие соединения с базой """
         try:
@@ -42,39 +79,145 @@ class PgWrapper(Transaction):
         except StandardError as err:
             raise ConnectionError(*err.args).\
                 describe(u"Невозможно выполнить подключение")
+        self.statements.clear()
 
     def disconnect(self):
         """ Закрываем соединение """
+        self.close_streams()
         if self.__conn:
             try:
                 self.__conn.close()
             except:
                 pass
 
-    def run_query(self, query):
+    def run_query(self, query, params=None):
         """ Выполнение запроса на открытом соединении
             :param query: текст запроса
+            :param params: параметры запроса (заполнители %s или %(имя)s)
         """
         if isinstance(query, unicode):
             query = query.encode('utf-8')
         else:
             raise RunQueryError().describe(u"Ошибка выполнения запроса")
 
+        args = ()
+        if params is not None:
+            query, args = numbered_query(query, params)
+            args = [i.encode('utf-8') if isinstance(i, unicode) else i
+                    for i in args]
+
         try:
-            result = self.__conn.query(query)
+            result = self.__conn.query(query, *args)
         except pg.Error as err:
-            raise RunQueryError(*err.args).\
+            raise RunQueryError(*err.args, cause=err).\
                 describe(u"Ошибка выполнения запроса")
         else:
-            if type(result).__name__ == 'pgqueryobject':
-                fields = result.listfields()
-                return [content.DataContainer(fields, i)
-                        for i in result.getresult()]
-            else:
-                if result is None:
-                    result = 0
-
-                return [content.DataContainer(None, None, result), ]
+            return self.__result(result)
+
+    @staticmethod
+    @timed(MATERIALIZE)
+    def __result(result):
+        """ Преобразование результата выполнения запроса """
+        if type(result).__name__ == 'pgqueryobject':
+            return content.ResultSet(result.listfields(), result.getresult())
+        else:
+            if result is None:
+                result = 0
+
+            return [content.DataContainer(None, None, result), ]
+
+    def run_prepared(self, query, params=None):
+        """ Выполнение запроса подготовленным оператором из кэша
+            :param query: текст запроса (заполнители %s или %(имя)s)
+            :param params: параметры запроса
+        """
+        return self.statements.execute(self, query, params)
+
+    def prepare_statement(self, name, query):
+        """ Подготовка оператора на сервере
+            :param name: имя оператора
+            :param query: текст запроса с параметрами $n
+        """
+        if isinstance(query, unicode):
+            query = query.encode('utf-8')
+        try:
+            self.__conn.prepare(name, query)
+        except pg.Error as err:
+            raise RunQueryError(*err.args, cause=err).\
+                describe(u"Ошибка подготовки запроса")
+
+    def execute_statement(self, name, params):
+        """ Выполнение подготовленного оператора
+            :param name: имя оператора
+            :param params: список параметров
+        """
+        args = [i.encode('utf-8') if isinstance(i, unicode) else i
+                for i in params]
+        try:
+            result = self.__conn.query_prepared(name, *args)
+        except pg.Error as err:
+            raise RunQueryError(*err.args, cause=err).\
+                describe(u"Ошибка выполнения запроса")
+        return self.__result(result)
+
+    def deallocate_statement(self, name):
+        """ Освобождение подготовленного оператора """
+        try:
+            self.__conn.query("DEALLOCATE %s" % name)
+        except pg.Error as err:
+            raise RunQueryError(*err.args, cause=err).\
+                describe(u"Ошибка освобождения запроса")
+
+    def copy_in(self, query, stream, size=65536):
+        """ Загрузка данных командой COPY ... FROM STDIN
+            :param query: текст команды COPY
+            :param stream: файлоподобный объект с данными
+            :param size: размер порции чтения
+            :return: число загруженных строк (None, если неизвестно)
+        """
+        if isinstance(query, unicode):
+            query = query.encode('utf-8')
+
+        try:
+            self.__conn.query(query)
+            while True:
+                chunk = stream.read(size)
+                if not chunk:
+                    break
+                self.__conn.putline(chunk)
+            self.__conn.putline('\\.\n')
+            self.__conn.endcopy()
+        except pg.Error as err:
+            raise RunQueryError(*err.args, cause=err).\
+                describe(u"Ошибка загрузки данных")
+        return getattr(stream, 'rows', None)
+
+    def copy_out(self, query, stream, size=65536):
+        """ Выгрузка данных командой COPY ... TO STDOUT.
+            Драйвер выгружает данные построчно, поэтому поддерживаются
+            только текстовые форматы (см. copy_formats)
+            :param query: текст команды COPY
+            :param stream: файлоподобный объект для записи данных
+            :param size: размер порции (не используется драйвером)
+            :return: число выгруженных строк
+        """
+        if isinstance(query, unicode):
+            query = query.encode('utf-8')
+
+        count = 0
+        try:
+            self.__conn.query(query)
+            while True:
+                line = self.__conn.getline()
+                if line is None or line == '\\.':
+                    break
+                stream.write(line + '\n')
+                count += 1
+            self.__conn.endcopy()
+        except pg.Error as err:
+            raise RunQueryError(*err.args, cause=err).\
+                describe(u"Ошибка выгрузки данных")
+        return count
 
 content.MARKER = PgWrapper
 
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Идентификаторы (OID) встроенных типов PostgreSQL
+"""
+# Имя типа: OID
+OIDS = {
+    'bool': 16, 'int2': 21, 'int4': 23, 'int8': 20, 'float4': 700,
+    'float8': 701, 'numeric': 1700, 'date': 1082, 'time': 1083,
+    'timestamp': 1114, 'timestamptz': 1184, 'interval': 1186, 'json': 114,
+    'jsonb': 3802, 'uuid': 2950, 'text': 25, 'varchar': 1043, 'bpchar': 1042,
+}
+# OID типа: OID массива этого типа
+ARRAYS = {
+    16: 1000, 21: 1005, 23: 1007, 20: 1016, 700: 1021, 701: 1022,
+    1700: 1231, 1082: 1182, 1083: 1183, 1114: 1115, 1184: 1185, 1186: 1187,
+    114: 199, 3802: 3807, 2950: 2951, 25: 1009, 1043: 1015, 1042: 1014,
+}
+NAMES = dict((oid, name) for name, oid in OIDS.items())
+
+
+def type_oid(value):
+    """ OID типа по имени или OID """
+    if isinstance(value, (int, long)):
+        return value
+    try:
+        return OIDS[value.lower()]
+    except KeyError:
+        raise ValueError(u"Неизвестный тип PostgreSQL: {0}".format(value))
+
+
+def type_name(value):
+    """ Имя типа по имени или OID """
+    if not isinstance(value, (int, long)):
+        return value.lower()
+    try:
+        return NAMES[value]
+    except KeyError:
+        raise ValueError(u"Неизвестный OID типа PostgreSQL: {0}".format(value))
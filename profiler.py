@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Профилирование этапов выполнения запросов
+"""
+import threading
+import time
+from functools import wraps
+
+# Этапы выполнения запроса
+TRANSLATE = 'translate'        # преобразование аргументов (translate)
+ASSEMBLY = 'assembly'          # формирование текста SQL запроса
+EXECUTE = 'execute'            # передача запроса и ожидание результата
+MATERIALIZE = 'materialize'    # построение строк результата
+SHAPE = 'shape'                # представление результата (не генераторы)
+RETRANSLATE = 'retranslate'    # преобразование результата (retranslate)
+STAGES = (TRANSLATE, ASSEMBLY, EXECUTE, MATERIALIZE, SHAPE, RETRANSLATE)
+
+# Включенный профилировщик (None - профилирование выключено)
+_ACTIVE = None
+
+
+class _Stage(object):
+    """ Замер этапа. Время вложенных этапов вычитается из времени
+        объемлющего, так что каждый этап учитывает только собственное время
+    """
+    __slots__ = ('profiler', 'name', 'started', 'nested')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.nested = 0.0
+        self.profiler._stack().append(self)
+        self.started = time.time()
+
+    def __exit__(self, *_):
+        elapsed = time.time() - self.started
+        stack = self.profiler._stack()
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        self.profiler._add(self.name, elapsed - self.nested)
+
+
+class _Idle(object):
+    """ Пустой замер при выключенном профилировании """
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *_):
+        pass
+
+
+_IDLE = _Idle()
+
+
+def stage(name):
+    """ Замер этапа блока with
+        :param name: имя этапа
+    """
+    if _ACTIVE is None:
+        return _IDLE
+    return _Stage(_ACTIVE, name)
+
+
+def timed(name):
+    """ Замер этапа на время вызова функции. Реализация в виде декоратора
+        :param name: имя этапа
+    """
+    def maker(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE is None:
+                return func(*args, **kwargs)
+            with _Stage(_ACTIVE, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return maker
+
+
+class Profiler(object):
+    """ Накопитель времени этапов выполнения запросов всех потоков.
+        Профилирование включается методом enable либо блоком with
+    """
+    def __init__(self):
+        self.__stats = {}
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+
+    def _stack(self):
+        """ Стек замеров текущего потока """
+        stack = getattr(self.__local, 'stack', None)
+        if stack is None:
+            stack = self.__local.stack = []
+        return stack
+
+    def _add(self, name, seconds):
+        """ Учет замера этапа """
+        with self.__lock:
+            stats = self.__stats.get(name)
+            if stats is None:
+                stats = self.__stats[name] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+
+    def enable(self):
+        """ Включение профилирования """
+        global _ACTIVE
+        _ACTIVE = self
+
+    def disable(self):
+        """ Выключение профилирования """
+        global _ACTIVE
+        if _ACTIVE is self:
+            _ACTIVE = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *_):
+        self.disable()
+
+    def reset(self):
+        """ Сброс накопленных замеров """
+        with self.__lock:
+            self.__stats.clear()
+
+    def report(self):
+        """ Отчет по этапам. Время на вызов - время этапа, приходящееся
+            на один выполненный запрос (этап execute)
+            :return: словарь {этап: {count, seconds, per_call, max, share}}
+        """
+        with self.__lock:
+            stats = dict((name, list(item))
+                         for name, item in self.__stats.items())
+        calls = stats.get(EXECUTE, (0,))[0]
+        total = sum([item[1] for item in stats.values()])
+        return dict((name, {
+            'count': item[0],
+            'seconds': item[1],
+            'per_call': item[1] / calls if calls else None,
+            'max': item[2],
+            'share': item[1] / total if total else 0.0})
+            for name, item in stats.items())
+
+    def render(self):
+        """ Отчет по этапам в виде текстовой таблицы """
+        report = self.report()
+        names = [i for i in STAGES if i in report] + \
+            sorted([i for i in report if i not in STAGES])
+        lines = ["%-12s %8s %12s %12s %12s %7s" % (
+            'stage', 'count', 'seconds', 'per call, ms', 'max, ms', 'share')]
+        for name in names:
+            item = report[name]
+            per_call = item['per_call']
+            lines.append("%-12s %8d %12.6f %12s %12.3f %6.1f%%" % (
+                name, item['count'], item['seconds'],
+                '-' if per_call is None else "%.3f" % (per_call * 1000),
+                item['max'] * 1000, item['share'] * 100))
+        return "\n".join(lines)
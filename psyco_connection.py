@@ -7,14 +7,33 @@ import psycopg2 as psy
 import psycopg2.extensions as exten
 
 import content
+import pg_types
 from transaction import Transaction
+from statement_cache import StatementCache
 from custom_errors import ConnectionError, RunQueryError
+from profiler import MATERIALIZE, timed
 
 exten.register_type(exten.UNICODE)
 
+# Исходные преобразователи драйвера для типов, переопределенных
+# через PsycoWrapper.register_type
+_BASE_CASTERS = {}
+
+
+def _typecaster(cast, base):
+    """ Преобразователь драйвера: исходное преобразование значения
+        драйвером (если оно есть) и затем функция cast
+    """
+    if base is None:
+        return lambda value, cur: cast(value)
+    return lambda value, cur: cast(base(value, cur))
+
 
 class PsycoWrapper(Transaction):
     """ Обертка над драйвером psycopg2 """
+    # Размер кэша подготовленных операторов
+    statements_size = 100
+
     def __init__(self, db_name, user, password, host, port):
         """ Конструктор класса
         :param db_name: наименование базы данных
@@ -25,6 +44,7 @@ class PsycoWrapper(Transaction):
         """
         super(PsycoWrapper, self).__init__()
         self.__conn = None
+        self.statements = StatementCache(self.statements_size)
 
         self.db_name = db_name
         self.user = user
@@ -36,6 +56,27 @@ class PsycoWrapper(Transaction):
         """ Отсоединяемся от базы, если пользователь сам забыл это сделать """
         self.disconnect()
 
+    @staticmethod
+    def register_type(translator, *types):
+        """ Регистрация класса трансформации Ptn* как преобразователя
+            типов драйвера. Значения указанных типов (и массивов этих
+            типов) преобразуются при получении строк выборки, повторная
+            обработка в retranslate для них не требуется
+            :param translator: класс трансформации Ptn*
+            :param types: OID или имена типов PostgreSQL
+        """
+        cast = translator.caster()
+        for oid in [pg_types.type_oid(i) for i in types]:
+            if oid not in _BASE_CASTERS:
+                _BASE_CASTERS[oid] = exten.string_types.get(oid)
+            name = "SHOE2_%d" % oid
+            caster = exten.new_type((oid, ), name,
+                                    _typecaster(cast, _BASE_CASTERS[oid]))
+            exten.register_type(caster)
+            if oid in pg_types.ARRAYS:
+                exten.register_type(exten.new_array_type(
+                    (pg_types.ARRAYS[oid], ), name + "_ARRAY", caster))
+
     def connect(self):
         """ Открытие соединения с базой """
         try:
@@ -47,40 +88,113 @@ class PsycoWrapper(Transaction):
             raise ConnectionError(*err.args).\
                 describe(u"Невозможно выполнить подключение")
         self.__conn.set_isolation_level(exten.ISOLATION_LEVEL_AUTOCOMMIT)
+        self.statements.clear()
 
     def disconnect(self):
         """ Закрываем соединение """
+        self.close_streams()
         if self.__conn and (not self.__conn.closed):
             self.__conn.close()
 
-    def run_query(self, query):
+    def run_query(self, query, params=None):
         """ Выполнение запроса на открытом соединении
             :param query: текст запроса
+            :param params: параметры запроса (заполнители %s или %(имя)s)
         """
         cur = self.__conn.cursor()
 
         try:
-            cur.execute(query)
+            cur.execute(query, params)
         except StandardError as err:
             cur.close()
-            raise RunQueryError(*err.args).\
+            raise RunQueryError(*err.args, cause=err).\
                 describe(u"Ошибка выполнения запроса")
         else:
-            if "SELECT" in cur.statusmessage:
-                struct = [i[0] for i in cur.description]
-                data = cur.fetchall()
-                result = [content.DataContainer(struct, i) for i in data]
-            else:
-                try:
-                    count = int(cur.statusmessage.split(' ')[-1])
-                except ValueError:
-                    count = 0
-
-                result = [content.DataContainer(None, None, count)]
-
+            result = self.__result(cur)
             cur.close()
             return result
 
+    @staticmethod
+    @timed(MATERIALIZE)
+    def __result(cur):
+        """ Преобразование результата выполнения запроса. Выборкой
+            считается любой результат с описанием столбцов (SELECT, FETCH,
+            EXPLAIN, SHOW, запросы с RETURNING)
+        """
+        if cur.description is not None:
+            return content.ResultSet(
+                [i[0] for i in cur.description], cur.fetchall())
+
+        try:
+            count = int(cur.statusmessage.split(' ')[-1])
+        except ValueError:
+            count = 0
+        return [content.DataContainer(None, None, count)]
+
+    def run_prepared(self, query, params=None):
+        """ Выполнение запроса подготовленным оператором из кэша
+            :param query: текст запроса (заполнители %s или %(имя)s)
+            :param params: параметры запроса
+        """
+        return self.statements.execute(self, query, params)
+
+    def prepare_statement(self, name, query):
+        """ Подготовка оператора на сервере
+            :param name: имя оператора
+            :param query: текст запроса с параметрами $n
+        """
+        self.run_query("PREPARE %s AS %s" % (name, query))
+
+    def execute_statement(self, name, params):
+        """ Выполнение подготовленного оператора
+            :param name: имя оператора
+            :param params: список параметров
+        """
+        if not params:
+            return self.run_query("EXECUTE %s" % name)
+        holders = ",".join(["%s"] * len(params))
+        return self.run_query("EXECUTE %s (%s)" % (name, holders), params)
+
+    def deallocate_statement(self, name):
+        """ Освобождение подготовленного оператора """
+        self.run_query("DEALLOCATE %s" % name)
+
+    def copy_in(self, query, stream, size=65536):
+        """ Загрузка данных командой COPY ... FROM STDIN
+            :param query: текст команды COPY
+            :param stream: файлоподобный объект с данными
+            :param size: размер порции чтения
+            :return: число загруженных строк
+        """
+        cur = self.__conn.cursor()
+        try:
+            cur.copy_expert(query, stream, size)
+        except StandardError as err:
+            raise RunQueryError(*err.args, cause=err).\
+                describe(u"Ошибка загрузки данных")
+        else:
+            return cur.rowcount
+        finally:
+            cur.close()
+
+    def copy_out(self, query, stream, size=65536):
+        """ Выгрузка данных командой COPY ... TO STDOUT
+            :param query: текст команды COPY
+            :param stream: файлоподобный объект для записи данных
+            :param size: размер порции
+            :return: число выгруженных строк
+        """
+        cur = self.__conn.cursor()
+        try:
+            cur.copy_expert(query, stream, size)
+        except StandardError as err:
+            raise RunQueryError(*err.args, cause=err).\
+                describe(u"Ошибка выгрузки данных")
+        else:
+            return cur.rowcount
+        finally:
+            cur.close()
+
 content.MARKER = PsycoWrapper
 
 # импорт модуля происходит в самом конце для инициализации выбранного
@@ -3,10 +3,12 @@
     Анти-ORM пакет для работы с базами данных PostgreSQL
     Управление структурой возвращаемых данных
 """
-from functools import wraps
+from functools import partial, wraps
 
+import columnar
 from query_models import BaseQuery, DynamicBaseQuery, StaticBaseQuery
 from custom_errors import DataError
+from profiler import SHAPE, timed
 
 
 class CustomManager(object):
@@ -20,6 +22,7 @@ class CustomManager(object):
         return BaseQuery.as_dict(result)
 
     @staticmethod
+    @timed(SHAPE)
     def as_dictionaries(result, look4empty=False):
         """ Результат выборки в виде списка словарей
         :param result: результат выборки
@@ -32,6 +35,7 @@ class CustomManager(object):
         return [item for item in BaseQuery.as_dict(result)]
 
     @staticmethod
+    @timed(SHAPE)
     def as_dictionary(result, look4empty=False):
         """ Результат выборки в виде одного словаря (первая запись)
             :param result: результат выборки
@@ -53,6 +57,7 @@ class CustomManager(object):
         return BaseQuery.as_tuple_(result)
 
     @staticmethod
+    @timed(SHAPE)
     def as_tuples(result, look4empty=False):
         """ Результат выборки в виде списка кортежей
             :param result: результат выборки
@@ -65,6 +70,7 @@ class CustomManager(object):
         return [item for item in BaseQuery.as_tuple_(result)]
 
     @staticmethod
+    @timed(SHAPE)
     def as_tuple(result, look4empty=False):
         """ Результат выборки в виде кортежа (первая запись)
             :param result: результат выборки
@@ -78,6 +84,7 @@ class CustomManager(object):
         return data
 
     @staticmethod
+    @timed(SHAPE)
     def as_value(result, look4empty=False):
         """ Результат выборки в виде атомарного значения
             (первая колонка первой строки)
@@ -93,6 +100,33 @@ class CustomManager(object):
             data = data[0]
         return data
 
+    @staticmethod
+    @timed(SHAPE)
+    def as_columns(result, look4empty=False):
+        """ Результат выборки по колонкам
+            :param result: результат выборки
+            :param look4empty: проверка на непустоту результата
+            :return: словарь {имя колонки: список значений}
+        """
+        if not result:
+            if look4empty:
+                raise DataError(code=1).describe(u"Нет данных")
+        return columnar.transpose(result)
+
+    @staticmethod
+    @timed(SHAPE)
+    def as_arrays(result, look4empty=False):
+        """ Результат выборки по колонкам в виде непрерывных массивов
+            (numpy.ndarray при наличии NumPy, иначе array.array)
+            :param result: результат выборки
+            :param look4empty: проверка на непустоту результата
+            :return: словарь {имя колонки: массив значений}
+        """
+        if not result:
+            if look4empty:
+                raise DataError(code=1).describe(u"Нет данных")
+        return columnar.to_arrays(result)
+
 
 class StaticDataManager(StaticBaseQuery):
     """ Модель статических запросов, совмещенная с менеджером обработки данных
@@ -105,18 +139,37 @@ class StaticDataManager(StaticBaseQuery):
         """
         super(StaticBaseQuery, self).__init__(connection)
 
-    def _middleware(self, is_method, query, *args):
+    def _middleware(self, is_method, query, *args, **kwargs):
         """ Прослойка для определения типа вызываемого объекта
             (метод или функция)
-        """
+            :param kwargs: stream - потоковая выборка через курсор на стороне
+                сервера, cache - кэш результатов выборки
+        """
+        cache = kwargs.get('cache')
+        if kwargs.get('stream'):
+            runner = self.stream_query
+        elif cache is not None:
+            runner = partial(self.cached_query, cache)
+        else:
+            runner = self.make_read
+
         def wrap_function():
-            return self.make_query(query, *args)
+            return runner(query, *args)
 
         def wrap_method():
-            return self.make_query(query, *args[1:])
+            return runner(query, *args[1:])
 
         return wrap_method() if is_method else wrap_function()
 
+    def _select(self, query, *args, **kwargs):
+        """ Выполнение запроса на выборку. Именованный аргумент cache
+            (caches.TTLCache) включает кэширование результата
+        """
+        cache = kwargs.pop('cache', None)
+        if cache is None:
+            return self.make_read(query, *args, **kwargs)
+        return self.cached_query(cache, query, *args, **kwargs)
+
     def as_generator_of_dictionaries(self, query, *args, **kwargs):
         """ Результат выборки в виде генератора словарей
             :param query: текст SQL запроса
@@ -124,7 +177,7 @@ class StaticDataManager(StaticBaseQuery):
             :param kwargs: служебный словарь для сохранения результатов выборки
         """
         return CustomManager.as_generator_of_dictionaries(
-            self.make_query(query, *args, **kwargs))
+            self.stream_query(query, *args, **kwargs))
 
     def generator_of_dictionaries(self, query):
         """ Результат выборки в виде генератора словарей
@@ -136,7 +189,7 @@ class StaticDataManager(StaticBaseQuery):
             @wraps(function)
             def wrapper(*args, **kwargs):
                 result = CustomManager.as_generator_of_dictionaries(
-                    self._middleware(is_instance, query, *args))
+                    self._middleware(is_instance, query, *args, stream=True))
                 kwargs['result'] = result
                 return function(*args, **kwargs)
 
@@ -150,15 +203,17 @@ class StaticDataManager(StaticBaseQuery):
             :param look4empty: признак игнорирования пустой выборки
             :param query: текст SQL запроса
             :param args: переменные, подставляемые в текст запроса
-            :param kwargs: служебный словарь для сохранения результатов выборки
+            :param kwargs: именованные переменные запроса; cache - кэш
+                результатов выборки (caches.TTLCache)
         """
         return CustomManager.as_dictionaries(
-            self.make_query(query, *args, **kwargs), look4empty)
+            self._select(query, *args, **kwargs), look4empty)
 
-    def dictionaries(self, query, look4empty=False):
+    def dictionaries(self, query, look4empty=False, cache=None):
         """ Результат выборки в виде списка словарей
             :param query: текст SQL запроса (параметр декоратора)
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов выборки (caches.TTLCache)
         """
         def maker(function):
             is_instance = 'self' in function.func_code.co_varnames
@@ -166,7 +221,8 @@ class StaticDataManager(StaticBaseQuery):
             @wraps(function)
             def wrapper(*args, **kwargs):
                 result = CustomManager.as_dictionaries(
-                    self._middleware(is_instance, query, *args), look4empty)
+                    self._middleware(is_instance, query, *args,
+                                     cache=cache), look4empty)
                 kwargs['result'] = result
                 return function(*args, **kwargs)
 
@@ -180,15 +236,17 @@ class StaticDataManager(StaticBaseQuery):
             :param look4empty: признак игнорирования пустой выборки
             :param query: текст SQL запроса
             :param args: переменные, подставляемые в текст запроса
-            :param kwargs: служебный словарь для сохранения результатов выборки
+            :param kwargs: именованные переменные запроса; cache - кэш
+                результатов выборки (caches.TTLCache)
         """
         return CustomManager.as_dictionary(
-            self.make_query(query, *args, **kwargs), look4empty)
+            self._select(query, *args, **kwargs), look4empty)
 
-    def dictionary(self, query, look4empty=False):
+    def dictionary(self, query, look4empty=False, cache=None):
         """ Результат выборки в виде словаря
             :param query: текст SQL запроса
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов выборки (caches.TTLCache)
         """
         def maker(function):
             is_instance = 'self' in function.func_code.co_varnames
@@ -196,7 +254,8 @@ class StaticDataManager(StaticBaseQuery):
             @wraps(function)
             def wrapper(*args, **kwargs):
                 result = CustomManager.as_dictionary(
-                    self._middleware(is_instance, query, *args), look4empty)
+                    self._middleware(is_instance, query, *args,
+                                     cache=cache), look4empty)
                 kwargs['result'] = result
                 return function(*args, **kwargs)
 
@@ -212,7 +271,7 @@ class StaticDataManager(StaticBaseQuery):
             :param kwargs: служебный словарь для сохранения результатов выборки
         """
         return CustomManager.as_generator_of_tuples(
-            self.make_query(query, *args, **kwargs))
+            self.stream_query(query, *args, **kwargs))
 
     def generator_of_tuples(self, query):
         """ Результат выборки в виде генератора кортежей
@@ -224,7 +283,7 @@ class StaticDataManager(StaticBaseQuery):
             @wraps(function)
             def wrapper(*args, **kwargs):
                 result = CustomManager.as_generator_of_tuples(
-                    self._middleware(is_instance, query, *args))
+                    self._middleware(is_instance, query, *args, stream=True))
                 kwargs['result'] = result
                 return function(*args, **kwargs)
 
@@ -238,15 +297,17 @@ class StaticDataManager(StaticBaseQuery):
             :param look4empty: признак игнорирования пустой выборки
             :param query: текст SQL запроса
             :param args: переменные, подставляемые в текст запроса
-            :param kwargs: служебный словарь для сохранения результатов выборки
+            :param kwargs: именованные переменные запроса; cache - кэш
+                результатов выборки (caches.TTLCache)
         """
         return CustomManager.as_tuples(
-            self.make_query(query, *args, **kwargs), look4empty)
+            self._select(query, *args, **kwargs), look4empty)
 
-    def tuples(self, query, look4empty=False):
+    def tuples(self, query, look4empty=False, cache=None):
         """ Результат выборки в виде списка кортежей
             :param query: текст SQL запроса (параметр декоратора)
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов выборки (caches.TTLCache)
         """
         def maker(function):
             is_instance = 'self' in function.func_code.co_varnames
@@ -254,7 +315,8 @@ class StaticDataManager(StaticBaseQuery):
             @wraps(function)
             def wrapper(*args, **kwargs):
                 result = CustomManager.as_tuples(
-                    self._middleware(is_instance, query, *args), look4empty)
+                    self._middleware(is_instance, query, *args,
+                                     cache=cache), look4empty)
                 kwargs['result'] = result
                 return function(*args, **kwargs)
 
@@ -268,15 +330,17 @@ class StaticDataManager(StaticBaseQuery):
             :param look4empty: признак игнорирования пустой выборки
             :param query: текст SQL запроса
             :param args: переменные, подставляемые в текст запроса
-            :param kwargs: служебный словарь для сохранения результатов выборки
+            :param kwargs: именованные переменные запроса; cache - кэш
+                результатов выборки (caches.TTLCache)
         """
         return CustomManager.as_tuple(
-            self.make_query(query, *args, **kwargs), look4empty)
+            self._select(query, *args, **kwargs), look4empty)
 
-    def tuple(self, query, look4empty=False):
+    def tuple(self, query, look4empty=False, cache=None):
         """ Результат выборки в виде
             :param query: текст SQL запроса (параметр декоратора)
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов выборки (caches.TTLCache)
         """
         def maker(function):
             is_instance = 'self' in function.func_code.co_varnames
@@ -284,7 +348,8 @@ class StaticDataManager(StaticBaseQuery):
             @wraps(function)
             def wrapper(*args, **kwargs):
                 result = CustomManager.as_tuple(
-                    self._middleware(is_instance, query, *args), look4empty)
+                    self._middleware(is_instance, query, *args,
+                                     cache=cache), look4empty)
                 kwargs['result'] = result
                 return function(*args, **kwargs)
 
@@ -299,15 +364,17 @@ class StaticDataManager(StaticBaseQuery):
             :param look4empty: признак игнорирования пустой выборки
             :param query: текст SQL запроса
             :param args: переменные, подставляемые в текст запроса
-            :param kwargs: служебный словарь для сохранения результатов выборки
+            :param kwargs: именованные переменные запроса; cache - кэш
+                результатов выборки (caches.TTLCache)
         """
         return CustomManager.as_value(
-            self.make_query(query, *args, **kwargs), look4empty)
+            self._select(query, *args, **kwargs), look4empty)
 
-    def value(self, query, look4empty=False):
+    def value(self, query, look4empty=False, cache=None):
         """ Результат выборки в виде атомарного значения
             :param query: текст SQL запроса (параметр декоратора)
             :param look4empty: признак выполнения пустой выборки
+            :param cache: кэш результатов выборки (caches.TTLCache)
         """
         def maker(function):
             is_instance = 'self' in function.func_code.co_varnames
@@ -315,7 +382,74 @@ class StaticDataManager(StaticBaseQuery):
             @wraps(function)
             def wrapper(*args, **kwargs):
                 result = CustomManager.as_value(
-                    self._middleware(is_instance, query, *args), look4empty)
+                    self._middleware(is_instance, query, *args,
+                                     cache=cache), look4empty)
+                kwargs['result'] = result
+                return function(*args, **kwargs)
+
+            if is_instance:
+                setattr(wrapper, 'is_method', True)
+            return wrapper
+        return maker
+
+    def as_columns(self, look4empty, query, *args, **kwargs):
+        """ Результат выборки по колонкам
+            :param look4empty: признак игнорирования пустой выборки
+            :param query: текст SQL запроса
+            :param args: переменные, подставляемые в текст запроса
+            :param kwargs: именованные переменные запроса; cache - кэш
+                результатов выборки (caches.TTLCache)
+        """
+        return CustomManager.as_columns(
+            self._select(query, *args, **kwargs), look4empty)
+
+    def columns(self, query, look4empty=False, cache=None):
+        """ Результат выборки по колонкам
+            :param query: текст SQL запроса (параметр декоратора)
+            :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов выборки (caches.TTLCache)
+        """
+        def maker(function):
+            is_instance = 'self' in function.func_code.co_varnames
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                result = CustomManager.as_columns(
+                    self._middleware(is_instance, query, *args,
+                                     cache=cache), look4empty)
+                kwargs['result'] = result
+                return function(*args, **kwargs)
+
+            if is_instance:
+                setattr(wrapper, 'is_method', True)
+            return wrapper
+        return maker
+
+    def as_arrays(self, look4empty, query, *args, **kwargs):
+        """ Результат выборки по колонкам в виде массивов
+            :param look4empty: признак игнорирования пустой выборки
+            :param query: текст SQL запроса
+            :param args: переменные, подставляемые в текст запроса
+            :param kwargs: именованные переменные запроса; cache - кэш
+                результатов выборки (caches.TTLCache)
+        """
+        return CustomManager.as_arrays(
+            self._select(query, *args, **kwargs), look4empty)
+
+    def arrays(self, query, look4empty=False, cache=None):
+        """ Результат выборки по колонкам в виде массивов
+            :param query: текст SQL запроса (параметр декоратора)
+            :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов выборки (caches.TTLCache)
+        """
+        def maker(function):
+            is_instance = 'self' in function.func_code.co_varnames
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                result = CustomManager.as_arrays(
+                    self._middleware(is_instance, query, *args,
+                                     cache=cache), look4empty)
                 kwargs['result'] = result
                 return function(*args, **kwargs)
 
@@ -335,21 +469,27 @@ class DynamicDataManager(DynamicBaseQuery):
             объекта (функция или метод)
         """
         table = args[-1]
-        result = self.make_select(table, **kwargs)
+        if kwargs.pop('stream', False):
+            result = self.stream_select(table, **kwargs)
+        else:
+            result = self.make_select(table, **kwargs)
         return (args[0], result) \
             if 'self' in function.func_code.co_varnames else (None, result)
 
     def as_generator_of_dictionaries(self, table, schema='public', items=None,
-                                     orders=None, conditions=None):
+                                     orders=None, conditions=None,
+                                     fetch_size=None):
         """ Результат выборки в виде генератора словарей
             :param table: имя таблицы (представления и т.п.)
             :param schema: имя схемы
             :param items: список колонок на выборку
             :param orders: условия сортировки
             :param conditions: условия выборки
+            :param fetch_size: размер порции строк потоковой выборки
         """
         return CustomManager.as_generator_of_dictionaries(
-            self.make_select(table, schema, items, orders, conditions))
+            self.stream_select(table, schema, items, orders, conditions,
+                               fetch_size))
 
     def generator_of_dictionaries(self, function):
         """ Результат выборки в виде генератора словарей
@@ -357,14 +497,16 @@ class DynamicDataManager(DynamicBaseQuery):
         """
         @wraps(function)
         def wrapper(*args, **kwargs):
-            obj, result = self._middleware(function, *args, **kwargs)
+            obj, result = self._middleware(function, stream=True,
+                                           *args, **kwargs)
             result = CustomManager.as_generator_of_dictionaries(result)
             kwargs['result'] = result
             return function(*args, **kwargs)
         return wrapper
 
     def as_dictionaries(self, table, schema='public', items=None,
-                        orders=None, conditions=None, look4empty=False):
+                        orders=None, conditions=None, look4empty=False,
+                        cache=None):
         """ Результат выборки в виде списка словарей
             :param table: имя таблицы (представления и т.п.)
             :param schema: имя схемы
@@ -372,10 +514,12 @@ class DynamicDataManager(DynamicBaseQuery):
             :param orders: условия сортировки
             :param conditions: условия выборки
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов (caches.TTLCache)
         """
         return CustomManager.as_dictionaries(
             self.make_select(
-                table, schema, items, orders, conditions), look4empty)
+                table, schema, items, orders, conditions, cache),
+            look4empty)
 
     def dictionaries(self, look4empty=False):
         """ Результат выборки в виде списка словарей
@@ -393,7 +537,8 @@ class DynamicDataManager(DynamicBaseQuery):
         return refinement
 
     def as_dictionary(self, table, schema='public', items=None, orders=None,
-                      conditions=None, look4empty=False):
+                      conditions=None, look4empty=False,
+                      cache=None):
         """ Результат выборки в виде одиночного словаря
             :param table: имя таблицы (представления и т.п.)
             :param schema: имя схемы
@@ -401,10 +546,12 @@ class DynamicDataManager(DynamicBaseQuery):
             :param orders: условия сортировки
             :param conditions: условия выборки
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов (caches.TTLCache)
         """
         return CustomManager.as_dictionary(
             self.make_select(
-                table, schema, items, orders, conditions), look4empty)
+                table, schema, items, orders, conditions, cache),
+            look4empty)
 
     def dictionary(self, look4empty=False):
         """ Результат выборки в виде одиночного словаря
@@ -422,16 +569,18 @@ class DynamicDataManager(DynamicBaseQuery):
         return refinement
 
     def as_generator_of_tuples(self, table, schema='public', items=None,
-                               orders=None, conditions=None):
+                               orders=None, conditions=None, fetch_size=None):
         """ Результат выборки в виде генератора кортежей
             :param table: имя таблицы (представления и т.п.)
             :param schema: имя схемы
             :param items: список колонок на выборку
             :param orders: условия сортировки
             :param conditions: условия выборки
+            :param fetch_size: размер порции строк потоковой выборки
         """
         return CustomManager.as_generator_of_tuples(
-            self.make_select(table, schema, items, orders, conditions))
+            self.stream_select(table, schema, items, orders, conditions,
+                               fetch_size))
 
     def generator_of_tuples(self, function):
         """ Результат выборки в виде генератора кортежей
@@ -439,14 +588,16 @@ class DynamicDataManager(DynamicBaseQuery):
         """
         @wraps(function)
         def wrapper(*args, **kwargs):
-            obj, result = self._middleware(function, *args, **kwargs)
+            obj, result = self._middleware(function, stream=True,
+                                           *args, **kwargs)
             result = CustomManager.as_generator_of_tuples(result)
             kwargs['result'] = result
             return function(*args, **kwargs)
         return wrapper
 
     def as_tuples(self, table, schema='public', items=None, orders=None,
-                  conditions=None, look4empty=False):
+                  conditions=None, look4empty=False,
+                  cache=None):
         """ Результат выборки в виде списка кортежей
             :param table: имя таблицы (представления и т.п.)
             :param schema: имя схемы
@@ -454,10 +605,12 @@ class DynamicDataManager(DynamicBaseQuery):
             :param orders: условия сортировки
             :param conditions: условия выборки
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов (caches.TTLCache)
         """
         return CustomManager.as_tuples(
             self.make_select(
-                table, schema, items, orders, conditions), look4empty)
+                table, schema, items, orders, conditions, cache),
+            look4empty)
 
     def tuples(self, look4empty=False):
         """ Результат выборки в виде списка кортежей
@@ -475,7 +628,8 @@ class DynamicDataManager(DynamicBaseQuery):
         return refinement
 
     def as_tuple(self, table, schema='public', items=None, orders=None,
-                 conditions=None, look4empty=False):
+                 conditions=None, look4empty=False,
+                 cache=None):
         """ Результат выборки в виде одиночного кортежа
             :param table: имя таблицы (представления и т.п.)
             :param schema: имя схемы
@@ -483,10 +637,12 @@ class DynamicDataManager(DynamicBaseQuery):
             :param orders: условия сортировки
             :param conditions: условия выборки
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов (caches.TTLCache)
         """
         return CustomManager.as_tuple(
             self.make_select(
-                table, schema, items, orders, conditions), look4empty)
+                table, schema, items, orders, conditions, cache),
+            look4empty)
 
     def tuple(self, look4empty=False):
         """ Результат выборки в виде одиночного кортежа
@@ -504,7 +660,8 @@ class DynamicDataManager(DynamicBaseQuery):
         return refinement
 
     def as_value(self, table, schema='public', items=None, orders=None,
-                 conditions=None, look4empty=False):
+                 conditions=None, look4empty=False,
+                 cache=None):
         """ Результат выборки в виде атомарного значения (первая колонка
             первой строки)
             :param table: имя таблицы (представления и т.п.)
@@ -513,10 +670,12 @@ class DynamicDataManager(DynamicBaseQuery):
             :param orders: условия сортировки
             :param conditions: условия выборки
             :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов (caches.TTLCache)
         """
         return CustomManager.as_value(
             self.make_select(
-                table, schema, items, orders, conditions), look4empty)
+                table, schema, items, orders, conditions, cache),
+            look4empty)
 
     def value(self, look4empty=False):
         """ Результат выборки в виде атомарного значения
@@ -533,3 +692,67 @@ class DynamicDataManager(DynamicBaseQuery):
                 return function(*args, **kwargs)
             return wrapper
         return refinement
+
+    def as_columns(self, table, schema='public', items=None, orders=None,
+                   conditions=None, look4empty=False,
+                   cache=None):
+        """ Результат выборки по колонкам
+            :param table: имя таблицы (представления и т.п.)
+            :param schema: имя схемы
+            :param items: список колонок на выборку
+            :param orders: условия сортировки
+            :param conditions: условия выборки
+            :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов (caches.TTLCache)
+        """
+        return CustomManager.as_columns(
+            self.make_select(
+                table, schema, items, orders, conditions, cache),
+            look4empty)
+
+    def columns(self, look4empty=False):
+        """ Результат выборки по колонкам
+            :param look4empty: признак игнорирования пустой выборки
+                (параметр декоратора)
+        """
+        def refinement(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                obj, result = self._middleware(function, *args, **kwargs)
+                result = CustomManager.as_columns(result, look4empty)
+                kwargs['result'] = result
+                return function(*args, **kwargs)
+            return wrapper
+        return refinement
+
+    def as_arrays(self, table, schema='public', items=None, orders=None,
+                  conditions=None, look4empty=False,
+                  cache=None):
+        """ Результат выборки по колонкам в виде массивов
+            :param table: имя таблицы (представления и т.п.)
+            :param schema: имя схемы
+            :param items: список колонок на выборку
+            :param orders: условия сортировки
+            :param conditions: условия выборки
+            :param look4empty: признак игнорирования пустой выборки
+            :param cache: кэш результатов (caches.TTLCache)
+        """
+        return CustomManager.as_arrays(
+            self.make_select(
+                table, schema, items, orders, conditions, cache),
+            look4empty)
+
+    def arrays(self, look4empty=False):
+        """ Результат выборки по колонкам в виде массивов
+            :param look4empty: признак игнорирования пустой выборки
+                (параметр декоратора)
+        """
+        def refinement(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                obj, result = self._middleware(function, *args, **kwargs)
+                result = CustomManager.as_arrays(result, look4empty)
+                kwargs['result'] = result
+                return function(*args, **kwargs)
+            return wrapper
+        return refinement
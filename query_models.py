@@ -3,26 +3,288 @@
     Анти-ORM пакет для работы с базами данных PostgreSQL
     Классы построения динамических и статических SQL запросов
 """
-from custom_errors import MakeQueryError, RunQueryError
+import re
+import sys
+import threading
+import time
+import weakref
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+from caches import LRUCache
+import content
+from content import ResultSet
+from copy_stream import CopyReader, CopyWriter
+from custom_errors import MakeQueryError, RunQueryError, TransactionError
+from metrics import row_count, take_wait
+from profiler import ASSEMBLY, EXECUTE, timed
+from translators.base_translators import PgArray, PgBulkArray, PgTranslator
+
+# Признак потока общего пула параллельного выполнения запросов
+_GATHER = threading.local()
+
+
+def _call(method, args, kwargs):
+    """ Вызов функции; исключение возвращается вместо результата """
+    try:
+        return method(*args, **kwargs)
+    except Exception as err:
+        return err
+
+
+def _gathered(method, args, kwargs):
+    """ Вызов функции в потоке общего пула """
+    _GATHER.worker = True
+    return _call(method, args, kwargs)
+
+
+def _traced(method):
+    """ Вызов функции в потоке общего пула с сохранением
+        сведений об исключении
+        :return: (результат, None) либо (None, sys.exc_info())
+    """
+    _GATHER.worker = True
+    try:
+        return method(), None
+    except Exception:
+        return None, sys.exc_info()
+
+
+def parallel(calls):
+    """ Одновременное выполнение функций в потоках общего пула
+        (см. BaseQuery.gather). При вызове из потока пула функции
+        выполняются последовательно
+        :param calls: список функций без аргументов
+        :return: список результатов в порядке функций. Исключение первой
+            (по порядку) функции, завершившейся ошибкой, передается
+            вызывающему
+    """
+    if len(calls) == 1 or getattr(_GATHER, 'worker', False):
+        return [call() for call in calls]
+
+    workers = BaseQuery._workers()
+    pending = [workers.apply_async(_traced, (call,)) for call in calls]
+    results = [waiter.get() for waiter in pending]
+    for _, error in results:
+        if error is not None:
+            raise error[0], error[1], error[2]
+    return [result for result, _ in results]
 
 
 class BaseQuery(object):
     """ Базовый класс построения и выполнения SQL запросов """
+    # Размер порции строк при потоковой выборке
+    fetch_size = 1000
+    # Передача значений драйверу отдельно от текста запроса
+    bind_params = False
+    # Выполнение шаблонных запросов подготовленными операторами
+    prepared = False
+    # Выполнение запросов на чтение на репликах (если они заданы)
+    route_reads = True
+    # Реестр метрик выполнения запросов (metrics.MetricsRegistry),
+    # None - метрики не собираются
+    metrics = None
+    # Журнал медленных запросов с планами выполнения
+    # (slow_queries.SlowQueryLog), None - журнал не ведется
+    slow_log = None
+    # Шаблон и форматы выгрузки данных командой COPY
+    COPY_OUT = "COPY %(source)s TO STDOUT WITH (%(options)s);"
+    COPY_FORMATS = ('csv', 'text', 'binary')
+    # Начало текста запроса (в отличие от имени таблицы) для COPY
+    COPY_QUERY = re.compile(r"(?:SELECT|WITH|VALUES|TABLE)\b", re.I)
+    # Число потоков общего пула параллельного выполнения запросов (gather)
+    gather_workers = 16
+    __workers = None
+    __workers_lock = threading.Lock()
+
     def __init__(self, connection):
         """ Конструктор класса
             :param connection: открытое подключение к источнику данных
         """
         self.__conn = connection
 
-    def raw_query(self, query):
+    def __method(self, name, read):
+        """ Метод подключения. Запрос на чтение передается методу read_*
+            подключения с репликами (см. connection.ConnectionRouted)
+            :param name: имя метода (query, prepared или stream)
+            :param read: признак запроса на чтение
+        """
+        if read and self.route_reads:
+            method = getattr(self.__conn, 'read_' + name, None)
+            if method is not None:
+                return method
+        return getattr(self.__conn, 'stream_query' if name == 'stream'
+                       else 'run_' + name)
+
+    def raw_query(self, query, params=None, read=False):
         """ Выполнение SQL запроса из переданной строки
             :param query: строка с запросом
+            :param params: параметры запроса, передаваемые драйверу
+            :param read: запрос только читает данные и может быть
+                выполнен на реплике
+            :return: результат выполнения запроса
+        """
+        return self.__run('query', read, query, params)
+
+    def raw_prepared(self, query, params=None, read=False):
+        """ Выполнение SQL запроса подготовленным оператором
+            из кэша подключения
+            :param query: строка с запросом (заполнители %s или %(имя)s)
+            :param params: параметры запроса
+            :param read: запрос только читает данные
             :return: результат выполнения запроса
         """
+        return self.__run('prepared', read, query, params)
+
+    @timed(EXECUTE)
+    def __run(self, name, read, query, params):
+        """ Выполнение запроса методом подключения с учетом метрик
+            в реестре metrics и журнале медленных запросов slow_log
+            (если они заданы)
+        """
+        method = self.__method(name, read)
+        registry, slow_log = self.metrics, self.slow_log
+        if registry is None and slow_log is None:
+            try:
+                return method(query, params)
+            except Exception as err:
+                raise RunQueryError(*err.args, cause=err)
+
+        take_wait()
+        started = time.time()
         try:
-            return self.__conn.run_query(query)
+            result = method(query, params)
         except Exception as err:
-            raise RunQueryError(*err.args)
+            if registry is not None:
+                registry.observe(query, time.time() - started, take_wait(),
+                                 error=getattr(err, 'origin', None) or
+                                 err.__class__.__name__)
+            raise RunQueryError(*err.args, cause=err)
+        seconds = time.time() - started
+        if registry is not None:
+            registry.observe(query, seconds, take_wait(), row_count(result))
+        if slow_log is not None:
+            slow_log.observe(query, params, seconds,
+                             lambda statement: self.__explain(
+                                 statement, params, read))
+        return result
+
+    def __explain(self, statement, params, read):
+        """ Выполнение запроса EXPLAIN ANALYZE. Внутри открытой транзакции
+            запрос выполняется до точки сохранения, к которой затем
+            выполняется откат (ошибка запроса не прерывает транзакцию).
+            Вне транзакции запрос на изменение данных выполняется
+            в отдельной транзакции, которая откатывается
+            :param statement: текст запроса EXPLAIN
+            :param params: параметры запроса
+            :param read: запрос только читает данные
+            :return: план выполнения запроса
+        """
+        conn = self.__conn
+        if self.is_opened:
+            conn.run_query("SAVEPOINT shoe2_explain")
+            try:
+                result = conn.run_query(statement, params)
+            finally:
+                conn.run_query("ROLLBACK TO SAVEPOINT shoe2_explain")
+        elif read:
+            result = self.__method('query', True)(statement, params)
+        elif not hasattr(conn, 'begin'):
+            raise TransactionError(type=2).describe(
+                u"Подключение не поддерживает транзакции")
+        else:
+            conn.begin()
+            try:
+                result = conn.run_query(statement, params)
+            finally:
+                conn.rollback()
+        return result[0].to_tuple()[0]
+
+    def raw_stream(self, query, fetch_size=None, params=None, read=False):
+        """ Потоковое выполнение SQL запроса на выборку через курсор
+            на стороне сервера
+            :param query: строка с запросом
+            :param fetch_size: размер порции строк (по умолчанию fetch_size)
+            :param params: параметры запроса, передаваемые драйверу
+            :param read: запрос только читает данные
+            :return: генератор строк выборки
+        """
+        return self.__method('stream', read)(
+            query, fetch_size or self.fetch_size, params)
+
+    @timed(EXECUTE)
+    def raw_copy_in(self, query, stream, size=65536):
+        """ Загрузка данных командой COPY ... FROM STDIN
+            :param query: текст команды COPY
+            :param stream: файлоподобный объект с данными
+            :param size: размер порции чтения
+            :return: число загруженных строк
+        """
+        try:
+            return self.__conn.copy_in(query, stream, size)
+        except Exception as err:
+            raise RunQueryError(*err.args, cause=err)
+
+    @timed(EXECUTE)
+    def raw_copy_out(self, query, stream, size=65536):
+        """ Выгрузка данных командой COPY ... TO STDOUT
+            :param query: текст команды COPY
+            :param stream: файлоподобный объект для записи данных
+            :param size: размер порции
+            :return: число выгруженных строк
+        """
+        try:
+            return self.__conn.copy_out(query, stream, size)
+        except Exception as err:
+            raise RunQueryError(*err.args, cause=err)
+
+    @timed(ASSEMBLY)
+    def make_copy_out(self, table_or_query, sink, format='csv', header=False,
+                      size=65536):
+        """ Потоковая выгрузка таблицы или результата запроса командой
+            COPY ... TO STDOUT. Данные передаются приемнику буферами
+            фиксированного размера, минуя построчную обработку
+            :param table_or_query: имя таблицы (schema.table) или текст
+                запроса на выборку
+            :param sink: приемник данных: файлоподобный объект, сокет
+                или функция обратного вызова
+            :param format: формат выгрузки: 'csv', 'text' или 'binary'
+            :param header: строка заголовков (только для csv)
+            :param size: размер буфера (байт)
+            :return: словарь {'rows': число выгруженных строк,
+                'bytes': объем данных, 'seconds': время выгрузки,
+                'rows_per_second': скорость}
+        """
+        if format not in self.COPY_FORMATS:
+            raise MakeQueryError(code=2).\
+                describe(u"Неизвестный формат выгрузки")
+        if format not in getattr(content.MARKER, 'copy_formats',
+                                 self.COPY_FORMATS):
+            raise MakeQueryError(code=2).\
+                describe(u"Формат выгрузки не поддерживается драйвером")
+
+        source = table_or_query.strip().rstrip(';')
+        if self.COPY_QUERY.match(source):
+            source = "(%s)" % source
+
+        options = "FORMAT %s" % format
+        if header and format == 'csv':
+            options += ", HEADER"
+        query = self.COPY_OUT % {'source': source, 'options': options}
+
+        stream = CopyWriter(sink, size)
+        started = time.time()
+        count = self.raw_copy_out(query, stream, size)
+        stream.flush()
+        seconds = time.time() - started
+
+        return {'rows': count, 'bytes': stream.bytes, 'seconds': seconds,
+                'rows_per_second': count / seconds if seconds > 0 else None}
+
+    @property
+    def is_opened(self):
+        """ Признак открытой транзакции на подключении """
+        return getattr(self.__conn, 'is_opened', False)
 
     def begin(self):
         """ Открытие транзакции """
@@ -36,6 +298,61 @@ class BaseQuery(object):
         """ Откат транзакции """
         self.__conn.rollback()
 
+    @classmethod
+    def _workers(cls):
+        """ Общий пул потоков параллельного выполнения запросов """
+        with BaseQuery.__workers_lock:
+            if BaseQuery.__workers is None:
+                BaseQuery.__workers = ThreadPool(cls.gather_workers)
+            return BaseQuery.__workers
+
+    def gather(self, specs, timeout=None):
+        """ Одновременное выполнение независимых запросов в потоках
+            общего пула. Параллельно запросы выполняются только
+            на подключениях, допускающих запросы из разных потоков
+            (типы POOL и LOCAL, признак concurrent). На прочих
+            подключениях, внутри транзакции и при вызове из потока пула
+            запросы выполняются последовательно в текущем потоке, время
+            ожидания при этом не ограничивается. Запрос, не уложившийся
+            во время ожидания, не прерывается: он выполняется
+            до завершения и до тех пор занимает поток общего пула
+            :param specs: описания запросов вида (метод, позиционные
+                аргументы[, именованные аргументы[, время ожидания]]),
+                метод - имя метода модели или функция
+            :param timeout: время ожидания результата запроса (секунд)
+                от вызова gather, None - без ограничения
+            :return: список результатов в порядке описаний. На месте
+                запроса, завершившегося ошибкой, находится исключение,
+                на месте не уложившегося во время ожидания - RunQueryError
+        """
+        calls = []
+        for spec in specs:
+            method = spec[0] if callable(spec[0]) else getattr(self, spec[0])
+            calls.append((method, tuple(spec[1]) if len(spec) > 1 else (),
+                          spec[2] if len(spec) > 2 and spec[2] else {},
+                          spec[3] if len(spec) > 3 else timeout))
+
+        if self.is_opened or getattr(_GATHER, 'worker', False) or \
+                not getattr(self.__conn, 'concurrent', False):
+            return [_call(*call[:3]) for call in calls]
+
+        started = time.time()
+        workers = self._workers()
+        pending = [(workers.apply_async(_gathered, call[:3]), call[3])
+                   for call in calls]
+        results = []
+        for waiter, limit in pending:
+            try:
+                if limit is None:
+                    results.append(waiter.get())
+                else:
+                    results.append(waiter.get(
+                        max(0, started + limit - time.time())))
+            except TimeoutError:
+                results.append(RunQueryError(type=2).describe(
+                    u"Истекло время ожидания результата запроса"))
+        return results
+
     @staticmethod
     def _prepare_query(query_string, *args, **kwargs):
         """ Подготовка SQL запроса к выполнению
@@ -53,16 +370,74 @@ class BaseQuery(object):
             raise MakeQueryError(*err.args)
         return query_string
 
+    @staticmethod
+    def _placeholder(value, params):
+        """ Заполнитель параметра запроса. Значение объекта-транслятора Pg*
+            передается драйвером, в текст запроса попадает заполнитель
+            с приведением типа (например, %s::int4). Прочие значения,
+            в том числе PgArray, встраиваются в текст запроса как есть
+            (с экранированием '%')
+            :param value: значение или объект-транслятор
+            :param params: список параметров, пополняемый значением
+            :return: заполнитель либо значение для подстановки в текст
+        """
+        if isinstance(value, PgTranslator) and \
+                not isinstance(value, PgArray):
+            params.append(value.raw())
+            return value.pg_pattern.format('%s')
+        return ("%s" % value).replace('%', '%%')
+
+    @classmethod
+    def _bind_query(cls, query_string, *args, **kwargs):
+        """ Подготовка SQL запроса с передачей значений драйверу
+            :param query_string: шаблон запроса (форматированная строка)
+            :param args: позиционые аргументы
+            :param kwargs: именованные аргументы
+            :return: (строка запроса с заполнителями, параметры)
+        """
+        if not (args or kwargs):
+            return query_string, None
+
+        # экранирование остается в силе и для драйвера
+        template = query_string.replace('%%', '%%%%')
+        try:
+            if args:
+                params = []
+                holders = tuple([cls._placeholder(i, params) for i in args])
+            else:
+                params = {}
+                holders = {}
+                for key, value in kwargs.items():
+                    values = []
+                    holder = cls._placeholder(value, values)
+                    if values:
+                        holder = holder.replace('%s', '%%(%s)s' % key)
+                        params[key] = values[0]
+                    holders[key] = holder
+            query = template % holders
+        except Exception as err:
+            raise MakeQueryError(*err.args)
+        if not params:
+            # все значения встроены в текст запроса
+            return cls._prepare_query(query_string, *args, **kwargs), None
+        return query, params
+
     @staticmethod
     def as_dict(result):
         """ Возвращаем результат в виде списка словарей
             :param result: результат выполнения запроса
             :return: список словарей с результатом выборки
         """
-        if result:
+        empty = True
+        if isinstance(result, ResultSet):
+            for r in result.dicts():
+                empty = False
+                yield r
+        elif result:
             for r in result:
+                empty = False
                 yield r.to_dict()
-        else:
+        if empty:
             yield None
 
     @staticmethod
@@ -71,21 +446,106 @@ class BaseQuery(object):
             :param result: результат выполнения запроса
             :return: список кортежей с результатом выборки
         """
-        if result:
+        empty = True
+        if isinstance(result, ResultSet):
+            for r in result.rows:
+                empty = False
+                yield r
+        elif result:
             for r in result:
+                empty = False
                 yield r.to_tuple()
-        else:
+        if empty:
             yield None
 
 
 class StaticBaseQuery(BaseQuery):
     """ Выполнение шаблонных запросов """
+    # Запросы, которые можно выполнить на реплике
+    READ_QUERY = re.compile(r"\s*(?:\(\s*)*SELECT\b", re.I)
+    LOCKING = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE)\b|"
+                         r"\bFOR\s+KEY\s+SHARE\b|\bINTO\b", re.I)
+
     def __init__(self, connection):
         super(StaticBaseQuery, self).__init__(connection)
 
+    @timed(ASSEMBLY)
+    def _compose(self, query, *args, **kwargs):
+        """ Окончательный текст запроса и параметры для драйвера
+            :return: (текст запроса, параметры или None)
+        """
+        if self.prepared:
+            query, params = self._bind_query(query, *args, **kwargs)
+            if params is None:
+                # текст без аргументов не содержит заполнителей
+                query = query.replace('%', '%%')
+            return query, params
+        if self.bind_params:
+            return self._bind_query(query, *args, **kwargs)
+        return self._prepare_query(query, *args, **kwargs), None
+
+    def _execute(self, query, params, read=False):
+        """ Выполнение подготовленного функцией _compose запроса """
+        if self.prepared:
+            return self.raw_prepared(query, params, read)
+        return self.raw_query(query, params, read)
+
+    @classmethod
+    def _is_read(cls, query):
+        """ Признак запроса, только читающего данные: SELECT
+            без блокировки строк
+        """
+        return bool(cls.READ_QUERY.match(query)) and \
+            not cls.LOCKING.search(query)
+
     def make_query(self, query, *args, **kwargs):
+        return self._execute(*self._compose(query, *args, **kwargs))
+
+    def make_read(self, query, *args, **kwargs):
+        """ Выполнение запроса на выборку. Запрос SELECT без блокировки
+            строк выполняется на реплике, если подключение их использует
+            :param query: шаблон запроса
+            :param args: позиционые аргументы
+            :param kwargs: именованные аргументы
+            :return: результат выполнения запроса
+        """
+        query, params = self._compose(query, *args, **kwargs)
+        return self._execute(query, params, self._is_read(query))
+
+    def cached_query(self, cache, query, *args, **kwargs):
+        """ Выполнение запроса с сохранением результата в кэше.
+            Ключом записи служит окончательный текст запроса вместе
+            с параметрами, передаваемыми драйверу. Запрос с параметрами,
+            не допускающими хэширования, и запрос внутри открытой
+            транзакции (он видит ее незафиксированные изменения)
+            выполняются без кэша
+            :param cache: кэш результатов (caches.TTLCache)
+            :param query: шаблон запроса
+            :param args: позиционые аргументы
+            :param kwargs: именованные аргументы
+            :return: результат выполнения запроса
+        """
+        query, params = self._compose(query, *args, **kwargs)
+        if isinstance(params, dict):
+            key = query, tuple(sorted(params.items()))
+        else:
+            key = query, params if params is None else tuple(params)
+        read = self._is_read(query)
+        if self.is_opened:
+            return self._execute(query, params, read)
+        try:
+            hash(key)
+        except TypeError:
+            return self._execute(query, params, read)
+        return cache.load(key, lambda: self._execute(query, params, read))
+
+    def stream_query(self, query, *args, **kwargs):
+        read = self._is_read(query)
+        if self.bind_params:
+            query, params = self._bind_query(query, *args, **kwargs)
+            return self.raw_stream(query, params=params, read=read)
         query = self._prepare_query(query, *args, **kwargs)
-        return self.raw_query(query)
+        return self.raw_stream(query, read=read)
 
 
 class DynamicBaseQuery(BaseQuery):
@@ -98,16 +558,178 @@ class DynamicBaseQuery(BaseQuery):
     UPDATE = "UPDATE %(schema)s.%(table)s SET %(items)s WHERE %(conditions)s;"
     DELETE = "DELETE FROM %(schema)s.%(table)s WHERE %(conditions)s;"
     FULL_DELETE = "TRUNCATE TABLE %(schema)s.%(table)s;"
+    COPY_IN = "COPY %(schema)s.%(table)s %(columns)s FROM STDIN;"
+    # Условия сравнения с элементами массива: {операция: шаблон}
+    ANY_OPERATIONS = {'IN': "= ANY(%s)", '= ANY': "= ANY(%s)",
+                      'NOT IN': "<> ALL(%s)", '<> ALL': "<> ALL(%s)"}
+    # Значения условий ANY_OPERATIONS, передаваемые массивом
+    ARRAY_VALUES = (list, tuple, set, frozenset, PgArray, PgBulkArray)
+    # Кэш скомпилированных шаблонов запросов (None - без кэширования)
+    templates = LRUCache(512)
 
     def __init__(self, connection):
         super(DynamicBaseQuery, self).__init__(connection)
+        # Кэши результатов выборок, сбрасываемые при записи в таблицы
+        self.__caches = weakref.WeakSet()
+        # Таблицы, измененные в открытой транзакции (None - вне транзакции)
+        self.__written = None
+
+    def begin(self):
+        """ Открытие транзакции """
+        super(DynamicBaseQuery, self).begin()
+        self.__written = set()
+
+    def commit(self):
+        """ Завершение транзакции """
+        super(DynamicBaseQuery, self).commit()
+        self.__release()
+
+    def rollback(self):
+        """ Откат транзакции """
+        super(DynamicBaseQuery, self).rollback()
+        self.__release()
+
+    def __release(self):
+        """ Повторный сброс кэшированных выборок из таблиц, измененных
+            в транзакции: до ее завершения кэш мог быть заполнен
+            прежними данными из других подключений
+        """
+        written, self.__written = self.__written, None
+        for tag in written or ():
+            for cache in list(self.__caches):
+                cache.invalidate(tag)
+
+    def _invalidate(self, schema, table):
+        """ Сброс кэшированных выборок из таблицы после записи в нее
+            :param schema: имя схемы
+            :param table: имя таблицы
+        """
+        tag = (schema or 'public', table)
+        for cache in list(self.__caches):
+            cache.invalidate(tag)
+        if self.__written is not None:
+            self.__written.add(tag)
+
+    def _value(self, value, params):
+        """ Значение для подстановки в текст запроса. В режиме bind_params
+            значения объектов-трансляторов Pg* передаются драйверу отдельно,
+            остальные значения встраиваются в текст с экранированием '%'
+            :param value: значение или объект-транслятор
+            :param params: список параметров запроса
+        """
+        if not self.bind_params:
+            return "%s" % value
+        return self._placeholder(value, params)
+
+    @classmethod
+    def _condition_shape(cls, conditions):
+        """ Разделение условий выборки на форму и значения. Значения условий
+            IN / = ANY, заданные последовательностью, передаются одним
+            литералом массива (PgBulkArray). Прочие значения (например,
+            строка '(SELECT id FROM t)') подставляются в запрос как есть
+            :param conditions: словарь {имя колонки: (операция сравнения,
+                сравниваемое значение)}
+            :return: (кортеж троек (колонка, операция, признак массива),
+                список значений)
+        """
+        if not conditions:
+            return (), []
+        shape, values = [], []
+        for column, (operation, value) in conditions.items():
+            array = operation.upper() in cls.ANY_OPERATIONS and \
+                isinstance(value, cls.ARRAY_VALUES)
+            if array and not isinstance(value, PgTranslator):
+                value = PgBulkArray()(value)
+            shape.append((column, operation, array))
+            values.append(value)
+        return tuple(shape), values
+
+    def _condition_template(self, shape):
+        """ Шаблон условий выборки, объединенных через AND
+            :param shape: кортеж троек (колонка, операция, признак массива)
+        """
+        if not shape:
+            return "1 = 1"
+        esc = self._escape
+        conditions = []
+        for column, operation, array in shape:
+            if array:
+                any_operation = self.ANY_OPERATIONS[operation.upper()]
+                conditions.append("%s %s" % (esc(column), any_operation))
+            else:
+                conditions.append("%s %s %%s" % (esc(column), esc(operation)))
+        return " AND ".join(conditions)
+
+    def _escape(self, text):
+        """ Экранирование '%' в неизменной части шаблона запроса """
+        text = "%s" % text
+        if '%' not in text:
+            return text
+        return text.replace('%', '%%%%' if self.bind_params else '%%')
 
+    def _compiled(self, key):
+        """ Скомпилированный шаблон запроса из кэша templates
+            :param key: форма запроса (таблица, колонки, условия и т.п.)
+            :return: шаблон либо None, если он еще не построен
+        """
+        if self.templates is None:
+            return None
+        return self.templates.get((key, self.bind_params), None)
+
+    def _compile(self, key, template):
+        """ Сохранение построенного шаблона в кэше templates
+            :param key: форма запроса
+            :param template: шаблон с заполнителями %s на месте значений
+            :return: шаблон
+        """
+        if self.templates is not None:
+            self.templates.put((key, self.bind_params), template)
+        return template
+
+    def _fill(self, template, values):
+        """ Подстановка значений в скомпилированный шаблон
+            :param template: шаблон запроса
+            :param values: значения в порядке заполнителей
+            :return: (строка запроса, параметры или None)
+        """
+        if not self.bind_params:
+            return template % tuple(values), None
+        params = []
+        query = template % tuple([self._value(i, params) for i in values])
+        return self._finish(query, params)
+
+    def _finish(self, query, params):
+        """ Завершение подготовки запроса: без параметров текст передается
+            драйверу как есть, поэтому экранирование '%' снимается
+            :return: (строка запроса, параметры или None)
+        """
+        if params:
+            return query, params
+        if self.bind_params:
+            query = query.replace('%%', '%')
+        return query, None
+
+    @staticmethod
+    def _columns(columns):
+        """ Список колонок для запросов на вставку
+            :param columns: список с именами колонок
+            :return: строка вида (col1,col2,...) или пустая строка
+        """
+        if not columns:
+            return ''
+        if not isinstance(columns, (list, tuple)):
+            raise MakeQueryError(code=2).\
+                describe(u"Имена колонок передаются списком или кортежем")
+        return "(%s)" % ",".join(columns)
+
+    @timed(ASSEMBLY)
     def make_insert(self, table, schema='public', columns=None, values=None):
         """ Вставка строки в таблицу
             :param table: наименование таблицы
             :param schema: наименование схемы
             :param columns: список с именами колонок
-            :param values: список со значениями
+            :param values: список со значениями либо список строк значений
+                (в этом случае выполняется пакетная вставка make_insert_many)
             :return: результат выполнения запроса
         """
         query = self.INSERT
@@ -120,9 +742,13 @@ class DynamicBaseQuery(BaseQuery):
             raise MakeQueryError(code=2).\
                 describe(u"Данные для записи передаются списком или кортежем")
 
+        if isinstance(values[0], (tuple, list)):
+            return self.make_insert_many(table, schema, columns, values)
+
+        params = []
         pattern = {'schema': schema or 'public', 'table': table,
-                   'values': "(%s)" % values[0] if len(values) == 1
-                   else "(%s)" % ",".join(["%s" % i for i in values])
+                   'values': "(%s)" % ",".join([self._value(i, params)
+                                                for i in values])
                    }
 
         if columns:
@@ -136,8 +762,124 @@ class DynamicBaseQuery(BaseQuery):
             query = query.replace('%(columns)s', '')
 
         query = self._prepare_query(query, **pattern)
-        return self.raw_query(query)
+        try:
+            return self.raw_query(*self._finish(query, params))
+        finally:
+            self._invalidate(schema, table)
 
+    @timed(ASSEMBLY)
+    def make_insert_many(self, table, schema='public', columns=None,
+                         rows=None, batch_rows=1000, batch_bytes=1048576,
+                         transaction=False):
+        """ Пакетная вставка строк запросами вида
+            INSERT ... VALUES (...),(...),...
+            Строки разбиваются на пакеты не длиннее batch_rows строк
+            и batch_bytes байт значений
+            :param table: наименование таблицы
+            :param schema: наименование схемы
+            :param columns: список с именами колонок
+            :param rows: итерируемый источник строк (списков значений)
+            :param batch_rows: наибольшее число строк в пакете
+            :param batch_bytes: наибольший размер значений пакета (байт)
+            :param transaction: выполнить все пакеты в одной транзакции
+            :return: число вставленных строк
+        """
+        if not rows:
+            raise MakeQueryError(code=1).\
+                describe(u"Недостаточно данных для записи")
+
+        pattern = {'schema': schema or 'public', 'table': table,
+                   'columns': self._columns(columns)}
+
+        def run(batch, params):
+            pattern['values'] = ",".join(batch)
+            query = self._prepare_query(self.INSERT, **pattern)
+            result = self.raw_query(*self._finish(query, params))
+            return result[0].counter if result else 0
+
+        if transaction:
+            self.begin()
+
+        total = 0
+        try:
+            batch, params, length = [], [], 0
+            for row in rows:
+                if not row or not isinstance(row, (tuple, list)):
+                    raise MakeQueryError(code=2).\
+                        describe(u"Данные для записи передаются "
+                                 u"списком или кортежем")
+
+                row_params = []
+                item = "(%s)" % ",".join([self._value(i, row_params)
+                                          for i in row])
+                # размер строки запроса в байтах (после кодирования)
+                size = len(item.encode('utf-8')
+                           if isinstance(item, unicode) else item)
+                if batch and (len(batch) >= batch_rows or
+                              length + size > batch_bytes):
+                    total += run(batch, params)
+                    batch, params, length = [], [], 0
+                batch.append(item)
+                params.extend(row_params)
+                length += size + 1
+
+            if batch:
+                total += run(batch, params)
+        except Exception:
+            if transaction:
+                self.rollback()
+            raise
+        finally:
+            self._invalidate(schema, table)
+
+        if transaction:
+            self.commit()
+        return total
+
+    @timed(ASSEMBLY)
+    def make_copy_in(self, table, schema='public', columns=None, rows=None,
+                     translators=None, chunk_size=65536):
+        """ Пакетная загрузка строк в таблицу командой COPY ... FROM STDIN
+            :param table: наименование таблицы
+            :param schema: наименование схемы
+            :param columns: список с именами колонок
+            :param rows: итерируемый источник кортежей значений
+                или файлоподобный объект с данными в текстовом формате COPY
+            :param translators: кортеж классов преобразования Pg*
+                для значений колонок
+            :param chunk_size: размер порции передаваемых данных (байт)
+            :return: словарь {'rows': число загруженных строк,
+                'seconds': время загрузки, 'rows_per_second': скорость}.
+                Если драйвер не сообщает число строк файлоподобного
+                источника, rows и rows_per_second равны None
+        """
+        if rows is None:
+            raise MakeQueryError(code=1).\
+                describe(u"Недостаточно данных для записи")
+
+        pattern = {'schema': schema or 'public', 'table': table,
+                   'columns': self._columns(columns)}
+
+        stream = rows if hasattr(rows, 'read') else CopyReader(rows,
+                                                               translators)
+        query = self._prepare_query(self.COPY_IN, **pattern)
+
+        started = time.time()
+        try:
+            count = self.raw_copy_in(query, stream, chunk_size)
+        finally:
+            self._invalidate(schema, table)
+        seconds = time.time() - started
+
+        if isinstance(stream, CopyReader):
+            count = stream.rows
+        elif count is not None and count < 0:
+            count = None
+        return {'rows': count, 'seconds': seconds,
+                'rows_per_second': count / seconds
+                if count is not None and seconds > 0 else None}
+
+    @timed(ASSEMBLY)
     def make_insert_from_select(self, insert_table, select_table,
                                 insert_schema="public", select_schema="public",
                                 insert_columns=None, select_items=None,
@@ -153,49 +895,44 @@ class DynamicBaseQuery(BaseQuery):
                 {имя колонки: (операция сравнения, сравниваемое значение)}
             :return: результат выполнения запроса
         """
-        query = self.I_SELECT
-        ins_pattern = {'schema': insert_schema or 'public',
-                       'table': insert_table}
-
-        if insert_columns:
-            if not isinstance(insert_columns, (list, tuple)):
+        for names in (insert_columns, select_items):
+            if names and not isinstance(names, (list, tuple)):
                 raise MakeQueryError(code=2).\
                     describe(u"Имена колонок передаются списком или кортежем")
 
-            ins_pattern['columns'] = "(%s)" % insert_columns[0] \
-                if len(insert_columns) == 1 \
-                else "(%s)" % ",".join(insert_columns)
-        else:
-            query = query.replace('%(columns)s', '')
-
-        sel_pattern = {'schemafrom': select_schema or 'public',
-                       'tablefrom': select_table}
-
-        if select_items:
-            if not isinstance(select_items, (list, tuple)):
-                raise MakeQueryError(code=2).\
-                    describe(u"Имена колонок передаются списком или кортежем")
+        shape, values = self._condition_shape(kwargs)
+        key = ('insert_select', insert_table, insert_schema, select_table,
+               select_schema, insert_columns and tuple(insert_columns),
+               select_items and tuple(select_items), shape)
+        template = self._compiled(key)
+        if template is None:
+            esc = self._escape
+            query = self.I_SELECT
+            ins_pattern = {'schema': esc(insert_schema or 'public'),
+                           'table': esc(insert_table)}
+            if insert_columns:
+                ins_pattern['columns'] = "(%s)" % ",".join(
+                    [esc(i) for i in insert_columns])
+            else:
+                query = query.replace('%(columns)s', '')
 
-            sel_pattern['items'] = "%s" % select_items[0] \
-                if len(select_items) == 1 else ",".join(select_items)
-        else:
-            sel_pattern['items'] = "*"
-
-        if not kwargs:
-            sel_pattern['conditions'] = "1 = 1"
-        else:
-            sel_pattern['conditions'] = " AND ".join(["%s %s %s" % (key,
-                                                                    value[0],
-                                                                    value[1])
-                                                      for key, value
-                                                      in kwargs.items()])
-
-        ins_pattern['select'] = self._prepare_query(self.SELECT, **sel_pattern)
-        query = self._prepare_query(query, **ins_pattern)
-        return self.raw_query(query)
+            sel_pattern = {'schemafrom': esc(select_schema or 'public'),
+                           'tablefrom': esc(select_table),
+                           'items': ",".join([esc(i) for i in select_items])
+                           if select_items else "*",
+                           'conditions': self._condition_template(shape)}
+            ins_pattern['select'] = self._prepare_query(self.SELECT,
+                                                        **sel_pattern)
+            template = self._compile(key, self._prepare_query(query,
+                                                              **ins_pattern))
+        try:
+            return self.raw_query(*self._fill(template, values))
+        finally:
+            self._invalidate(insert_schema, insert_table)
 
+    @timed(ASSEMBLY)
     def make_select(self, table, schema='public', items=None,
-                    orders=None, conditions=None):
+                    orders=None, conditions=None, cache=None):
         """ Выполнение SQL запроса на выборку
             :param table: имя таблицы
             :param schema: имя схемы
@@ -204,43 +941,86 @@ class DynamicBaseQuery(BaseQuery):
                 имя предваряется символом '-')
             :param conditions: условия выборки {имя колонки: (операция
                 сравнения, сравниваемое значение)}
+            :param cache: кэш результатов (caches.TTLCache). Записи кэша
+                сбрасываются при любой записи в таблицу через эту модель.
+                Внутри открытой транзакции кэш не используется
             :return: результат выполнения запроса
         """
-        pattern = {'schemafrom': schema or 'public', 'tablefrom': table}
+        query, params = self._select_query(table, schema, items, orders,
+                                           conditions)
+        if cache is None or self.is_opened:
+            return self.raw_query(query, params, True)
 
-        if items:
-            pattern['items'] = "%s" % items[0] if len(items) == 1 \
-                else ",".join([str(i) for i in items])
-        else:
-            pattern['items'] = "*"
+        key = query, params if params is None else tuple(params)
+        try:
+            hash(key)
+        except TypeError:
+            return self.raw_query(query, params, True)
+        self.__caches.add(cache)
+        return cache.load(key, lambda: self.raw_query(query, params, True),
+                          ((schema or 'public', table),))
 
-        if not conditions:
-            pattern['conditions'] = "1 = 1"
-        else:
-            if not isinstance(conditions, dict):
-                raise MakeQueryError(code=2).\
-                    describe(u"Условия выборки передаются в виде словаря")
-            pattern['conditions'] = " AND ".join(["%s %s %s" % (key,
-                                                                value[0],
-                                                                value[1])
-                                                  for key, value
-                                                  in conditions.items()])
-        if orders:
-            order_by = " ORDER BY "
-            items = []
-            for item in orders:
-                if item.stsartswith('-'):
-                    items.append("{0} DESC".format(item[1:]))
-                else:
-                    items.append(item)
-            order_by += ",".join([i for i in items]) + ";"
-        else:
-            order_by = ";"
+    @timed(ASSEMBLY)
+    def stream_select(self, table, schema='public', items=None,
+                      orders=None, conditions=None, fetch_size=None):
+        """ Потоковое выполнение SQL запроса на выборку
+            :param table: имя таблицы
+            :param schema: имя схемы
+            :param items: имена полей таблицы
+            :param orders: сортировка результата
+            :param conditions: условия выборки
+            :param fetch_size: размер порции строк
+            :return: генератор строк выборки
+        """
+        query, params = self._select_query(table, schema, items, orders,
+                                           conditions)
+        return self.raw_stream(query, fetch_size, params, True)
 
-        query = self.SELECT + order_by
-        query = self._prepare_query(query, **pattern)
-        return self.raw_query(query)
+    def _select_query(self, table, schema='public', items=None,
+                      orders=None, conditions=None):
+        """ Формирование SQL запроса на выборку
+            :param table: имя таблицы
+            :param schema: имя схемы
+            :param items: имена полей таблицы
+            :param orders: сортировка результата (для сортировки по убыванию
+                имя предваряется символом '-')
+            :param conditions: условия выборки {имя колонки: (операция
+                сравнения, сравниваемое значение)}
+            :return: (строка запроса, параметры)
+        """
+        if conditions and not isinstance(conditions, dict):
+            raise MakeQueryError(code=2).\
+                describe(u"Условия выборки передаются в виде словаря")
+
+        shape, values = self._condition_shape(conditions)
+        key = ('select', table, schema, items and tuple(items),
+               orders and tuple(orders), shape)
+        template = self._compiled(key)
+        if template is None:
+            esc = self._escape
+            pattern = {'schemafrom': esc(schema or 'public'),
+                       'tablefrom': esc(table),
+                       'items': ",".join([esc(i) for i in items])
+                       if items else "*",
+                       'conditions': self._condition_template(shape)}
 
+            if orders:
+                order_by = []
+                for item in orders:
+                    if item.startswith('-'):
+                        order_by.append("{0} DESC".format(item[1:]))
+                    else:
+                        order_by.append(item)
+                order_by = " ORDER BY " + ",".join(order_by) + ";"
+            else:
+                order_by = ";"
+
+            template = self._compile(
+                key, self._prepare_query(self.SELECT, **pattern) +
+                esc(order_by))
+        return self._fill(template, values)
+
+    @timed(ASSEMBLY)
     def make_update(self, table, schema='public', *items, **conditions):
         """ Выполнение запроса на изменение записей по условию
             :param table: имя таблицы
@@ -254,24 +1034,24 @@ class DynamicBaseQuery(BaseQuery):
             raise MakeQueryError(code=1).\
                 describe(u"Необходимо указать изменяемые атрибуты")
 
-        pattern = {'schema': schema or 'public', 'table': table,
-                   'items': ",".join(["%s = %s" % (i[0], i[1]) for i in items])}
-
-        if not conditions:
-            pattern['conditions'] = "1 = 1"
-        else:
-            if not isinstance(conditions, dict):
-                raise MakeQueryError(code=2).\
-                    describe(u"Условия выборки передаются в виде словаря")
-            pattern['conditions'] = " AND ".join(["%s %s %s" % (key,
-                                                                value[0],
-                                                                value[1])
-                                                  for key, value
-                                                  in conditions.items()])
-
-        query = self._prepare_query(self.UPDATE, **pattern)
-        return self.raw_query(query)
+        shape, values = self._condition_shape(conditions)
+        key = ('update', table, schema, tuple([i[0] for i in items]), shape)
+        template = self._compiled(key)
+        if template is None:
+            esc = self._escape
+            pattern = {'schema': esc(schema or 'public'), 'table': esc(table),
+                       'items': ",".join(["%s = %%s" % esc(i[0])
+                                          for i in items]),
+                       'conditions': self._condition_template(shape)}
+            template = self._compile(key, self._prepare_query(self.UPDATE,
+                                                              **pattern))
+        try:
+            return self.raw_query(*self._fill(template,
+                                              [i[1] for i in items] + values))
+        finally:
+            self._invalidate(schema, table)
 
+    @timed(ASSEMBLY)
     def make_delete(self, table, schema='public', **conditions):
         """ Удаление записей по условию
             :param table: имя таблицы
@@ -280,19 +1060,21 @@ class DynamicBaseQuery(BaseQuery):
                 сравниваемое значение)}
             :return: результат выполнения запроса
         """
-        pattern = {'schema': schema or 'public', 'table': table}
-        if not conditions:
-            pattern['conditions'] = "1 = 1"
-        else:
-            pattern['conditions'] = " AND ".join(["%s %s %s" % (key,
-                                                                value[0],
-                                                                value[1])
-                                                  for key, value
-                                                  in conditions.items()])
-
-        query = self._prepare_query(self.DELETE, **pattern)
-        return self.raw_query(query)
+        shape, values = self._condition_shape(conditions)
+        key = ('delete', table, schema, shape)
+        template = self._compiled(key)
+        if template is None:
+            esc = self._escape
+            pattern = {'schema': esc(schema or 'public'), 'table': esc(table),
+                       'conditions': self._condition_template(shape)}
+            template = self._compile(key, self._prepare_query(self.DELETE,
+                                                              **pattern))
+        try:
+            return self.raw_query(*self._fill(template, values))
+        finally:
+            self._invalidate(schema, table)
 
+    @timed(ASSEMBLY)
     def make_truncate(self, table, schema='public'):
         """ Полная очистка указанной таблицы
         :param table: имя таблицы
@@ -301,4 +1083,7 @@ class DynamicBaseQuery(BaseQuery):
         """
         pattern = {'schema': schema or 'public', 'table': table}
         query = self._prepare_query(self.FULL_DELETE, **pattern)
-        return self.raw_query(query)
+        try:
+            return self.raw_query(query)
+        finally:
+            self._invalidate(schema, table)
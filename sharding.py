@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Распределение строк таблиц по нескольким базам данных (шардам)
+"""
+from decimal import Decimal
+import heapq
+import itertools
+import re
+import zlib
+
+from content import DataContainer, ResultSet
+from custom_errors import MakeQueryError
+from query_content import CustomManager, DynamicDataManager, StaticDataManager
+from query_models import parallel
+from translators.base_translators import PgTranslator
+
+# Строковая запись целого числа
+INTEGER = re.compile(r"\s*[-+]?\d+\s*$")
+
+
+def default_shard(value, count):
+    """ Номер шарда по значению ключа: остаток от деления для целых чисел,
+        иначе остаток от деления контрольной суммы CRC32. Целые числа,
+        записанные строкой, Decimal или float, приводятся к int, так что
+        одно значение ключа попадает в один шард независимо от записи
+        :param value: значение ключа шардирования
+        :param count: число шардов
+    """
+    if isinstance(value, basestring):
+        if INTEGER.match(value):
+            value = int(value)
+    elif isinstance(value, (Decimal, float)):
+        try:
+            if value == int(value):
+                value = int(value)
+        except (ValueError, OverflowError):
+            pass
+    if isinstance(value, (int, long)):
+        return value % count
+    if not isinstance(value, unicode):
+        value = str(value).decode('utf-8')
+    return (zlib.crc32(value.encode('utf-8')) & 0xffffffff) % count
+
+
+class _Descending(object):
+    """ Значение с обратным порядком сравнения """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+
+def order_key(columns, orders):
+    """ Функция ключа сортировки строк выборки в порядке PostgreSQL
+        (NULL - последним по возрастанию и первым по убыванию)
+        :param columns: имена колонок выборки
+        :param orders: сортировка (для убывания имя предваряется '-')
+        :return: функция ключа для кортежа значений строки
+    """
+    parts = []
+    for item in orders:
+        name = item[1:] if item.startswith('-') else item
+        if name not in columns:
+            raise MakeQueryError(code=2).\
+                describe(u"Колонка сортировки отсутствует в выборке")
+        parts.append((list(columns).index(name), item.startswith('-')))
+
+    def key(row):
+        return tuple([_Descending((row[i] is None, row[i])) if desc
+                      else (row[i] is None, row[i]) for i, desc in parts])
+    return key
+
+
+def merge_sorted(streams, key):
+    """ Слияние упорядоченных последовательностей строк. Значения
+        сравниваются средствами Python: текст упорядочивается по кодам
+        символов, что совпадает с порядком сервера только для правила
+        сортировки "C" (ORDER BY ... COLLATE "C")
+        :param streams: итерируемые источники строк
+        :param key: функция ключа сортировки
+        :return: генератор строк в общем порядке
+    """
+    heap = []
+    for index, stream in enumerate(streams):
+        stream = iter(stream)
+        for row in stream:
+            heap.append((key(row), index, row, stream))
+            break
+    heapq.heapify(heap)
+
+    while heap:
+        _, index, row, stream = heap[0]
+        yield row
+        for item in stream:
+            heapq.heapreplace(heap, (key(item), index, item, stream))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+class ShardedDataManager(object):
+    """ Фасад над моделями DynamicDataManager/StaticDataManager нескольких
+        баз данных, между которыми строки таблиц распределены по значению
+        колонки-ключа шардирования. Запись направляется в шард ключа,
+        выборка без условия на ключ выполняется во всех шардах параллельно
+    """
+    def __init__(self, factories, column, shard_key=default_shard):
+        """ Конструктор класса
+            :param factories: фабрики подключений Capstone (по одной
+                на шард)
+            :param column: имя колонки-ключа шардирования
+            :param shard_key: функция (значение ключа, число шардов),
+                возвращающая номер шарда
+        """
+        self.column = column
+        self.shard_key = shard_key
+        self.dynamic = [DynamicDataManager(factory()) for factory in factories]
+        self.static = [StaticDataManager(factory()) for factory in factories]
+
+    def shard(self, value):
+        """ Номер шарда по значению ключа шардирования """
+        if isinstance(value, PgTranslator):
+            value = value.value
+        return self.shard_key(value, len(self.dynamic))
+
+    def _shards(self, conditions):
+        """ Номера шардов, затрагиваемых условиями выборки
+            :param conditions: условия {имя колонки: (операция, значение)}
+            :return: список номеров шардов
+        """
+        condition = (conditions or {}).get(self.column)
+        if condition:
+            operation, value = condition[0].upper(), condition[1]
+            if operation == '=':
+                return [self.shard(value)]
+            if operation in ('IN', '= ANY') and \
+                    isinstance(value, (list, tuple, set, frozenset)):
+                return sorted(set([self.shard(i) for i in value]))
+        return range(len(self.dynamic))
+
+    @staticmethod
+    def _merge(results, key=None):
+        """ Объединение результатов выборок шардов
+            :param results: результаты выборок
+            :param key: функция ключа сортировки (None - без слияния
+                по порядку)
+        """
+        sets = [i for i in results if isinstance(i, ResultSet)]
+        if len(sets) != len(results):
+            return list(itertools.chain(*[i or [] for i in results]))
+        if key is None:
+            rows = list(itertools.chain(*[i.rows for i in sets]))
+        else:
+            rows = list(merge_sorted([i.rows for i in sets], key))
+        return ResultSet(sets[0].columns if sets else (), rows)
+
+    def make_select(self, table, schema='public', items=None, orders=None,
+                    conditions=None):
+        """ Выборка из шардов, затрагиваемых условиями выборки.
+            Упорядоченные выборки шардов сливаются с сохранением порядка
+            :param table: имя таблицы
+            :param schema: имя схемы
+            :param items: имена полей таблицы
+            :param orders: сортировка результата
+            :param conditions: условия выборки
+            :return: объединенный результат выполнения запроса
+        """
+        results = parallel([
+            (lambda model: lambda: model.make_select(
+                table, schema, items, orders, conditions))(self.dynamic[i])
+            for i in self._shards(conditions)])
+        if len(results) == 1:
+            return results[0]
+
+        key = None
+        if orders:
+            columns = [i.columns for i in results if isinstance(i, ResultSet)]
+            key = order_key(columns[0], orders) if columns else None
+        return self._merge(results, key)
+
+    def stream_select(self, table, schema='public', items=None, orders=None,
+                      conditions=None, fetch_size=None):
+        """ Потоковая выборка из шардов. При заданной сортировке строки
+            курсоров шардов сливаются с сохранением порядка, без загрузки
+            выборок целиком
+            :return: генератор строк выборки
+        """
+        streams = [self.dynamic[i].stream_select(table, schema, items, orders,
+                                                 conditions, fetch_size)
+                   for i in self._shards(conditions)]
+        if not orders or len(streams) == 1:
+            return itertools.chain(*streams)
+        return self.__merge_streams(streams, orders)
+
+    @staticmethod
+    def __merge_streams(streams, orders):
+        """ Слияние упорядоченных потоков строк DataContainer/Row """
+        keys = {}
+
+        def key(row):
+            # функция ключа строится по колонкам первой строки
+            if not keys:
+                keys[None] = order_key(row.columns, orders)
+            return keys[None](row.to_tuple())
+
+        for row in merge_sorted(streams, key):
+            yield row
+
+    def as_dictionaries(self, table, schema='public', items=None,
+                        orders=None, conditions=None, look4empty=False):
+        """ Результат выборки из шардов в виде списка словарей """
+        return CustomManager.as_dictionaries(
+            self.make_select(table, schema, items, orders, conditions),
+            look4empty)
+
+    def as_tuples(self, table, schema='public', items=None, orders=None,
+                  conditions=None, look4empty=False):
+        """ Результат выборки из шардов в виде списка кортежей """
+        return CustomManager.as_tuples(
+            self.make_select(table, schema, items, orders, conditions),
+            look4empty)
+
+    def as_generator_of_dictionaries(self, table, schema='public', items=None,
+                                     orders=None, conditions=None,
+                                     fetch_size=None):
+        """ Потоковая выборка из шардов в виде генератора словарей """
+        return CustomManager.as_generator_of_dictionaries(
+            self.stream_select(table, schema, items, orders, conditions,
+                               fetch_size))
+
+    def as_generator_of_tuples(self, table, schema='public', items=None,
+                               orders=None, conditions=None, fetch_size=None):
+        """ Потоковая выборка из шардов в виде генератора кортежей """
+        return CustomManager.as_generator_of_tuples(
+            self.stream_select(table, schema, items, orders, conditions,
+                               fetch_size))
+
+    def make_insert(self, table, schema='public', columns=None, values=None):
+        """ Вставка строки (или списка строк) в шарды по значению ключа
+            :param table: наименование таблицы
+            :param schema: наименование схемы
+            :param columns: список с именами колонок (обязательно
+                с колонкой-ключом шардирования)
+            :param values: список значений либо список строк значений
+            :return: результат вставки строки либо число вставленных строк
+        """
+        if not columns or self.column not in columns:
+            raise MakeQueryError(code=1).\
+                describe(u"Не задано значение ключа шардирования")
+        if not values:
+            raise MakeQueryError(code=1).\
+                describe(u"Недостаточно данных для записи")
+
+        index = list(columns).index(self.column)
+        if not isinstance(values[0], (tuple, list)):
+            return self.dynamic[self.shard(values[index])].make_insert(
+                table, schema, columns, values)
+
+        shards = {}
+        for row in values:
+            shards.setdefault(self.shard(row[index]), []).append(row)
+        return sum(parallel([
+            (lambda model, rows: lambda: model.make_insert_many(
+                table, schema, columns, rows))(self.dynamic[i], rows)
+            for i, rows in sorted(shards.items())]))
+
+    def make_update(self, table, schema='public', *items, **conditions):
+        """ Изменение записей в шардах, затрагиваемых условиями
+            :return: результат выполнения запроса (суммарное число
+                измененных строк при изменении в нескольких шардах)
+        """
+        if self.column in [i[0] for i in items]:
+            raise MakeQueryError(code=2).\
+                describe(u"Изменение ключа шардирования не поддерживается")
+        return self.__write([
+            (lambda model: lambda: model.make_update(
+                table, schema, *items, **conditions))(self.dynamic[i])
+            for i in self._shards(conditions)])
+
+    def make_delete(self, table, schema='public', **conditions):
+        """ Удаление записей в шардах, затрагиваемых условиями
+            :return: результат выполнения запроса (суммарное число
+                удаленных строк при удалении в нескольких шардах)
+        """
+        return self.__write([
+            (lambda model: lambda: model.make_delete(
+                table, schema, **conditions))(self.dynamic[i])
+            for i in self._shards(conditions)])
+
+    @staticmethod
+    def __write(calls):
+        """ Выполнение записи в шардах с суммированием счетчиков строк """
+        results = parallel(calls)
+        if len(results) == 1:
+            return results[0]
+        return [DataContainer(None, None,
+                              sum([i[0].counter for i in results if i]))]
+
+    def make_read(self, query, *args, **kwargs):
+        """ Выполнение статического запроса на выборку во всех шардах
+            параллельно
+            :param query: шаблон запроса
+            :param args: позиционые аргументы
+            :param kwargs: именованные аргументы
+            :return: объединенный результат выполнения запроса
+        """
+        return self._merge(parallel([
+            (lambda model: lambda: model.make_read(query, *args, **kwargs))(i)
+            for i in self.static]))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Журнал медленных запросов с планами выполнения
+"""
+import collections
+import datetime
+import json
+import re
+import threading
+import time
+
+from metrics import normalize
+
+# Запросы, для которых PostgreSQL строит план командой EXPLAIN
+EXPLAINABLE = re.compile(r"\s*(?:\(\s*)*(?:WITH|SELECT|VALUES|TABLE|INSERT|"
+                         r"UPDATE|DELETE|EXECUTE)\b", re.I)
+
+
+class SlowQueryLog(object):
+    """ Ограниченный журнал запросов, выполнявшихся дольше порога.
+        Для медленного запроса сохраняется план, полученный повторным
+        выполнением запроса под EXPLAIN ANALYZE (см. BaseQuery.slow_log)
+    """
+    EXPLAIN = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+    def __init__(self, threshold=1.0, size=100, interval=60, analyze=True):
+        """ Конструктор класса
+            :param threshold: порог времени выполнения запроса (секунд)
+            :param size: наибольшее число записей журнала
+            :param interval: наименьший промежуток (секунд) между
+                повторными планами одного шаблона запроса
+            :param analyze: получать планы запросов (False - в журнал
+                записываются только текст и время выполнения)
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.analyze = analyze
+        self.__entries = collections.deque(maxlen=size)
+        self.__explained = {}
+        self.__lock = threading.Lock()
+
+    def __due(self, query):
+        """ Проверка, что план шаблона запроса давно не запрашивался """
+        template = normalize(query)
+        now = time.time()
+        with self.__lock:
+            if now - self.__explained.get(template, -self.interval) < \
+                    self.interval:
+                return False
+            self.__explained[template] = now
+            if len(self.__explained) > 10 * self.__entries.maxlen:
+                border = now - self.interval
+                for key, moment in self.__explained.items():
+                    if moment < border:
+                        del self.__explained[key]
+            return True
+
+    def observe(self, query, params, seconds, explain):
+        """ Учет выполненного запроса
+            :param query: текст запроса
+            :param params: параметры запроса
+            :param seconds: время выполнения (секунд)
+            :param explain: функция, выполняющая переданный текст запроса
+                EXPLAIN и возвращающая план
+        """
+        if seconds < self.threshold:
+            return
+
+        plan, error = None, None
+        if self.analyze and EXPLAINABLE.match(query) and self.__due(query):
+            try:
+                plan = explain(self.EXPLAIN + query)
+                if isinstance(plan, basestring):
+                    plan = json.loads(plan)
+            except Exception as err:
+                error = "%s: %r" % (err.__class__.__name__, err.args)
+
+        entry = {'time': datetime.datetime.now().isoformat(),
+                 'seconds': seconds, 'query': query, 'params': params,
+                 'plan': plan, 'error': error}
+        with self.__lock:
+            self.__entries.append(entry)
+
+    def entries(self):
+        """ Записи журнала от старых к новым """
+        with self.__lock:
+            return list(self.__entries)
+
+    def clear(self):
+        """ Очистка журнала """
+        with self.__lock:
+            self.__entries.clear()
+            self.__explained.clear()
+
+    def dump(self, path):
+        """ Запись журнала в файл в формате JSON
+            :param path: путь к файлу
+            :return: число записей
+        """
+        entries = self.entries()
+        with open(path, 'w') as stream:
+            json.dump(entries, stream, indent=2, default=unicode)
+        return len(entries)
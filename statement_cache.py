@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Кэш подготовленных (PREPARE) операторов подключения
+"""
+import itertools
+import re
+import threading
+from collections import OrderedDict
+
+from custom_errors import RunQueryError
+
+# Заполнители параметров в стиле psycopg2: %s, %(имя)s и экранированный %%
+PLACEHOLDER = re.compile(r"%(?:\((\w+)\))?s|%%")
+# Запросы, допустимые в команде PREPARE
+PREPARABLE = re.compile(r"\s*(?:\(\s*)*(?:WITH|SELECT|VALUES|TABLE|INSERT|"
+                        r"UPDATE|DELETE|MERGE)\b", re.I)
+# Код SQLSTATE ошибки "подготовленный оператор не существует"
+INVALID_STATEMENT_NAME = '26000'
+
+
+def numbered_query(query, params):
+    """ Замена заполнителей %s и %(имя)s нумерованными параметрами $n
+        :param query: текст запроса
+        :param params: список или словарь параметров
+        :return: (текст запроса, список параметров)
+    """
+    values = []
+    names = {}
+
+    def replace(match):
+        if match.group(0) == '%%':
+            return '%'
+        name = match.group(1)
+        if name is None:
+            values.append(params[len(values)])
+            return '$%d' % len(values)
+        if name not in names:
+            values.append(params[name])
+            names[name] = len(values)
+        return '$%d' % names[name]
+
+    return PLACEHOLDER.sub(replace, query), values
+
+
+class StatementCache(object):
+    """ Кэш подготовленных операторов одного подключения.
+        Операторы хранятся по тексту шаблона запроса и вытесняются
+        по давности использования (LRU). Подключение должно реализовывать
+        методы prepare_statement, execute_statement и deallocate_statement
+    """
+    # Имена операторов уникальны в пределах процесса
+    __names = itertools.count()
+    __lock = threading.Lock()
+    # Суммарные счетчики всех подключений процесса
+    totals = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __init__(self, size=100):
+        """ Конструктор класса
+            :param size: наибольшее число подготовленных операторов
+        """
+        self.size = size
+        self.__statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def __count(cls, counter):
+        with cls.__lock:
+            cls.totals[counter] += 1
+
+    def clear(self):
+        """ Очистка кэша (подключение открыто заново,
+            подготовленные операторы на сервере утрачены)
+        """
+        self.__statements.clear()
+
+    @staticmethod
+    def preparable(query):
+        """ Признак запроса, который можно подготовить командой PREPARE:
+            одиночный запрос SELECT, INSERT, UPDATE, DELETE и т.п.
+            (но не DDL, SET, BEGIN или несколько запросов через ';')
+        """
+        return bool(PREPARABLE.match(query)) and \
+            ';' not in query.strip().rstrip(';')
+
+    def execute(self, conn, query, params):
+        """ Выполнение запроса подготовленным оператором.
+            Оператор готовится при первом выполнении шаблона, а также
+            повторно, если сервер его не находит (например, после
+            переподключения). Запрос, который нельзя подготовить,
+            выполняется методом run_query подключения
+            :param conn: подключение
+            :param query: текст запроса с заполнителями %s или %(имя)s
+            :param params: параметры запроса
+            :return: результат выполнения запроса
+        """
+        if not self.preparable(query):
+            if params:
+                return conn.run_query(query, params)
+            return conn.run_query(numbered_query(query, ())[0])
+
+        text, values = numbered_query(query, params or ())
+        name = self.__statements.get(query)
+        if name is not None:
+            self.hits += 1
+            self.__count('hits')
+            del self.__statements[query]
+            self.__statements[query] = name
+            try:
+                return conn.execute_statement(name, values)
+            except RunQueryError as err:
+                if err.sqlstate != INVALID_STATEMENT_NAME:
+                    raise
+                del self.__statements[query]
+        else:
+            self.misses += 1
+            self.__count('misses')
+
+        name = "shoe2_stmt_%d" % next(self.__names)
+        conn.prepare_statement(name, text)
+        self.__statements[query] = name
+        self.__evict(conn)
+        return conn.execute_statement(name, values)
+
+    def __evict(self, conn):
+        """ Вытеснение давно не используемых операторов """
+        while len(self.__statements) > self.size:
+            _, name = self.__statements.popitem(last=False)
+            self.evictions += 1
+            self.__count('evictions')
+            try:
+                conn.deallocate_statement(name)
+            except RunQueryError:
+                pass
+
+    def __len__(self):
+        return len(self.__statements)
+
+    def stats(self):
+        """ Счетчики попаданий, промахов и вытеснений """
+        return {'size': len(self.__statements), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
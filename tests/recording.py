@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+""" Shoe2
+    Анти-ORM пакет для работы с базами данных PostgreSQL
+    Подключение для тестов, записывающее выполненные запросы
+"""
+import threading
+
+from content import DataContainer, ResultSet
+
+
+class RecordingConnection(object):
+    """ Подключение, записывающее тексты выполненных запросов (queries),
+        их параметры (params) и имена выполнявших их потоков (threads).
+        Команды транзакции записываются как "begin", "commit"
+        и "rollback". Результат запроса возвращает метод respond,
+        переопределяемый в тестах
+    """
+    def __init__(self, *_):
+        self.queries = []
+        self.params = []
+        self.threads = set()
+        self.is_opened = False
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def respond(self, query, params):
+        """ Результат запроса: пустая выборка для SELECT,
+            для прочих запросов - нулевой счетчик строк
+        """
+        if query.lstrip().upper().startswith('SELECT'):
+            return ResultSet(('id',), [])
+        return [DataContainer(None, None, 0)]
+
+    def record(self, query, params=None):
+        self.queries.append(query)
+        self.params.append(params)
+        self.threads.add(threading.current_thread().name)
+
+    def run_query(self, query, params=None):
+        self.record(query, params)
+        return self.respond(query, params)
+
+    def stream_query(self, query, fetch_size=1000, params=None):
+        self.record(query, params)
+        for row in self.respond(query, params):
+            yield row
+
+    def begin(self):
+        self.record("begin")
+        self.is_opened = True
+
+    def commit(self):
+        self.record("commit")
+        self.is_opened = False
+
+    def rollback(self):
+        self.record("rollback")
+        self.is_opened = False
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from query_models import BaseQuery
+from translators import PgArray, PgDate, PgInt4, PgString, translate
+
+
+class TestBindParams(unittest.TestCase):
+    def test_positional_translators(self):
+        query, params = BaseQuery._bind_query(
+            "select * from t where a = %s and b = %s", PgInt4(5), PgString("x"))
+        self.assertEqual(query, "select * from t where a = %s::int4 "
+                                "and b = %s::varchar")
+        self.assertEqual(params, [5, u"x"])
+
+    def test_plain_values(self):
+        query, params = BaseQuery._bind_query("select %s", 42)
+        self.assertEqual(query, "select 42")
+        self.assertIsNone(params)
+
+        query, params = BaseQuery._bind_query(
+            "select %s where b like %s", PgInt4(1), "'%x'")
+        self.assertEqual(query, "select %s::int4 where b like '%%x'")
+        self.assertEqual(params, [1])
+
+    def test_named_translators(self):
+        query, params = BaseQuery._bind_query(
+            "select %(a)s, %(a)s, %(b)s", a=PgInt4(1), b=7)
+        self.assertEqual(query, "select %(a)s::int4, %(a)s::int4, 7")
+        self.assertEqual(params, {'a': 1})
+
+    def test_array_is_inline(self):
+        query, params = BaseQuery._bind_query(
+            "select * from t where a = ANY(%s) and b = %s",
+            PgArray(PgInt4)([1, 2]), PgInt4(3))
+        self.assertEqual(query, "select * from t where "
+                                "a = ANY(ARRAY[1::int4,2::int4]::int4[]) "
+                                "and b = %s::int4")
+        self.assertEqual(params, [3])
+
+        query, params = BaseQuery._bind_query(
+            "select %(a)s", a=PgArray(PgInt4)([1]))
+        self.assertEqual(query, "select ARRAY[1::int4]::int4[]")
+        self.assertIsNone(params)
+
+    def test_null_value(self):
+        query, params = BaseQuery._bind_query("select %s", PgDate(None))
+        self.assertEqual(query, "select %s::date")
+        self.assertEqual(params, [None])
+
+    def test_escaped_percent(self):
+        query, params = BaseQuery._bind_query(
+            "select %s where b like '%%x'", PgInt4(1))
+        self.assertEqual(query, "select %s::int4 where b like '%%x'")
+
+    def test_translate_decorator(self):
+        @translate(PgInt4, PgString)
+        def make(*args):
+            return BaseQuery._bind_query("select %s, %s", *args)
+
+        query, params = make(3, "o'k")
+        self.assertEqual(query, "select %s::int4, %s::varchar")
+        self.assertEqual(params, [3, u"o'k"])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestBindParams)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
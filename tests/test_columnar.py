@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import array
+import datetime
+import os
+import sys
+import unittest
+from decimal import Decimal
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import columnar
+from content import ResultSet
+from custom_errors import DataError
+from query_content import CustomManager
+
+RESULT = ResultSet(
+    ['id', 'price', 'active', 'day', 'moment', 'name'],
+    [(1, Decimal('1.5'), True, datetime.date(1970, 1, 2),
+      datetime.datetime(1970, 1, 1, 0, 0, 1), u'a'),
+     (2, None, False, datetime.date(1970, 1, 3),
+      datetime.datetime(1970, 1, 1, 0, 0, 2), u'b')])
+
+
+class TestColumnar(unittest.TestCase):
+    def test_columns(self):
+        columns = CustomManager.as_columns(RESULT)
+        self.assertEqual(columns.keys(), list(RESULT.columns))
+        self.assertEqual(columns['id'], [1, 2])
+        self.assertEqual(columns['name'], [u'a', u'b'])
+
+    def test_empty(self):
+        empty = ResultSet(['id'], [])
+        self.assertEqual(CustomManager.as_arrays(empty).keys(), ['id'])
+        self.assertRaises(DataError, CustomManager.as_columns, empty, True)
+
+    def test_std_arrays(self):
+        numpy, columnar.numpy = columnar.numpy, None
+        try:
+            arrays = CustomManager.as_arrays(RESULT)
+        finally:
+            columnar.numpy = numpy
+        self.assertEqual(arrays['id'], array.array('l', [1, 2]))
+        self.assertEqual(arrays['price'][0], 1.5)
+        self.assertNotEqual(arrays['price'][1], arrays['price'][1])
+        self.assertEqual(arrays['day'], array.array('l', [1, 2]))
+        self.assertEqual(arrays['moment'], array.array('l', [1000000,
+                                                             2000000]))
+        self.assertEqual(arrays['name'], [u'a', u'b'])
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy не установлен")
+    def test_numpy_arrays(self):
+        numpy = columnar.numpy
+        arrays = CustomManager.as_arrays(RESULT)
+        self.assertEqual(arrays['id'].dtype, numpy.int64)
+        self.assertEqual(arrays['active'].dtype, numpy.bool_)
+        self.assertTrue(numpy.isnan(arrays['price'][1]))
+        self.assertEqual(arrays['day'].dtype, numpy.dtype('datetime64[D]'))
+        self.assertEqual(arrays['moment'].astype('int64').tolist(),
+                         [1000000, 2000000])
+        self.assertEqual(arrays['name'].dtype, object)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestColumnar)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
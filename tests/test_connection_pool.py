@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import psyco_connection
+from connection import Capstone, POOL
+import query_content
+import custom_errors
+
+fabric = Capstone(POOL, 'lorem_cross', 'lcadmin', 'Br@hec&^^', '127.0.0.1', 5432,
+                  min_size=1, max_size=4, timeout=5)
+obj = query_content.StaticDataManager(fabric())
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_query(self):
+        res = obj.as_value(False, "select 1")
+        self.assertEqual(res, 1)
+
+    def test_parallel_queries(self):
+        results = []
+
+        def run():
+            results.append(obj.as_value(False, "select pg_sleep(0.1) is null"))
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertTrue(fabric.pool.size <= 4)
+
+    def test_transaction_pins_connection(self):
+        obj.begin()
+        try:
+            pid = obj.as_value(False, "select pg_backend_pid()")
+            self.assertEqual(pid, obj.as_value(False, "select pg_backend_pid()"))
+        finally:
+            obj.rollback()
+
+    def test_checkout_timeout(self):
+        fabric_small = Capstone(POOL, 'lorem_cross', 'lcadmin', 'Br@hec&^^',
+                                '127.0.0.1', 5432, max_size=1, timeout=0.1)
+        conn = fabric_small.pool.acquire()
+        try:
+            self.assertRaises(custom_errors.ConnectionError,
+                              fabric_small.pool.acquire)
+        finally:
+            fabric_small.pool.release(conn)
+
+    def test_failed_call_discards_connection(self):
+        fabric_single = Capstone(POOL, 'lorem_cross', 'lcadmin', 'Br@hec&^^',
+                                 '127.0.0.1', 5432, max_size=1, timeout=5)
+        single = query_content.StaticDataManager(fabric_single())
+        pid = single.as_value(False, "select pg_backend_pid()")
+        self.assertRaises(custom_errors.RunQueryError,
+                          single.as_value, False, "select 1 / 0")
+        self.assertEqual(fabric_single.pool.size, 0)
+        self.assertNotEqual(pid,
+                            single.as_value(False, "select pg_backend_pid()"))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestConnectionPool)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
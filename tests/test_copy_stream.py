@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import StringIO
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import content
+from copy_stream import CopyReader, CopyWriter, encode_row, encode_value
+from custom_errors import MakeQueryError
+from query_models import BaseQuery, DynamicBaseQuery
+from recording import RecordingConnection
+from translators import PgBool, PgDate, PgInt4, PgString
+
+
+class Connection(RecordingConnection):
+    """ Подключение, записывающее команды загрузки и выгрузки """
+    copy_formats = ('csv', 'text')
+
+    def copy_out(self, query, stream, size=65536):
+        self.record(query)
+        stream.write("1\n")
+        return 1
+
+    def copy_in(self, query, stream, size=65536):
+        self.record(query)
+        while stream.read(size):
+            pass
+        # драйвер не сообщает число загруженных строк
+        return -1
+
+
+class TestCopyStream(unittest.TestCase):
+    def test_encode_null(self):
+        self.assertEqual(encode_value(None), '\\N')
+
+    def test_encode_special_chars(self):
+        self.assertEqual(encode_value("a\tb\nc\\d"), "a\\tb\\nc\\\\d")
+
+    def test_encode_unicode(self):
+        self.assertEqual(encode_value(u"абв"), u"абв".encode('utf-8'))
+
+    def test_encode_with_translators(self):
+        row = encode_row((1, "abcdef", datetime.date(2017, 5, 5), None),
+                         (PgInt4, PgString(3), PgDate, PgBool))
+        self.assertEqual(row, "1\tabc\t05.05.2017\t\\N\n")
+
+    def test_reader_chunks(self):
+        reader = CopyReader([(i, "x") for i in range(100)])
+        chunks = []
+        while True:
+            chunk = reader.read(64)
+            if not chunk:
+                break
+            self.assertTrue(len(chunk) <= 64)
+            chunks.append(chunk)
+        self.assertEqual(reader.rows, 100)
+        self.assertEqual("".join(chunks).count("\n"), 100)
+
+    def test_reader_read_all(self):
+        reader = CopyReader([(1, True), (2, False)])
+        self.assertEqual(reader.read(), "1\tt\n2\tf\n")
+
+    def test_writer_fixed_buffers(self):
+        chunks = []
+        writer = CopyWriter(chunks.append, 10)
+        for i in range(25):
+            writer.write("%d\n" % i)
+        writer.flush()
+        self.assertTrue(all(len(chunk) == 10 for chunk in chunks[:-1]))
+        self.assertEqual("".join(chunks),
+                         "".join("%d\n" % i for i in range(25)))
+        self.assertEqual(writer.bytes, len("".join(chunks)))
+
+    def test_writer_wrong_sink(self):
+        self.assertRaises(TypeError, CopyWriter, 42)
+
+    def test_copy_out_source(self):
+        conn = Connection()
+        model = BaseQuery(conn)
+        for source in ("public.t", "public.t (a, b)", "select a from t;",
+                       "  WITH x AS (SELECT 1) SELECT * FROM x", "(TABLE t)"):
+            model.make_copy_out(source, [].append, format='text')
+        self.assertEqual(conn.queries, [
+            "COPY public.t TO STDOUT WITH (FORMAT text);",
+            "COPY public.t (a, b) TO STDOUT WITH (FORMAT text);",
+            "COPY (select a from t) TO STDOUT WITH (FORMAT text);",
+            "COPY (WITH x AS (SELECT 1) SELECT * FROM x) "
+            "TO STDOUT WITH (FORMAT text);",
+            "COPY (TABLE t) TO STDOUT WITH (FORMAT text);"])
+        self.assertRaises(MakeQueryError, model.make_copy_out, "t",
+                          [].append, format='xml')
+
+    def test_copy_in_rows(self):
+        model = DynamicBaseQuery(Connection())
+        result = model.make_copy_in('t', rows=[(1,), (2,)])
+        self.assertEqual(result['rows'], 2)
+        result = model.make_copy_in('t', rows=StringIO.StringIO("1\n2\n"))
+        self.assertIsNone(result['rows'])
+        self.assertIsNone(result['rows_per_second'])
+
+    def test_copy_out_driver_formats(self):
+        model = BaseQuery(Connection())
+        marker, content.MARKER = content.MARKER, Connection
+        try:
+            self.assertRaises(MakeQueryError, model.make_copy_out, "t",
+                              [].append, format='binary')
+        finally:
+            content.MARKER = marker
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestCopyStream)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import time
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import content
+from content import ResultSet
+from custom_errors import RunQueryError
+from query_content import DynamicDataManager, StaticDataManager
+from recording import RecordingConnection
+
+
+class Connection(RecordingConnection):
+    """ Подключение, выполняющее запрос за заданное время.
+        Длительность запроса задается текстом "SELECT <секунды>"
+    """
+    def respond(self, query, params):
+        seconds = float(query.split()[1])
+        time.sleep(seconds)
+        return ResultSet(('seconds',), [(seconds,)])
+
+content.MARKER = Connection
+
+import connection
+
+
+class TestGather(unittest.TestCase):
+    def setUp(self):
+        self.fabric = connection.Capstone(connection.LOCAL, 'db', 'user',
+                                          'password', 'host', 5432)
+        self.obj = StaticDataManager(self.fabric())
+
+    def test_parallel_in_order(self):
+        started = time.time()
+        result = self.obj.gather(
+            [('as_value', (False, "SELECT 0.%d" % i)) for i in (3, 1, 2)] +
+            [('as_tuples', (False, "SELECT 0.2"))])
+        self.assertLess(time.time() - started, 0.5)
+        self.assertEqual(result, [0.3, 0.1, 0.2, [(0.2,)]])
+
+    def test_error_isolation(self):
+        result = self.obj.gather([('as_value', (False, "SELECT 0")),
+                                  ('as_value', (False, "SELECT x")),
+                                  (lambda: 1 / 0,)])
+        self.assertEqual(result[0], 0)
+        self.assertIsInstance(result[1], RunQueryError)
+        self.assertIsInstance(result[2], ZeroDivisionError)
+
+    def test_timeout(self):
+        started = time.time()
+        result = self.obj.gather([('as_value', (False, "SELECT 0.3")),
+                                  ('as_value', (False, "SELECT 0"), None,
+                                   0.1),
+                                  ('as_value', (False, "SELECT 0.01"))],
+                                 timeout=0.1)
+        self.assertLess(time.time() - started, 0.25)
+        self.assertIsInstance(result[0], RunQueryError)
+        self.assertEqual(result[1:], [0, 0.01])
+
+    def test_single_connection_is_sequential(self):
+        # одно подключение не допускает одновременных запросов
+        conn = Connection()
+        result = StaticDataManager(conn).gather(
+            [('as_value', (False, "SELECT 0"))] * 3)
+        self.assertEqual(result, [0, 0, 0])
+        self.assertEqual(conn.threads, set([threading.current_thread().name]))
+
+    def test_transaction_is_sequential(self):
+        self.obj.begin()
+        self.obj.gather([('as_value', (False, "SELECT 0"))] * 3)
+        self.obj.commit()
+        self.assertEqual(self.fabric.threads.opened, 1)
+        self.assertEqual(self.fabric.threads.connection().threads,
+                         set([threading.current_thread().name]))
+
+    def test_nested_gather(self):
+        model = DynamicDataManager(self.fabric())
+        result = self.obj.gather(
+            [(model.gather, ([(self.obj.as_value, (False, "SELECT 0"))],))])
+        self.assertEqual(result, [[0]])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestGather)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from content import DataContainer
+from custom_errors import MakeQueryError, RunQueryError
+from query_content import DynamicDataManager
+from recording import RecordingConnection
+
+
+class Connection(RecordingConnection):
+    """ Подключение, возвращающее число вставленных строк """
+    def respond(self, query, params):
+        if 'fail' in query:
+            raise ValueError(query)
+        return [DataContainer(None, None, query.count('),(') + 1)]
+
+
+class TestInsertMany(unittest.TestCase):
+    def setUp(self):
+        self.conn = Connection()
+        self.model = DynamicDataManager(self.conn)
+
+    def test_batch_rows(self):
+        self.assertEqual(self.model.make_insert_many(
+            't', rows=[(i, i) for i in range(5)], batch_rows=2), 5)
+        self.assertEqual(self.conn.queries, [
+            "INSERT INTO public.t  VALUES (0,0),(1,1);",
+            "INSERT INTO public.t  VALUES (2,2),(3,3);",
+            "INSERT INTO public.t  VALUES (4,4);"])
+
+    def test_batch_bytes(self):
+        # строка ('ыы') занимает 8 байт в UTF-8, но 6 символов:
+        # две строки не укладываются в 15 байт
+        rows = ([u"'ыы'"] for _ in range(3))
+        self.assertEqual(self.model.make_insert_many('t', rows=rows,
+                                                     batch_bytes=15), 3)
+        self.assertEqual(self.conn.queries,
+                         [u"INSERT INTO public.t  VALUES ('ыы');"] * 3)
+
+        self.model.make_insert_many('t', rows=[(1,), (2,), (3,)],
+                                    batch_bytes=8)
+        self.assertEqual(self.conn.queries[3:], [
+            "INSERT INTO public.t  VALUES (1),(2);",
+            "INSERT INTO public.t  VALUES (3);"])
+
+    def test_transaction_commit(self):
+        self.model.make_insert_many('t', rows=[(1,), (2,)], batch_rows=1,
+                                    transaction=True)
+        self.assertEqual(self.conn.queries, [
+            "begin", "INSERT INTO public.t  VALUES (1);",
+            "INSERT INTO public.t  VALUES (2);", "commit"])
+
+    def test_transaction_rollback(self):
+        self.assertRaises(RunQueryError, self.model.make_insert_many, 't',
+                          rows=[(1,), ("'fail'",), (3,)], batch_rows=1,
+                          transaction=True)
+        self.assertEqual(self.conn.queries, [
+            "begin", "INSERT INTO public.t  VALUES (1);",
+            "INSERT INTO public.t  VALUES ('fail');", "rollback"])
+
+    def test_wrong_rows(self):
+        self.assertRaises(MakeQueryError, self.model.make_insert_many, 't',
+                          rows=None)
+        self.assertRaises(MakeQueryError, self.model.make_insert_many, 't',
+                          rows=[(1,), 2], transaction=True)
+        self.assertEqual(self.conn.queries, ["begin", "rollback"])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestInsertMany)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+import urllib2
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import metrics
+from content import DataContainer, ResultSet
+from custom_errors import RunQueryError
+from query_content import DynamicDataManager, StaticDataManager
+from recording import RecordingConnection
+
+
+class UniqueViolation(StandardError):
+    """ Исключение драйвера """
+    pgcode = '23505'
+
+
+class Connection(RecordingConnection):
+    """ Подключение, ожидающее блокировку 0.5 секунды перед запросом """
+    def respond(self, query, params):
+        metrics.add_wait(0.5)
+        if query.startswith('SELECT'):
+            return ResultSet(('id',), [(1,), (2,)])
+        if query.startswith('DELETE'):
+            return [DataContainer(None, None, 3)]
+        if query.startswith('INSERT'):
+            err = UniqueViolation(query)
+            raise RunQueryError(*err.args, cause=err)
+        raise ValueError(query)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry(bounds=(0.1, 1.0))
+        self.obj = StaticDataManager(Connection())
+        self.obj.metrics = self.registry
+
+    def test_template(self):
+        self.assertEqual(
+            self.registry.template(
+                "SELECT *  FROM t1\n WHERE id IN (1, 2,3) AND name = 'a''b'"
+                " AND x > 1.5e3"),
+            "SELECT * FROM t1 WHERE id IN (?) AND name = ? AND x > ?")
+
+    def test_histogram(self):
+        histogram = metrics.Histogram((1.0, 2.0))
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(),
+                         [(1.0, 2), (2.0, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(0.75), 2.0)
+        self.assertEqual(histogram.quantile(1), 2.0)
+
+    def test_observe_queries(self):
+        self.obj.as_tuples(False, "SELECT id FROM t WHERE id > %s", 1)
+        self.obj.as_tuples(False, "SELECT id FROM t WHERE id > %s", 2)
+        DynamicDataManager(Connection()).make_delete('t', id=('=', 1))
+        self.assertRaises(RunQueryError, self.obj.make_query, "VACUUM")
+
+        snapshot = self.registry.snapshot()
+        select = snapshot["SELECT id FROM t WHERE id > ?"]
+        self.assertEqual((select['count'], select['rows'], select['wait']),
+                         (2, 4, 1.0))
+        self.assertEqual(select['buckets'][0][1], 2)
+        self.assertNotIn("DELETE FROM public.t WHERE id = ?;", snapshot)
+        self.assertEqual(snapshot["VACUUM"]['errors'], {'ValueError': 1})
+
+    def test_driver_error_class(self):
+        try:
+            self.obj.make_query("INSERT INTO t VALUES (1)")
+        except RunQueryError as err:
+            self.assertEqual((err.origin, err.sqlstate),
+                             ('UniqueViolation', '23505'))
+        else:
+            self.fail("RunQueryError expected")
+        self.assertEqual(
+            self.registry.snapshot()["INSERT INTO t VALUES (?)"]['errors'],
+            {'UniqueViolation': 1})
+
+    def test_disabled(self):
+        self.obj.metrics = None
+        self.obj.as_tuples(False, "SELECT 1")
+        self.assertEqual(self.registry.snapshot(), {})
+
+    def test_max_templates(self):
+        self.registry.max_templates = 1
+        self.obj.as_tuples(False, "SELECT 1")
+        self.obj.as_tuples(False, "SELECT id FROM t")
+        self.assertEqual(sorted(self.registry.snapshot()),
+                         ["SELECT ?", "other"])
+
+    def test_prometheus(self):
+        self.obj.as_tuples(False, 'SELECT "a" FROM t')
+        self.assertRaises(RunQueryError, self.obj.make_query, "VACUUM")
+        text = self.registry.prometheus()
+        self.assertIn('# TYPE shoe2_query_duration_seconds histogram\n', text)
+        self.assertIn('shoe2_query_duration_seconds_bucket'
+                      '{query="SELECT \\"a\\" FROM t",le="+Inf"} 1\n', text)
+        self.assertIn('shoe2_query_wait_seconds_sum'
+                      '{query="VACUUM"} 0.5\n', text)
+        self.assertIn('shoe2_query_rows_total{query="SELECT \\"a\\" FROM t"}'
+                      ' 2\n', text)
+        self.assertIn('shoe2_query_errors_total'
+                      '{query="VACUUM",error="ValueError"} 1\n', text)
+
+    def test_serve(self):
+        self.obj.as_tuples(False, "SELECT 1")
+        server = metrics.serve(self.registry, 0)
+        try:
+            response = urllib2.urlopen("http://127.0.0.1:%d/metrics" %
+                                       server.server_address[1])
+            self.assertEqual(response.read(), self.registry.prometheus())
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestMetrics)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
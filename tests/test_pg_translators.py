@@ -2,6 +2,7 @@
 import os
 import sys
 import unittest
+import datetime
 from decimal import Decimal
 import uuid
 
@@ -9,10 +10,13 @@ from translators import PgBool, PgInt2, PgInt4, PgInt8, PgDate, PgTime
 from translators import PgDateTime, PgInterval, PgJSON, PgFloatDouble, PgString
 from translators import PgFloatNumeric, PgDecimalDouble, PgDecimalNumeric
 from translators import PgText, PgGUID, PgSafeString
+from translators.base_translators import PgTranslator
 
 BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
 sys.path.append(BASEDIR)
 
+from caches import LRUCache
+
 
 class TestPgTranslators(unittest.TestCase):
     def test_format_bool_true(self):
@@ -328,6 +332,47 @@ class TestPgTranslators(unittest.TestCase):
     def test_format_guid_wrong(self):
         self.assertRaises(ValueError, PgGUID, "Not UUID")
 
+    def test_raw_values(self):
+        self.assertEqual(PgInt4(5).raw(), 5)
+        self.assertEqual(PgBool(True).raw(), 'true')
+        self.assertEqual(PgString(3)("abcdef").raw(), u"abc")
+        self.assertEqual(PgJSON({"a": 1}).raw(), '{"a": 1}')
+
+    def test_raw_null(self):
+        self.assertIsNone(PgInt4(None).raw())
+        self.assertIsNone(PgDate(None).raw())
+
+    def test_literal_follows_value(self):
+        s = PgString(3)
+        self.assertEqual("{0}".format(s(u"abcd")), "'abc'::varchar")
+        self.assertEqual("{0}".format(s(u"xyzw")), "'xyz'::varchar")
+        js = PgJSON({"Foo": "bar"})
+        self.assertEqual("{0}".format(js), """'{"Foo": "bar"}'::jsonb""")
+        self.assertEqual(js.raw(), '{"Foo": "bar"}')
+
+    def test_mutable_value_is_not_snapshotted(self):
+        value = {"a": 1}
+        js = PgJSON(value)
+        self.assertEqual("{0}".format(js), """'{"a": 1}'::jsonb""")
+        value["a"] = 2
+        self.assertEqual("{0}".format(js), """'{"a": 2}'::jsonb""")
+        self.assertEqual(js.raw(), '{"a": 2}')
+
+    def test_interned_literals(self):
+        PgTranslator.literals = LRUCache(16)
+        try:
+            day = datetime.date(2017, 5, 4)
+            for _ in range(2):
+                self.assertEqual("{0}".format(PgDate(day)),
+                                 "'04.05.2017'::date")
+                self.assertEqual("{0}".format(PgInt4(7)), "7::int4")
+                self.assertEqual("{0}".format(PgInt8(7)), "7::int8")
+            self.assertEqual(PgTranslator.literals.hits, 3)
+            self.assertEqual(PgDate(day).raw(), "04.05.2017")
+            self.assertRaises(ValueError, PgInt2, 40000)
+        finally:
+            PgTranslator.literals = None
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestPgTranslators)
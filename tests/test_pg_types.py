@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import pg_types
+
+
+class TestPgTypes(unittest.TestCase):
+    def test_type_oid(self):
+        self.assertEqual(pg_types.type_oid('DATE'), 1082)
+        self.assertEqual(pg_types.type_oid(1700), 1700)
+        self.assertRaises(ValueError, pg_types.type_oid, 'no_such_type')
+
+    def test_type_name(self):
+        self.assertEqual(pg_types.type_name(3802), 'jsonb')
+        self.assertEqual(pg_types.type_name('Numeric'), 'numeric')
+        self.assertRaises(ValueError, pg_types.type_name, 1)
+
+    def test_arrays(self):
+        for oid in pg_types.ARRAYS:
+            self.assertIn(oid, pg_types.NAMES)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestPgTypes)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
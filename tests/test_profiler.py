@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import profiler
+from content import ResultSet
+from query_content import DynamicDataManager, StaticDataManager
+from recording import RecordingConnection
+from translators import PgInt4, PtnInt4, retranslate, translate
+
+
+class Connection(RecordingConnection):
+    """ Подключение: запрос выполняется 20 мс, строки строятся 10 мс """
+    def respond(self, query, params):
+        time.sleep(0.02)
+        with profiler.stage(profiler.MATERIALIZE):
+            time.sleep(0.01)
+            return ResultSet(('id',), [('1',), ('2',)])
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = profiler.Profiler()
+        self.model = StaticDataManager(Connection())
+
+    def tearDown(self):
+        self.profiler.disable()
+
+    def test_stages(self):
+        @translate(PgInt4)
+        @self.model.tuples("SELECT id FROM t WHERE id > %s")
+        @retranslate([PtnInt4])
+        def select(value, result=None):
+            return result
+
+        with self.profiler:
+            self.assertEqual(select(1), [(1,), (2,)])
+            DynamicDataManager(Connection()).as_value('t')
+
+        report = self.profiler.report()
+        self.assertEqual(sorted(report), sorted(profiler.STAGES))
+        self.assertEqual(report['execute']['count'], 2)
+        self.assertEqual(report['materialize']['count'], 2)
+        # вложенные этапы не входят во время объемлющих
+        self.assertGreaterEqual(report['execute']['per_call'], 0.02)
+        self.assertLess(report['execute']['per_call'], 0.03)
+        self.assertLess(report['assembly']['seconds'], 0.01)
+        self.assertAlmostEqual(sum([i['share'] for i in report.values()]),
+                               1.0)
+        self.assertIn('materialize', self.profiler.render())
+
+    def test_disabled(self):
+        self.model.as_tuples(False, "SELECT 1")
+        self.assertEqual(self.profiler.report(), {})
+        with self.profiler:
+            self.model.as_tuples(False, "SELECT 1")
+        self.profiler.reset()
+        self.model.as_tuples(False, "SELECT 1")
+        self.assertEqual(self.profiler.report(), {})
+
+    def test_nested_stage(self):
+        with self.profiler:
+            with profiler.stage('outer'):
+                time.sleep(0.01)
+                with profiler.stage('inner'):
+                    time.sleep(0.02)
+        report = self.profiler.report()
+        self.assertLess(report['outer']['seconds'], 0.02)
+        self.assertGreaterEqual(report['inner']['seconds'], 0.02)
+        self.assertIsNone(report['outer']['per_call'])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestProfiler)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
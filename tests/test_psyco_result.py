@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from psyco_connection import PsycoWrapper
+from query_content import StaticDataManager
+from slow_queries import SlowQueryLog
+
+PLAN = [{"Plan": {"Node Type": "Result"}}]
+
+
+class Cursor(object):
+    """ Курсор psycopg2 с заданными признаком завершения и строками """
+    def __init__(self, status, columns=None, rows=()):
+        self.statusmessage = status
+        self.description = (None if columns is None else
+                            [(i, None, None, None, None, None, None)
+                             for i in columns])
+        self.rows = list(rows)
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class Connection(object):
+    """ Подключение psycopg2, возвращающее заданный курсор """
+    def __init__(self, cur):
+        self.cur = cur
+
+    def cursor(self):
+        return self.cur
+
+
+class TestPsycoResult(unittest.TestCase):
+    def wrapper(self, cur):
+        wrapper = PsycoWrapper('db', 'user', 'password', 'host', 5432)
+        wrapper._PsycoWrapper__conn = Connection(cur)
+        return wrapper
+
+    def test_explain_rows(self):
+        # признак завершения EXPLAIN - "EXPLAIN", строки плана есть
+        wrapper = self.wrapper(Cursor('EXPLAIN', ['QUERY PLAN'], [(PLAN,)]))
+        result = wrapper.run_query("EXPLAIN (FORMAT JSON) SELECT 1")
+        self.assertEqual(result[0].to_tuple()[0], PLAN)
+
+    def test_returning_rows(self):
+        wrapper = self.wrapper(Cursor('INSERT 0 1', ['id'], [(7,)]))
+        result = wrapper.run_query("INSERT INTO t DEFAULT VALUES RETURNING id")
+        self.assertEqual(result[0].to_tuple(), (7,))
+
+    def test_row_count(self):
+        wrapper = self.wrapper(Cursor('UPDATE 3'))
+        self.assertEqual(wrapper.run_query("UPDATE t SET x = 1")[0].counter, 3)
+
+    def test_slow_log_plan(self):
+        wrapper = self.wrapper(Cursor('EXPLAIN', ['QUERY PLAN'], [(PLAN,)]))
+        obj = StaticDataManager(wrapper)
+        obj.slow_log = log = SlowQueryLog(threshold=0)
+        obj.make_query("UPDATE t SET x = 1")
+        entry, = log.entries()
+        self.assertEqual(entry['plan'], PLAN)
+        self.assertIsNone(entry['error'])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestPsycoResult)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
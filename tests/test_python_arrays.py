@@ -178,6 +178,29 @@ class TestPgTranslators(unittest.TestCase):
         uid = PtnArray(PtnGUID)(None)
         self.assertEqual(uid, [])
 
+    def test_array_with_nulls(self):
+        i4 = PtnArray(PtnInt4)("{1,NULL,3}")
+        self.assertEqual(i4, [1, None, 3])
+
+    def test_array_of_quoted_strings(self):
+        s = PtnArray(PtnString)('{"a,b","say \\"hi\\"","NULL",plain}')
+        self.assertEqual(s, ["a,b", 'say "hi"', "NULL", "plain"])
+
+    def test_multidimensional_array(self):
+        i4 = PtnArray(PtnInt4)("[0:1][1:2]={{1,2},{3,NULL}}")
+        self.assertEqual(i4, [[1, 2], [3, None]])
+
+    def test_array_from_driver_list(self):
+        i4 = PtnArray(PtnInt4)([["1", 2], [None]])
+        self.assertEqual(i4, [[1, 2], [None]])
+
+    def test_array_is_not_evaluated(self):
+        self.assertEqual(PtnArray(PtnString)("{__import__('os')}"),
+                         ["__import__('os')"])
+
+    def test_malformed_array(self):
+        self.assertRaises(ValueError, PtnArray(PtnInt4), '{1,"2')
+
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestPgTranslators)
     runner = unittest.TextTestRunner(verbosity=2)
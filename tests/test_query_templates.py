@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from caches import LRUCache
+from query_models import DynamicBaseQuery
+from translators import PgBulkArray, PgInt4, PgInt8, PgString, PgText
+
+
+class Recorder(object):
+    """ Подключение, запоминающее выполненные запросы """
+    def __init__(self):
+        self.queries = []
+
+    def run_query(self, query, params=None):
+        self.queries.append((query, params))
+        return []
+
+
+class TestQueryTemplates(unittest.TestCase):
+    def setUp(self):
+        self.conn = Recorder()
+        self.model = DynamicBaseQuery(self.conn)
+        self.model.templates = LRUCache(16)
+
+    def test_repeated_select_hits_cache(self):
+        for value in (1, 2):
+            self.model.make_select('t', items=['a', 'b'], orders=['-a'],
+                                   conditions={'b': ('like', "'%x'"),
+                                               'a': ('=', PgInt4(value))})
+        self.assertEqual(self.model.templates.hits, 1)
+        self.assertEqual(self.model.templates.misses, 1)
+        self.assertEqual(self.conn.queries[1][0],
+                         "SELECT a,b FROM public.t WHERE a = 2::int4 "
+                         "AND b like '%x' ORDER BY a DESC;")
+
+    def test_same_result_without_cache(self):
+        def calls():
+            self.model.make_update('t', 'public', ('a', PgString('%q')),
+                                   id=('=', PgInt4(2)))
+            self.model.make_delete('t', id=('>', PgInt4(3)))
+            self.model.make_insert_from_select(
+                't2', 't', insert_columns=['a'], select_items=['a'],
+                a=('<', PgInt4(4)))
+
+        calls()
+        cached = self.conn.queries[:]
+        del self.conn.queries[:]
+        self.model.templates = None
+        calls()
+        self.assertEqual(cached, self.conn.queries)
+        self.assertEqual(cached[0][0], "UPDATE public.t SET a = "
+                                       "'%q'::varchar WHERE id = 2::int4;")
+
+    def test_bind_params_shape(self):
+        self.model.bind_params = True
+        self.model.make_select('t', conditions={'b': ('like', "'%x'"),
+                                                'a': ('=', PgInt4(1))})
+        self.model.make_select('t', conditions={'b': ('like', "'%x'")})
+        self.assertEqual(self.conn.queries,
+                         [("SELECT * FROM public.t WHERE a = %s::int4 "
+                           "AND b like '%%x';", [1]),
+                          ("SELECT * FROM public.t WHERE b like '%x';",
+                           None)])
+
+    def test_in_list_as_single_array(self):
+        self.model.make_select('t', conditions={'a': ('IN', [1, 2, 3])})
+        self.model.make_delete('t', b=('not in', ["o'k", '50%']))
+        self.model.bind_params = True
+        self.model.make_select('t', conditions={'a': ('IN', (4, 5))})
+        self.assertEqual(self.conn.queries,
+                         [("SELECT * FROM public.t WHERE a = ANY('{1,2,3}');",
+                           None),
+                          ("DELETE FROM public.t WHERE b <> ALL('{o''k,50%}');",
+                           None),
+                          ("SELECT * FROM public.t WHERE a = ANY(%s);",
+                           ['{4,5}'])])
+
+    def test_in_text_is_inline(self):
+        self.model.make_select('t', conditions={
+            'a': ('IN', '(SELECT id FROM u)')})
+        self.model.make_select('t', conditions={'a': ('IN', '(1,2,3)')})
+        self.model.make_select('t', conditions={'a': ('IN', [1])})
+        self.assertEqual([i[0] for i in self.conn.queries],
+                         ["SELECT * FROM public.t WHERE a IN "
+                          "(SELECT id FROM u);",
+                          "SELECT * FROM public.t WHERE a IN (1,2,3);",
+                          "SELECT * FROM public.t WHERE a = ANY('{1}');"])
+
+    def test_bulk_array(self):
+        self.assertEqual("{0}".format(PgBulkArray(PgInt4)(range(3))),
+                         "'{0,1,2}'::int4[]")
+        self.assertEqual("{0}".format(PgBulkArray(PgInt4)(None)),
+                         "NULL::int4[]")
+        self.assertEqual(PgBulkArray(PgText)([u'a b', None, u'"q"']).raw(),
+                         '{"a b",NULL,"\\"q\\""}')
+        self.assertRaises(ValueError, PgBulkArray(PgInt4), 'abc')
+        self.assertRaises(ValueError, PgBulkArray(PgInt4), [1, 2 ** 31])
+        self.assertRaises(ValueError, PgBulkArray(PgInt8), [-2 ** 63 - 1])
+        self.assertEqual(PgBulkArray(PgInt8)([2 ** 40, '7']).raw(),
+                         '{1099511627776,7}')
+
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.hit_rate(), 1.0)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestQueryTemplates)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
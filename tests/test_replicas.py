@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import time
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import psyco_connection
+from connection import Capstone, INSTANCE, LEAST_BUSY
+import query_content
+
+# Основной сервер - порт 5432, реплика - порт 5433
+fabric = Capstone(INSTANCE, 'lorem_cross', 'lcadmin', 'Br@hec&^^',
+                  '127.0.0.1', 5432, replicas=[('127.0.0.1', 5433)],
+                  write_window=0.5)
+PORT = "select inet_server_port()"
+WRITE = "create temp table if not exists shoe2_written (id int)"
+
+
+class TestReplicas(unittest.TestCase):
+    def setUp(self):
+        self.obj = query_content.StaticDataManager(fabric())
+
+    def test_select_goes_to_replica(self):
+        self.assertEqual(self.obj.as_value(False, PORT), 5433)
+
+    def test_locking_select_stays_on_primary(self):
+        self.assertEqual(self.obj.as_value(False, PORT + " for update"),
+                         5432)
+
+    def test_transaction_stays_on_primary(self):
+        self.obj.begin()
+        try:
+            self.assertEqual(self.obj.as_value(False, PORT), 5432)
+        finally:
+            self.obj.rollback()
+
+    def test_read_your_writes(self):
+        self.obj.make_query(WRITE)
+        self.assertEqual(self.obj.as_value(False, PORT), 5432)
+        time.sleep(0.5)
+        self.assertEqual(self.obj.as_value(False, PORT), 5433)
+
+    def test_read_your_writes_across_connections(self):
+        other = query_content.StaticDataManager(fabric())
+        self.obj.make_query(WRITE)
+        self.assertEqual(other.as_value(False, PORT), 5432)
+
+        # запись другого потока не влияет на выбор сервера
+        ports = []
+        thread = threading.Thread(
+            target=lambda: ports.append(other.as_value(False, PORT)))
+        thread.start()
+        thread.join()
+        self.assertEqual(ports, [5433])
+
+    def test_primary_read_is_not_a_write(self):
+        time.sleep(0.5)
+        self.obj.make_query("select 1")
+        self.obj.make_query("explain select 1")
+        self.assertEqual(self.obj.as_value(False, PORT), 5433)
+
+    def test_least_busy(self):
+        fabric_busy = Capstone(INSTANCE, 'lorem_cross', 'lcadmin',
+                               'Br@hec&^^', '127.0.0.1', 5432,
+                               replicas=[('127.0.0.1', 5433)] * 2,
+                               routing=LEAST_BUSY)
+        obj = query_content.StaticDataManager(fabric_busy())
+        rows = obj.as_generator_of_tuples(PORT)
+        next(rows)
+        self.assertEqual(fabric_busy.replicas.busy, [1, 0])
+        obj.as_value(False, PORT)
+        self.assertEqual(fabric_busy.replicas.served, [1, 1])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestReplicas)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import time
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from caches import TTLCache
+from content import ResultSet
+from query_content import DynamicDataManager, StaticDataManager
+from recording import RecordingConnection
+from translators import PgInt4
+
+
+class Connection(RecordingConnection):
+    """ Подключение, возвращающее номер выполненного запроса """
+    def respond(self, query, params):
+        return ResultSet(('id',), [(len(self.queries),)])
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = TTLCache(size=2, ttl=10, clock=self.clock)
+
+    def test_ttl(self):
+        load = lambda: self.clock.now
+        self.assertEqual(self.cache.load('a', load), 0)
+        self.clock.now = 5
+        self.assertEqual(self.cache.load('a', load), 0)
+        self.clock.now = 10
+        self.assertEqual(self.cache.load('a', load), 10)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_lru_eviction(self):
+        for key in 'abc':
+            self.cache.load(key, lambda: key)
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_single_loader(self):
+        calls = []
+        results = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        threads = [threading.Thread(
+            target=lambda: results.append(self.cache.load('k', loader)))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_error_is_not_cached(self):
+        def fail():
+            raise ValueError('fail')
+        self.assertRaises(ValueError, self.cache.load, 'k', fail)
+        self.assertEqual(self.cache.load('k', lambda: 1), 1)
+
+    def test_static_manager(self):
+        conn = Connection()
+        model = StaticDataManager(conn)
+
+        @model.value("SELECT id FROM t WHERE id = %s", cache=self.cache)
+        def lookup(value, result=None):
+            return result
+
+        self.assertEqual([lookup(1), lookup(1), lookup(2)], [1, 1, 2])
+        self.assertEqual(
+            model.as_tuples(False, "SELECT %(id)s", id=3, cache=self.cache),
+            [(3,)])
+        self.assertEqual(model.as_value(False, "SELECT 1"), 4)
+        self.assertEqual(len(conn.queries), 4)
+
+    def test_bind_params_key(self):
+        conn = Connection()
+        model = StaticDataManager(conn)
+        model.bind_params = True
+        for value in (1, 1, 2):
+            model.as_value(False, "SELECT %s", PgInt4(value),
+                           cache=self.cache)
+        self.assertEqual(zip(conn.queries, conn.params),
+                         [("SELECT %s::int4", [1]), ("SELECT %s::int4", [2])])
+
+
+class TestTableCache(unittest.TestCase):
+    def setUp(self):
+        self.conn = Connection()
+        self.model = DynamicDataManager(self.conn)
+        self.cache = TTLCache(size=8, ttl=60)
+
+    def select(self, table='t'):
+        return self.model.as_value(table, conditions={'id': ('=', 1)},
+                                   cache=self.cache)
+
+    def test_write_invalidates_table(self):
+        self.assertEqual([self.select(), self.select()], [1, 1])
+        self.assertEqual(self.select('other'), 2)
+        self.model.make_update('t', 'public', ('a', 1), id=('=', 1))
+        self.assertEqual([self.select(), self.select('other')], [4, 2])
+        self.model.make_delete('t', id=('=', 1))
+        self.model.make_truncate('other')
+        self.assertEqual([self.select(), self.select('other')], [7, 8])
+        self.model.make_insert_from_select('t', 'other')
+        self.model.make_insert('t', values=[1])
+        self.assertEqual(self.model.as_dictionary(
+            't', conditions={'id': ('=', 1)}, cache=self.cache), {'id': 11})
+
+    def test_load_during_write_is_not_stored(self):
+        def load():
+            self.cache.invalidate(('public', 't'))
+            return 'stale'
+        self.assertEqual(self.cache.load('k', load, (('public', 't'),)),
+                         'stale')
+        self.assertNotIn('k', self.cache)
+
+    def test_load_during_clear_is_not_stored(self):
+        def load():
+            self.cache.clear()
+            return 'stale'
+        self.assertEqual(self.cache.load('k', load), 'stale')
+        self.assertNotIn('k', self.cache)
+
+    def test_load_during_pop_is_not_stored(self):
+        def load():
+            self.cache.pop('k')
+            return 'stale'
+        self.assertEqual(self.cache.load('k', load), 'stale')
+        self.assertNotIn('k', self.cache)
+
+    def test_pop_forgets_tags(self):
+        tag = ('public', 't')
+        self.cache.load('k', lambda: 1, (tag,))
+        self.cache.load('m', lambda: 2, (tag,))
+        self.assertEqual(self.cache.pop('k'), 1)
+        self.assertEqual(self.cache.pop('k', 'none'), 'none')
+        self.assertEqual(self.cache._TTLCache__tagged, {tag: set(['m'])})
+        self.cache.pop('m')
+        self.assertEqual(self.cache._TTLCache__tagged, {})
+
+    def test_transaction_bypasses_cache(self):
+        self.assertEqual(self.select(), 1)
+        self.model.begin()
+        self.model.make_insert('t', values=[1])
+        # выборка в транзакции видит ее изменения и не попадает в кэш
+        self.assertEqual([self.select(), self.select()], [4, 5])
+        self.model.commit()
+        self.assertEqual([self.select(), self.select()], [7, 7])
+
+    def test_static_transaction_bypasses_cache(self):
+        model = StaticDataManager(self.conn)
+        model.begin()
+        model.as_value(False, "SELECT 1", cache=self.cache)
+        model.commit()
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(TestResultCache),
+        unittest.TestLoader().loadTestsFromTestCase(TestTableCache)])
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from content import ResultSet
+from query_content import CustomManager
+
+ROWS = [(1, u'Москва'), (2, u'Казань')]
+
+
+class TestResultSet(unittest.TestCase):
+    def setUp(self):
+        self.result = ResultSet(['id', 'name'], ROWS[:])
+
+    def test_rows(self):
+        self.assertEqual(len(self.result), 2)
+        self.assertEqual(self.result[1].to_tuple(), ROWS[1])
+        self.assertEqual(self.result[0].to_dict(), {'id': 1, 'name': u'Москва'})
+        self.assertEqual(self.result[0].columns, ('id', 'name'))
+        self.assertEqual(self.result[0].counter, 2)
+        self.assertEqual(len(self.result[1:]), 1)
+
+    def test_row_has_no_dict(self):
+        self.assertFalse(hasattr(self.result[0], '__dict__'))
+
+    def test_manager_shapes(self):
+        self.assertEqual(CustomManager.as_tuples(self.result), ROWS)
+        self.assertEqual(CustomManager.as_tuple(self.result), ROWS[0])
+        self.assertEqual(CustomManager.as_value(self.result), 1)
+        self.assertEqual(CustomManager.as_dictionaries(self.result),
+                         [{'id': 1, 'name': u'Москва'},
+                          {'id': 2, 'name': u'Казань'}])
+        self.assertEqual(list(CustomManager.as_generator_of_tuples(
+            iter(self.result))), ROWS)
+
+    def test_empty(self):
+        empty = ResultSet(['id'], [])
+        self.assertFalse(empty)
+        self.assertIsNone(CustomManager.as_tuple(empty))
+        self.assertIsNone(CustomManager.as_dictionary(empty))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestResultSet)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
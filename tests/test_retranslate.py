@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import sys
+import unittest
+from decimal import Decimal
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import translators
+from translators import PtnArray, PtnBool, PtnDate, PtnDecimal, PtnFloat
+from translators import PtnInt4, PtnInt8, PtnSizedFloat, PtnSizedString
+from translators import PtnString, retranslate
+
+
+class TestRetranslate(unittest.TestCase):
+    def test_caster_matches_translator(self):
+        values = [None, 5, '7', 2.5, True, 'true', Decimal('1.25'),
+                  datetime.date(2020, 1, 2), '02.01.2020']
+        for cls in (PtnInt4, PtnInt8, PtnFloat, PtnBool, PtnDecimal,
+                    PtnString, PtnSizedFloat(1), PtnSizedString(2)):
+            cast = cls.caster()
+            for value in values:
+                try:
+                    expected = cls(value)()
+                except Exception as err:
+                    self.assertRaises(type(err), cast, value)
+                    continue
+                self.assertEqual(cast(value), expected)
+                self.assertEqual(type(cast(value)), type(expected))
+        self.assertEqual(PtnDate.caster()('02.01.2020'),
+                         datetime.date(2020, 1, 2))
+
+    def test_list_of_tuples(self):
+        rows = [(1, '2', 1.25), (3, '4', 2.75)]
+        result = translators._retranslate(
+            (PtnInt8, PtnInt4, PtnSizedFloat(1)), rows)
+        self.assertEqual(result, [(1L, 2, 1.3), (3L, 4, 2.8)])
+        self.assertEqual(type(result[0][0]), long)
+
+    def test_short_rows_are_padded(self):
+        result = translators._retranslate([PtnInt4, PtnInt4], [(1, ), (2, 3)])
+        self.assertEqual(result, [(1, None), (2, 3)])
+
+    def test_dictionaries(self):
+        rows = [{'id': '1', 'day': '02.01.2020', 'name': 'x'}]
+        result = translators._retranslate({'id': PtnInt4, 'day': PtnDate,
+                                           'name': None}, rows)
+        self.assertEqual(result, [{'id': 1, 'day': datetime.date(2020, 1, 2),
+                                   'name': 'x'}])
+
+    def test_array_pattern(self):
+        result = translators._retranslate((PtnArray(PtnInt4), ),
+                                          ('{1,2}', ))
+        self.assertEqual(result, ([1, 2], ))
+
+    def test_decorator_with_generator(self):
+        @retranslate((PtnInt4, ))
+        def work(result=None):
+            return list(result)
+
+        self.assertEqual(work(result=iter([('1', ), ('2', )])), [(1, ), (2, )])
+
+    def test_value(self):
+        self.assertEqual(translators._retranslate(PtnInt4, '7'), 7)
+        self.assertIsNone(translators._retranslate(PtnInt4, None))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestRetranslate)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
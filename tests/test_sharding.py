@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from content import DataContainer, ResultSet
+from custom_errors import MakeQueryError
+from recording import RecordingConnection
+from sharding import ShardedDataManager, default_shard, merge_sorted, \
+    order_key
+from translators import PgInt4
+
+
+class Connection(RecordingConnection):
+    """ Подключение шарда с заданными строками выборки """
+    def __init__(self, rows=()):
+        super(Connection, self).__init__()
+        self.rows = list(rows)
+
+    def respond(self, query, params):
+        if query.startswith('SELECT'):
+            return ResultSet(('id', 'name'), self.rows)
+        return [DataContainer(None, None, 2)]
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.conns = [Connection([(0, 'c'), (4, None), (2, 'a')]),
+                      Connection([(1, 'b'), (3, 'd')])]
+        self.obj = ShardedDataManager(
+            [(lambda conn: lambda: conn)(i) for i in self.conns], 'id')
+
+    def test_default_shard(self):
+        self.assertEqual([default_shard(i, 2) for i in (4, 7)], [0, 1])
+        self.assertEqual(default_shard('key', 4), default_shard(u'key', 4))
+        self.assertEqual(self.obj.shard(PgInt4(3)), 1)
+
+    def test_numeric_key_forms(self):
+        for value in ('5', u' 5', Decimal(5), 5.0, PgInt4('5')):
+            self.assertEqual(self.obj.shard(value), self.obj.shard(5))
+        self.assertEqual(default_shard(Decimal('5.5'), 4),
+                         default_shard('5.5', 4))
+        self.obj.make_insert('t', columns=['id'], values=[PgInt4('5')])
+        self.obj.make_select('t', conditions={'id': ('=', 5)})
+        self.assertEqual([len(i.queries) for i in self.conns], [0, 2])
+
+    def test_select_by_key(self):
+        result = self.obj.make_select('t', conditions={'id': ('=', 3)})
+        self.assertEqual(result.rows, [(1, 'b'), (3, 'd')])
+        self.assertEqual([len(i.queries) for i in self.conns], [0, 1])
+
+    def test_select_fan_out(self):
+        self.assertEqual(self.obj.as_tuples('t'),
+                         [(0, 'c'), (4, None), (2, 'a'), (1, 'b'), (3, 'd')])
+        self.assertEqual(self.obj.make_read("SELECT 1").rows[-1], (3, 'd'))
+
+    def test_ordered_merge(self):
+        self.conns[0].rows.sort()
+        self.assertEqual([i[0] for i in self.obj.as_tuples(
+            't', orders=['id'])], [0, 1, 2, 3, 4])
+        self.conns[0].rows = [(4, None), (0, 'c'), (2, 'a')]
+        self.conns[1].rows = [(3, 'd'), (1, 'b')]
+        self.assertEqual([i[1] for i in self.obj.as_generator_of_tuples(
+            't', orders=['-name'])], [None, 'd', 'c', 'b', 'a'])
+
+    def test_merge_is_lazy(self):
+        def stream(rows, pulled):
+            for row in rows:
+                pulled.append(row)
+                yield row
+        pulled = []
+        merged = merge_sorted([stream([(1,), (3,)], pulled),
+                               stream([(2,), (4,)], pulled)],
+                              order_key(('id',), ['id']))
+        self.assertEqual([next(merged), next(merged)], [(1,), (2,)])
+        self.assertEqual(len(pulled), 3)
+
+    def test_order_key(self):
+        rows = [(1, None), (2, 'a'), (3, 'b')]
+        self.assertEqual(sorted(rows, key=order_key(('id', 'name'),
+                                                    ['name'])),
+                         [(2, 'a'), (3, 'b'), (1, None)])
+        self.assertEqual(sorted(rows, key=order_key(('id', 'name'),
+                                                    ['-name'])),
+                         [(1, None), (3, 'b'), (2, 'a')])
+        self.assertRaises(MakeQueryError, order_key, ('id',), ['name'])
+
+    def test_insert_routing(self):
+        self.assertEqual(self.obj.make_insert(
+            't', columns=['id', 'name'],
+            values=[(1, 'a'), (2, 'b'), (3, 'c')]), 4)
+        self.assertEqual([len(i.queries) for i in self.conns], [1, 1])
+        self.obj.make_insert('t', columns=['id'], values=[5])
+        self.assertEqual(self.conns[1].queries[-1],
+                         "INSERT INTO public.t (id) VALUES (5);")
+        self.assertRaises(MakeQueryError, self.obj.make_insert, 't',
+                          columns=['name'], values=['a'])
+
+    def test_write_routing(self):
+        self.obj.make_update('t', 'public', ('name', 'x'), id=('=', 2))
+        self.assertEqual([len(i.queries) for i in self.conns], [1, 0])
+        result = self.obj.make_delete('t', name=('=', 'x'))
+        self.assertEqual(result[0].counter, 4)
+        self.assertRaises(MakeQueryError, self.obj.make_update, 't',
+                          'public', ('id', 1), name=('=', 'x'))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSharding)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
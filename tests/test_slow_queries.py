@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from content import DataContainer, ResultSet
+from query_content import DynamicDataManager, StaticDataManager
+from recording import RecordingConnection
+from slow_queries import SlowQueryLog
+
+PLAN = [{"Plan": {"Node Type": "Seq Scan"}}]
+
+
+class Connection(RecordingConnection):
+    """ Подключение, в котором запросы к таблице slow выполняются 20 мс.
+        План EXPLAIN возвращается, как его возвращает psycopg2: столбец
+        json преобразуется драйвером в список
+    """
+    def respond(self, query, params):
+        if query.startswith('EXPLAIN'):
+            if 'broken' in query:
+                raise ValueError('syntax error')
+            return ResultSet(('QUERY PLAN',), [(PLAN,)])
+        if 'slow' in query:
+            time.sleep(0.02)
+        if query.startswith('SELECT'):
+            return ResultSet(('id',), [(1,)])
+        return [DataContainer(None, None, 1)]
+
+
+class TestSlowQueries(unittest.TestCase):
+    def setUp(self):
+        self.conn = Connection()
+        self.obj = StaticDataManager(self.conn)
+        self.obj.slow_log = self.log = SlowQueryLog(threshold=0.01, size=2)
+
+    def test_read_is_explained(self):
+        self.obj.as_value(False, "SELECT id FROM fast")
+        self.obj.as_value(False, "SELECT id FROM slow WHERE id = %s", 1)
+        self.assertEqual(self.conn.queries[-1],
+                         "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+                         "SELECT id FROM slow WHERE id = 1")
+        entry, = self.log.entries()
+        self.assertEqual(entry['plan'], PLAN)
+        self.assertGreaterEqual(entry['seconds'], 0.02)
+        self.assertIsNone(entry['error'])
+
+    def test_write_is_rolled_back(self):
+        model = DynamicDataManager(self.conn)
+        model.slow_log = self.log
+        model.make_delete('slow', id=('=', 1))
+        self.assertEqual(self.conn.queries[1:], [
+            "begin", "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+                     "DELETE FROM public.slow WHERE id = 1;", "rollback"])
+
+        model.begin()
+        model.make_delete('slow', name=('=', 5))
+        model.commit()
+        self.assertEqual(self.conn.queries[-4:-1], [
+            "SAVEPOINT shoe2_explain",
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+            "DELETE FROM public.slow WHERE name = 5;",
+            "ROLLBACK TO SAVEPOINT shoe2_explain"])
+
+    def test_read_in_transaction(self):
+        self.obj.begin()
+        self.obj.as_value(False, "SELECT id FROM slow")
+        self.obj.commit()
+        # ошибка EXPLAIN откатывается до точки сохранения, не прерывая
+        # транзакцию
+        self.assertEqual(self.conn.queries[-4:-1], [
+            "SAVEPOINT shoe2_explain",
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT id FROM slow",
+            "ROLLBACK TO SAVEPOINT shoe2_explain"])
+
+    def test_template_interval(self):
+        for value in (1, 2):
+            self.obj.as_value(False, "SELECT id FROM slow WHERE id = %s",
+                              value)
+        self.obj.make_query("VACUUM slow")
+        # в журнале две последние записи, повторный план шаблона
+        # не запрашивается
+        entries = self.log.entries()
+        self.assertEqual([(i['query'], i['plan']) for i in entries],
+                         [("SELECT id FROM slow WHERE id = 2", None),
+                          ("VACUUM slow", None)])
+        self.assertEqual(len([i for i in self.conn.queries
+                              if i.startswith('EXPLAIN')]), 1)
+
+    def test_explain_error(self):
+        self.obj.make_query("UPDATE slow SET broken = 1")
+        entry, = self.log.entries()
+        self.assertIsNone(entry['plan'])
+        self.assertIn('ValueError', entry['error'])
+        self.assertEqual(self.conn.queries[-1], "rollback")
+
+    def test_dump(self):
+        self.obj.as_value(False, "SELECT id FROM slow")
+        path = tempfile.mktemp(suffix='.json')
+        try:
+            self.assertEqual(self.log.dump(path), 1)
+            with open(path) as stream:
+                self.assertEqual(json.load(stream)[0]['query'],
+                                 "SELECT id FROM slow")
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSlowQueries)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+from custom_errors import RunQueryError
+from statement_cache import StatementCache, numbered_query
+
+
+class StatementLog(object):
+    """ Подключение, протоколирующее операции с операторами """
+    def __init__(self):
+        self.log = []
+        self.prepared = set()
+
+    def run_query(self, query, params=None):
+        self.log.append(('run', query, params))
+        return params
+
+    def prepare_statement(self, name, query):
+        self.log.append(('prepare', name, query))
+        self.prepared.add(name)
+
+    def execute_statement(self, name, params):
+        if name not in self.prepared:
+            raise RunQueryError('prepared statement "%s" does not exist' % name,
+                                sqlstate='26000')
+        if params == ['fail']:
+            raise RunQueryError('relation "t" does not exist',
+                                sqlstate='42P01')
+        self.log.append(('execute', name, params))
+        return params
+
+    def deallocate_statement(self, name):
+        self.log.append(('deallocate', name))
+        self.prepared.discard(name)
+
+
+class TestStatementCache(unittest.TestCase):
+    def test_numbered_positional(self):
+        self.assertEqual(numbered_query("select %s, %s::int4 where a like '%%'",
+                                        [1, 2]),
+                         ("select $1, $2::int4 where a like '%'", [1, 2]))
+
+    def test_numbered_named(self):
+        self.assertEqual(numbered_query("select %(a)s, %(b)s, %(a)s",
+                                        {'a': 1, 'b': 2}),
+                         ("select $1, $2, $1", [1, 2]))
+
+    def test_prepare_once(self):
+        conn, cache = StatementLog(), StatementCache()
+        for i in range(3):
+            self.assertEqual(cache.execute(conn, "select %s", [i]), [i])
+        self.assertEqual(len([i for i in conn.log if i[0] == 'prepare']), 1)
+        self.assertEqual(cache.stats(), {'size': 1, 'hits': 2, 'misses': 1,
+                                         'evictions': 0})
+
+    def test_lru_eviction(self):
+        conn, cache = StatementLog(), StatementCache(2)
+        cache.execute(conn, "select 1", None)
+        cache.execute(conn, "select 2", None)
+        cache.execute(conn, "select 1", None)
+        cache.execute(conn, "select 3", None)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(conn.log[-2][0], 'deallocate')
+        cache.execute(conn, "select 1", None)
+        self.assertEqual(cache.hits, 2)
+
+    def test_reprepare_after_reconnect(self):
+        conn, cache = StatementLog(), StatementCache()
+        cache.execute(conn, "select %s", [1])
+        conn.prepared.clear()
+        self.assertEqual(cache.execute(conn, "select %s", [2]), [2])
+        self.assertEqual(len([i for i in conn.log if i[0] == 'prepare']), 2)
+
+    def test_other_errors_are_raised(self):
+        conn, cache = StatementLog(), StatementCache()
+        cache.execute(conn, "select * from t where a = %s", [1])
+        self.assertRaises(RunQueryError, cache.execute, conn,
+                          "select * from t where a = %s", ['fail'])
+        self.assertEqual(len([i for i in conn.log if i[0] == 'prepare']), 1)
+
+    def test_not_preparable(self):
+        conn, cache = StatementLog(), StatementCache()
+        cache.execute(conn, "SET search_path TO %s", ['x'])
+        cache.execute(conn, "CREATE TABLE t (a text DEFAULT '%%')", None)
+        cache.execute(conn, "begin", None)
+        cache.execute(conn, "select 1; select 2;", None)
+        cache.execute(conn, "  (SELECT %s);", [1])
+        self.assertEqual(conn.log[:4], [
+            ('run', "SET search_path TO %s", ['x']),
+            ('run', "CREATE TABLE t (a text DEFAULT '%')", None),
+            ('run', "begin", None),
+            ('run', "select 1; select 2;", None)])
+        self.assertEqual(conn.log[4][0], 'prepare')
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestStatementCache)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -60,6 +60,13 @@ class TestStaticDataManager(unittest.TestCase):
         res = obj.as_value(False, "select id from lorem_cross.city")
         self.assertTrue(isinstance(res, int))
 
+    def test_generator_stops_early(self):
+        res = obj.as_generator_of_tuples(
+            "select generate_series(1, 100000)")
+        self.assertEqual(res.next(), (1, ))
+        res.close()
+        self.assertEqual(obj.as_value(False, "select 1"), 1)
+
     def test_as_empty_value(self):
         self.assertRaises(custom_errors.DataError, obj.as_value,
                           True, "select id from lorem_Cross.city where id = -100500")
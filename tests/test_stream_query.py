@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import content
+from transaction import Transaction
+
+
+class Wrapper(Transaction):
+    """ Подключение драйвера, записывающее выполненные команды
+        в общий журнал [(номер подключения, команда)]
+    """
+    log = []
+    opened = 0
+
+    def __init__(self, db_name, user, password, host, port):
+        super(Wrapper, self).__init__()
+        self.db_name, self.user, self.password = db_name, user, password
+        self.host, self.port = host, port
+        self.number = Wrapper.opened
+        Wrapper.opened += 1
+        self.rows = []
+        self.broken = False
+
+    def connect(self):
+        self.log.append((self.number, 'connect'))
+
+    def disconnect(self):
+        self.log.append((self.number, 'disconnect'))
+        self.close_streams()
+
+    def run_query(self, query, params=None):
+        self.log.append((self.number, query.split(' ')[0]))
+        if self.broken:
+            raise StandardError('server closed the connection')
+        if query.startswith('DECLARE'):
+            self.rows = [(i,) for i in range(5)]
+        if query.startswith('FETCH'):
+            size = int(query.split(' ')[2])
+            chunk, self.rows = self.rows[:size], self.rows[size:]
+            return chunk
+        return []
+
+content.MARKER = Wrapper
+
+import connection
+
+
+class TestStreamQuery(unittest.TestCase):
+    def setUp(self):
+        del Wrapper.log[:]
+        self.conn = Wrapper('db', 'user', 'password', 'host', 5432)
+
+    def commands(self, number):
+        return [i[1] for i in Wrapper.log if i[0] == number]
+
+    def test_dedicated_connection(self):
+        rows = self.conn.stream_query("SELECT x FROM t", 2)
+        self.assertEqual(next(rows), (0,))
+        # запрос во время выборки выполняется вне транзакции курсора
+        self.conn.run_query("UPDATE t SET x = 1")
+        self.assertEqual(list(rows), [(1,), (2,), (3,), (4,)])
+        self.assertEqual(self.commands(self.conn.number), ['UPDATE'])
+        self.assertEqual(self.commands(self.conn.number + 1),
+                         ['connect', 'begin', 'DECLARE', 'FETCH', 'FETCH',
+                          'FETCH', 'CLOSE', 'commit'])
+
+    def test_early_close(self):
+        rows = self.conn.stream_query("SELECT x FROM t", 2)
+        next(rows)
+        rows.close()
+        # транзакция курсора откатывается, подключение сохраняется
+        self.assertEqual(self.commands(self.conn.number + 1),
+                         ['connect', 'begin', 'DECLARE', 'FETCH', 'CLOSE',
+                          'rollback'])
+
+    def test_connection_is_reused(self):
+        for _ in range(2):
+            self.assertEqual(len(list(self.conn.stream_query("SELECT x", 2))),
+                             5)
+        self.assertEqual(Wrapper.opened, self.conn.number + 2)
+        self.assertEqual(self.commands(self.conn.number + 1).count('begin'),
+                         2)
+        self.conn.disconnect()
+        self.assertEqual(self.commands(self.conn.number + 1)[-1],
+                         'disconnect')
+
+    def test_broken_connection_is_replaced(self):
+        list(self.conn.stream_query("SELECT x", 10))
+        spare = self.conn._Transaction__streams[0]
+        spare.broken = True
+        self.assertEqual(len(list(self.conn.stream_query("SELECT x", 10))), 5)
+        self.assertEqual(self.commands(spare.number)[-2:],
+                         ['begin', 'disconnect'])
+        self.assertEqual(Wrapper.opened, self.conn.number + 3)
+
+    def test_open_transaction(self):
+        self.conn.begin()
+        self.assertEqual(len(list(self.conn.stream_query("SELECT x", 10))),
+                         5)
+        self.conn.commit()
+        self.assertEqual(self.commands(self.conn.number),
+                         ['begin', 'DECLARE', 'FETCH', 'CLOSE', 'commit'])
+        self.assertEqual(Wrapper.opened, self.conn.number + 1)
+
+    def test_shared_connection_is_not_locked(self):
+        shared = connection.Capstone(connection.SHARED, 'db', 'user',
+                                     'password', 'host', 5432)()
+        rows = shared.stream_query("SELECT x FROM t", 2)
+        next(rows)
+        thread = threading.Thread(target=shared.run_query, args=("SELECT 1",))
+        thread.start()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+
+        errors = []
+
+        def close():
+            try:
+                rows.close()
+            except Exception as err:
+                errors.append(err)
+        thread = threading.Thread(target=close)
+        thread.start()
+        thread.join(1)
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestStreamQuery)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import time
+import unittest
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
+sys.path.append(BASEDIR)
+
+import psyco_connection
+from connection import Capstone, LOCAL
+import query_content
+
+fabric = Capstone(LOCAL, 'lorem_cross', 'lcadmin', 'Br@hec&^^', '127.0.0.1', 5432)
+static = query_content.StaticDataManager(fabric())
+dynamic = query_content.DynamicDataManager(fabric())
+
+
+class TestThreadConnections(unittest.TestCase):
+    def test_managers_share_thread_connection(self):
+        pid = static.as_value(False, "select pg_backend_pid()")
+        res = dynamic.as_value('city', schema='lorem_cross',
+                               items=['pg_backend_pid()', ])
+        self.assertEqual(pid, res)
+
+    def test_threads_use_own_connections(self):
+        pids = []
+
+        def run():
+            pids.append(static.as_value(False, "select pg_backend_pid()"))
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(pids)), 4)
+
+    def test_connection_closed_explicitly(self):
+        static.as_value(False, "select 1")
+        opened = fabric.threads.opened
+
+        def run():
+            static.as_value(False, "select 1")
+            fabric.threads.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertEqual(fabric.threads.opened, opened)
+
+    def test_connections_closed_with_threads(self):
+        static.as_value(False, "select 1")
+        opened = fabric.threads.opened
+
+        thread = threading.Thread(
+            target=lambda: static.as_value(False, "select 1"))
+        thread.start()
+        thread.join()
+        # локальные данные потока уничтожаются после его завершения,
+        # не обязательно к моменту возврата из join
+        deadline = time.time() + 5
+        while fabric.threads.opened != opened and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(fabric.threads.opened, opened)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestThreadConnections)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
@@ -7,6 +7,8 @@ import unittest
 BASEDIR = os.path.dirname(os.path.abspath(__file__)) + "{0}..{0}".format(os.sep)
 sys.path.append(BASEDIR)
 
+from caches import LRUCache
+from translators import misc
 from translators.misc import make_date, make_time, make_datetime, make_interval
 
 
@@ -280,6 +282,40 @@ class TestMisc(unittest.TestCase):
         res = make_interval("10 seconds", False)
         self.assertEqual(res, datetime.timedelta(seconds=10))
 
+# testing fast paths and cache
+    def test_make_date_from_iso_string(self):
+        self.assertEqual(make_date("2017-05-04", False),
+                         datetime.date(2017, 5, 4))
+        self.assertEqual(make_date("2017-05-04"), "04.05.2017")
+        self.assertRaises(ValueError, make_date, "2017-13-04")
+
+    def test_make_datetime_from_iso_string(self):
+        self.assertEqual(make_datetime("2015-03-17T18:00:08.25", False),
+                         datetime.datetime(2015, 3, 17, 18, 0, 8, 250000))
+        self.assertEqual(make_datetime("2015-03-17 18:00:08"),
+                         "17.03.2015 18:00:08")
+        self.assertRaises(ValueError, make_datetime,
+                          "2015-03-17 18:00:08+03", False)
+
+    def test_make_time_short_format(self):
+        self.assertEqual(make_time("12:00"), "12:00")
+        self.assertRaises(ValueError, make_time, "25:00:00")
+
+    def test_parsed_values_cache(self):
+        cache, misc.cache = misc.cache, LRUCache(16)
+        try:
+            for _ in range(3):
+                self.assertEqual(make_date("05.05.17", False),
+                                 datetime.date(2017, 5, 5))
+            self.assertEqual(misc.cache_stats()['hits'], 2)
+            self.assertEqual(misc.cache.hit_rate(), 2 / 3.0)
+            misc.cache = None
+            self.assertIsNone(misc.cache_stats())
+            self.assertEqual(make_date("05.05.17", False),
+                             datetime.date(2017, 5, 5))
+        finally:
+            misc.cache = cache
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestMisc)
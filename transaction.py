@@ -3,15 +3,27 @@
     Анти-ORM пакет для работы с базами данных PostgreSQL
     Класс управления транзакциями
 """
+import itertools
+
+import content
 from custom_errors import TransactionError
 
+# Счетчик для формирования уникальных имен курсоров
+_CURSORS = itertools.count()
+
 
 class Transaction(object):
     """ Класс, управляющий транзакционным блоком
         Реализован в виде примешиваемого класса (mixin-class)
     """
+    # Число сохраняемых для повторного использования подключений
+    # выборок вне транзакции (0 - подключение закрывается после выборки)
+    stream_spare = 1
+
     def __init__(self):
         self.is_opened = False
+        # Свободные подключения выборок вне транзакции
+        self.__streams = []
 
     def begin(self):
         """ Открытие транзакционного блока """
@@ -52,3 +64,112 @@ class Transaction(object):
                 .describe(u"Не удалось откатить транзакцию")
         else:
             self.is_opened = False
+
+    def stream_query(self, query, fetch_size=1000, params=None):
+        """ Построчная выборка через курсор на стороне сервера.
+            Строки запрашиваются у сервера порциями по fetch_size.
+            Внутри открытой транзакции курсор работает в ней. Вне транзакции
+            выборка выполняется на отдельном подключении в собственной
+            транзакции, которая подтверждается по окончании выборки, так что
+            запросы, выполняемые во время перебора строк на этом подключении
+            (в том числе из других потоков при разделяемом подключении),
+            в транзакцию курсора не попадают. Отдельное подключение после
+            выборки сохраняется (не более stream_spare) и используется
+            следующими выборками; закрывается оно вместе с подключением
+            (close_streams). Подключение типа POOL этим методом не
+            пользуется: выборка выполняется в транзакции на подключении
+            из пула. При досрочном прекращении перебора курсор закрывается
+            и выполнение запроса на сервере прекращается
+            :param query: текст запроса на выборку
+            :param fetch_size: размер порции
+            :param params: параметры запроса, передаваемые драйверу
+            :return: генератор строк выборки
+        """
+        if self.is_opened:
+            for row in self.__fetch(self, query, fetch_size, params):
+                yield row
+            return
+
+        conn = self.__stream_connection()
+        rows = self.__fetch(conn, query, fetch_size, params)
+        finished = False
+        try:
+            for row in rows:
+                yield row
+            conn.run_query(u"commit")
+            finished = True
+        finally:
+            rows.close()
+            if not finished:
+                try:
+                    conn.run_query(u"rollback")
+                except StandardError:
+                    conn.disconnect()
+                    conn = None
+            if conn is not None:
+                self.__release_stream(conn)
+
+    def __stream_connection(self):
+        """ Подключение выборки вне транзакции с открытой транзакцией.
+            Сохраненное подключение используется повторно, разорванное
+            подключение заменяется новым
+        """
+        while True:
+            try:
+                conn = self.__streams.pop()
+            except IndexError:
+                break
+            try:
+                conn.run_query(u"begin")
+            except StandardError:
+                conn.disconnect()
+            else:
+                return conn
+
+        conn = content.MARKER(self.db_name, self.user, self.password,
+                              self.host, self.port)
+        conn.connect()
+        try:
+            conn.run_query(u"begin")
+        except StandardError:
+            conn.disconnect()
+            raise
+        return conn
+
+    def __release_stream(self, conn):
+        """ Сохранение подключения выборки для повторного использования """
+        if len(self.__streams) < self.stream_spare:
+            self.__streams.append(conn)
+        else:
+            conn.disconnect()
+
+    def close_streams(self):
+        """ Закрытие сохраненных подключений выборок вне транзакции """
+        while True:
+            try:
+                conn = self.__streams.pop()
+            except IndexError:
+                return
+            conn.disconnect()
+
+    @staticmethod
+    def __fetch(conn, query, fetch_size, params):
+        """ Перебор строк курсора, открытого в текущей транзакции
+            подключения conn. Курсор закрывается по окончании перебора
+        """
+        name = u"shoe2_cursor_%d" % next(_CURSORS)
+        try:
+            conn.run_query(u"DECLARE %s NO SCROLL CURSOR FOR %s"
+                           % (name, query.rstrip().rstrip(';')), params)
+            fetch = u"FETCH FORWARD %d FROM %s" % (fetch_size, name)
+            while True:
+                chunk = conn.run_query(fetch)
+                for row in chunk:
+                    yield row
+                if len(chunk) < fetch_size:
+                    break
+        finally:
+            try:
+                conn.run_query(u"CLOSE %s" % name)
+            except StandardError:
+                pass
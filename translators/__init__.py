@@ -5,10 +5,13 @@
 """
 from functools import wraps
 from decimal import Decimal
+from operator import itemgetter
 
-from base_translators import PgArray, PtnArray, PtnSized
+from base_translators import PgArray, PgBulkArray, PtnArray, PtnSized
+from base_translators import PtnTranslator
 import pg_translators
 import python_translators
+from profiler import RETRANSLATE, TRANSLATE, timed
 
 
 PgBool = pg_translators.Bool
@@ -55,6 +58,7 @@ def PtnSizedFloat(accuracy):
         :returns: Переопределенный класс AsFloat, обладающий заданной точностью
     """
     class AsSizedFloat(PtnFloat, PtnSized):
+        passthrough = PtnSized.passthrough
         size = accuracy
 
         def _apply_size(self, value):
@@ -71,6 +75,7 @@ def PtnSizedDecimal(accuracy):
                   обладающий заданной точностью
     """
     class AsSizedDecimal(PtnDecimal, PtnSized):
+        passthrough = PtnSized.passthrough
         size = accuracy
 
         def _apply_size(self, value):
@@ -86,6 +91,7 @@ def PtnSizedString(length):
         :returns: Переопределенный класс AsString, обладающий заданной длинной
     """
     class AsSizedString(PtnString, PtnSized):
+        passthrough = PtnSized.passthrough
         size = length
 
         def cast(self, value):
@@ -99,10 +105,12 @@ def PtnSizedUnicode(length):
         :returns: Переопределенный класс AsUnicode, обладающий заданной длинной
     """
     class AsSizedUnicode(PtnUnicode, PtnSized):
+        passthrough = PtnSized.passthrough
         size = length
     return AsSizedUnicode
 
 
+@timed(TRANSLATE)
 def _translate(objects, args):
     """ Слияние списка объектов-преобразователей со списком аргументов
         :param objects: Кортеж классов-преобразователей (П1, П2, ...)
@@ -140,6 +148,107 @@ def append_list(lst1, lst2, default=None, cut=False):
             lst2 += [default, ] * abs(delta)
 
 
+def _caster(translator):
+    """ Функция преобразования одиночного значения
+        :param translator: класс трансформации Ptn* либо функция
+            преобразования значения (например, объект PtnArray)
+        :returns функция одного аргумента или None
+    """
+    if translator is None:
+        return None
+    if isinstance(translator, type) and \
+            issubclass(translator, PtnTranslator):
+        return translator.caster()
+    return translator
+
+
+def _compile(pattern):
+    """ Компиляция шаблона преобразования в функцию обработки результата.
+        Классы трансформации заменяются функциями преобразования значений
+        один раз, при компиляции
+        :param pattern: шаблон строки (см. _retranslate)
+        :returns функция, преобразующая результат выборки
+    """
+    if pattern is None:
+        return lambda result: result
+
+    if isinstance(pattern, dict):
+        casters = [(key, _caster(cls)) for key, cls in pattern.items()
+                   if cls is not None]
+        value_caster = _caster(pattern.values()[0]) if pattern else None
+
+        def turn_row(row):
+            """ Преобразование словаря """
+            for key, cast in casters:
+                if key in row:
+                    row[key] = cast(row[key])
+            return row
+
+        def turn_rows(rows):
+            return [turn_row(row) for row in rows]
+
+    elif isinstance(pattern, (tuple, list)):
+        width = len(pattern)
+        casters = [(idx, _caster(cls)) for idx, cls in enumerate(pattern)
+                   if cls is not None]
+        value_caster = _caster(pattern[0]) if pattern else None
+
+        def turn_row(row):
+            """ Преобразование кортежа """
+            row = list(row)
+            if len(row) < width:
+                row.extend([None] * (width - len(row)))
+            for idx, cast in casters:
+                row[idx] = cast(row[idx])
+            return tuple(row)
+
+        def turn_rows(rows):
+            """ Преобразование списка кортежей по колонкам """
+            lengths = set(map(len, rows))
+            if len(lengths) != 1 or min(lengths) < width:
+                return [turn_row(row) for row in rows]
+            columns = [map(itemgetter(idx), rows)
+                       for idx in xrange(lengths.pop())]
+            for idx, cast in casters:
+                columns[idx] = map(cast, columns[idx])
+            return zip(*columns)
+
+    else:
+        value_caster = _caster(pattern)
+        turn_row = None
+        turn_rows = None
+
+    def turn_value(value):
+        """ Преобразование атомарного типа """
+        return value if value_caster is None else value_caster(value)
+
+    def turn_generator(result):
+        """ Преобразование генератора """
+        for itm in result:
+            yield worker(itm)
+
+    worker = turn_row or turn_value
+
+    def convert(result):
+        if result is None:
+            return result
+        # обработка генераторов словарей и кортежей
+        if hasattr(result, 'next'):
+            return turn_generator(result)
+        # обработка списков словарей и кортежей
+        if isinstance(result, list):
+            if turn_rows is not None and result and \
+                    isinstance(result[0], (dict, tuple)):
+                return turn_rows(result)
+            return [worker(item) for item in result]
+        # обработка словаря или кортежа
+        if isinstance(result, (dict, tuple)):
+            return worker(result)
+        # обработка атомарного значения
+        return turn_value(result)
+    return timed(RETRANSLATE)(convert)
+
+
 def _retranslate(pattern, result):
     """ Преобразование результата выборки
         предложенными классами трансформации
@@ -153,71 +262,7 @@ def _retranslate(pattern, result):
         :returns в зависимости от типа результата возвращает соответствующий
         набор преобразованных значений
     """
-    if (result is None) or (pattern is None):
-        return result
-
-    def turn_generator():
-        """ Преобразование генератора """
-        for itm in result:
-            yield worker(itm)
-
-    def turn_dictionary(row):
-        """ Преобразование словаря """
-        if not isinstance(pattern, dict):
-            raise TypeError(u"Шаблон должен быть задан в виде словаря")
-
-        for key in row.keys():
-            if key in pattern:
-                if pattern[key] is not None:
-                    row[key] = pattern[key](row[key])()
-        return row
-
-    def turn_tuple(row):
-        """ Преобразование кортежа """
-        if not isinstance(pattern, (tuple, list)):
-            raise TypeError(u"Шаблон должен быть задан "
-                            u"в виде списка или кортежа")
-
-        row = list(row)
-        append_list(pattern, row)
-        for idx, itm in enumerate(row):
-            if pattern[idx] is None:
-                continue
-            row[idx] = pattern[idx](itm)()
-        return tuple(row)
-
-    def turn_value(value):
-        """ Преобразование атомарного типа """
-        if isinstance(pattern, dict):
-            cls = pattern.values()[0]
-        elif isinstance(pattern, (list, tuple)):
-            cls = pattern[0]
-        else:
-            cls = pattern
-
-        if cls is None:
-            return value
-
-        return cls(value)()
-
-    if isinstance(pattern, dict):
-        worker = turn_dictionary
-    elif isinstance(pattern, (tuple, list)):
-        worker = turn_tuple
-    else:
-        worker = turn_value
-
-    # обработка генераторов словарей и кортежей
-    if hasattr(result, 'next'):
-        return turn_generator()
-    # обработка списков словарей и кортежей
-    if isinstance(result, list):
-        return [worker(item) for item in result]
-    # обработка словаря или кортежа
-    if isinstance(result, (dict, tuple)):
-        return worker(result)
-    # обработка атомарного значения
-    return worker(result)
+    return _compile(pattern)(result)
 
 
 def translate(*translators):
@@ -247,15 +292,17 @@ def retranslate(pattern):
         Реализация в виде декоратора
         :param pattern: список классов трансформации
     """
+    convert = _compile(pattern)
+
     def maker(func):
         @wraps(func)
         def wrap_function(*args, **kwargs):
-            kwargs['result'] = _retranslate(pattern, kwargs['result'])
+            kwargs['result'] = convert(kwargs['result'])
             return func(*args, **kwargs)
 
         @wraps(func)
         def wrap_method(self, *args, **kwargs):
-            kwargs['result'] = _retranslate(pattern, kwargs['result'])
+            kwargs['result'] = convert(kwargs['result'])
             return func(self, *args, **kwargs)
 
         if('self' in func.func_code.co_varnames) \
@@ -5,10 +5,128 @@
     Базовые классы преобразования данных для построения SQL запросов
     и форматировании полученных результатов
 """
+import ast
+import datetime
 import re
 
+from caches import MISSING
+
 SHARED_CLIENT = None
+# Неизменяемые типы значений, литералы которых допускают общий кэш
+INTERNED = frozenset([bool, int, long, datetime.date, datetime.datetime,
+                      datetime.time, datetime.timedelta])
+# Изменяемые типы значений, литералы которых не сохраняются: значение
+# может измениться после создания объекта преобразования
+MUTABLE = (dict, list, set, bytearray)
 TEMPLATE = re.compile("""[\\{\\}'"]+""")
+# Лексемы текстового представления массива PostgreSQL: скобки, запятая,
+# элемент в двойных кавычках, элемент в одинарных кавычках (устаревшая
+# запись, допускаемая для совместимости) и элемент без кавычек
+ARRAY_TOKEN = re.compile(r"""\s*(?:(\{)|(\})|(,)|"((?:[^"\\]|\\.)*)"|"""
+                         r"""'((?:[^'\\]|\\.)*)'|"""
+                         r"""([^{},"\s](?:[^{},"]*[^{},"\s])?))""", re.S)
+ARRAY_ESCAPE = re.compile(r"\\(.)", re.S)
+# Признаки массива, который нельзя разобрать простым делением по запятым
+ARRAY_SPECIAL = re.compile(r"""[{}"'\\]""")
+# Признаки элемента массива, который необходимо заключить в кавычки
+ARRAY_QUOTED = re.compile(r"""[{}",\\\s]""")
+
+
+def literal(value):
+    """ Значение литерала Python (число, строка в кавычках, True, False,
+        None, список и т.п.) без выполнения кода. Строка, не являющаяся
+        литералом, возвращается без изменений
+    """
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(value)
+    except Exception:
+        return value
+
+
+def parse_array(text, cast=None):
+    """ Разбор текстового представления массива PostgreSQL вида
+        {1,NULL,"a \\"b\\"",{2,3}} за один проход по строке.
+        Поддерживаются кавычки, экранирование, NULL, вложенные массивы
+        и границы размерностей ([1:2]={...})
+        :param text: строка с массивом
+        :param cast: функция преобразования элемента, получает строку
+        :returns вложенные списки значений (NULL - None)
+    """
+    text = text.strip()
+    inner = text[1:-1]
+    if text[:1] == '{' and text[-1:] == '}' and \
+            not ARRAY_SPECIAL.search(inner):
+        return _parse_flat(inner, cast)
+
+    pos = 0
+    if text.startswith('['):
+        pos = text.index('=') + 1
+
+    match = ARRAY_TOKEN.match
+    end = len(text)
+    root = current = None
+    stack = []
+    while pos < end:
+        token = match(text, pos)
+        if token is None:
+            raise ValueError(u"Неверный формат массива: {0}".format(text))
+        pos = token.end()
+        kind = token.lastindex
+
+        if kind == 1:
+            item = []
+            if current is not None:
+                current.append(item)
+            elif root is None:
+                root = item
+            else:
+                raise ValueError(
+                    u"Неверный формат массива: {0}".format(text))
+            stack.append(current)
+            current = item
+            continue
+        if kind == 3:
+            continue
+        if current is None:
+            raise ValueError(u"Неверный формат массива: {0}".format(text))
+        if kind == 2:
+            current = stack.pop()
+            continue
+
+        value = token.group(kind)
+        if kind == 6:
+            if value.upper() == 'NULL':
+                current.append(None)
+                continue
+        elif '\\' in value:
+            value = ARRAY_ESCAPE.sub(r'\1', value)
+        current.append(value if cast is None else cast(value))
+
+    if root is None or current is not None:
+        raise ValueError(u"Неверный формат массива: {0}".format(text))
+    return root
+
+
+def _parse_flat(inner, cast):
+    """ Разбор одномерного массива без кавычек и экранирования
+        :param inner: содержимое массива без фигурных скобок
+        :param cast: функция преобразования элемента
+    """
+    if not inner.strip():
+        return []
+    items = inner.split(',')
+    if inner != inner.strip() or ', ' in inner or ' ,' in inner:
+        items = [item.strip() for item in items]
+    if 'null' in inner.lower():
+        items = [None if item.upper() == 'NULL' else item for item in items]
+        if cast is not None:
+            items = [None if item is None else cast(item) for item in items]
+        return items
+    return items if cast is None else map(cast, items)
 
 
 class PgTranslator(object):
@@ -17,6 +135,11 @@ class PgTranslator(object):
         строкового шаблона pg_pattern по заданным правилам
     """
     pg_pattern = "{0}"
+    # Общий для процесса кэш литералов значений неизменяемых типов
+    # {(класс, тип, значение): литерал} (None - без кэширования)
+    literals = None
+    # Литерал текущего значения (None - еще не построен)
+    __literal = None
 
     def _translate(self, value):
         """ Интерпритация переданного значения """
@@ -32,16 +155,72 @@ class PgTranslator(object):
 
     def _set_value(self, value):
         self.__value = 'NULL' if self.is_null(value) else value
+        self._reset()
+
+    def _reset(self):
+        """ Сброс построенного литерала при изменении значения
+            или параметров преобразования
+        """
+        self.__literal = None
 
     @property
     def value(self):
         return self.__value
 
+    def _intern_key(self, value):
+        """ Ключ литерала в общем кэше literals (None - не кэшируется) """
+        kind = type(value)
+        if kind in INTERNED and getattr(value, 'tzinfo', None) is None:
+            return self.__class__, kind, value
+        return None
+
+    def _render(self):
+        """ Литерал значения для SQL запроса. Строится один раз
+            до следующего изменения значения; для значений изменяемых
+            типов (MUTABLE) строится при каждом обращении
+        """
+        literal = self.__literal
+        if literal is None:
+            store = self.literals
+            key = None if store is None else self._intern_key(self.value)
+            if key is None:
+                literal = self._translate(self.value)
+            else:
+                literal = store.get(key)
+                if literal is MISSING:
+                    literal = self._translate(self.value)
+                    store.put(key, literal)
+            if not isinstance(self.value, MUTABLE):
+                self.__literal = literal
+        return literal
+
     @staticmethod
     def is_null(value):
         return (value is None) or (value == 'NULL')
 
+    def raw(self):
+        """ Значение в текстовом представлении PostgreSQL
+            без кавычек и приведения типа (None для NULL).
+            Используется для передачи данных через COPY
+        """
+        return None if self.is_null(self.value) else self._raw(self.value)
+
+    def _raw(self, value):
+        """ Текстовое представление значения.
+            Метод переопределяется в дочерних классах
+        """
+        return value
+
     def __init__(self, value):
+        store = self.literals
+        if store is not None:
+            key = self._intern_key(value)
+            literal = None if key is None else store.get(key, None)
+            if literal is not None:
+                # Значение уже проверялось и преобразовывалось
+                self._set_value(value)
+                self.__literal = literal
+                return
         try:
             self._validate(value)
         except Exception as err:
@@ -49,13 +228,13 @@ class PgTranslator(object):
         self._set_value(value)
 
     def __str__(self):
-        return self._translate(self.value)
+        return self._render()
 
     def __unicode__(self):
-        return u"{0}".format(self._translate(self.value))
+        return u"{0}".format(self._render())
 
     def __repr__(self):
-        return self._translate(self.value)
+        return self._render()
 
 
 class PgSizedTranslator(PgTranslator):
@@ -65,6 +244,7 @@ class PgSizedTranslator(PgTranslator):
 
     def _set_size(self, value):
         self.__size = value
+        self._reset()
 
     def __init__(self, value):
         val = None
@@ -79,6 +259,10 @@ class PgSizedTranslator(PgTranslator):
     def size(self):
         return self.__size
 
+    def _intern_key(self, value):
+        key = super(PgSizedTranslator, self)._intern_key(value)
+        return None if key is None else key + (self.size,)
+
     def _apply_size(self, value):
         if self.is_null(value) or self.size < 0:
             return value
@@ -89,6 +273,9 @@ class PgSizedTranslator(PgTranslator):
             self._set_value(value)
         return self.__class__.pg_pattern.format(self._apply_size(self.value))
 
+    def _raw(self, value):
+        return self._apply_size(value)
+
     def __call__(self, value):
         self._validate(value)
         self._set_value(value)
@@ -120,6 +307,99 @@ class PgArray(PgTranslator):
         return self
 
 
+def array_element(text):
+    """ Элемент текстового представления массива PostgreSQL
+        :param text: строковое значение элемента (None - NULL)
+    """
+    if text is None:
+        return 'NULL'
+    if not text or ARRAY_QUOTED.search(text) or text.upper() == 'NULL':
+        return '"%s"' % text.replace('\\', '\\\\').replace('"', '\\"')
+    return text
+
+
+class PgBulkArray(PgTranslator):
+    """ Класс трансформации последовательности в массив PostgreSQL,
+        представленный одним литералом '{...}'::тип[]. Элементы кодируются
+        без создания объекта-транслятора на каждый элемент; при передаче
+        драйверу массив занимает один параметр запроса.
+        Без шаблона литерал не типизируется и тип массива выводится
+        сервером из контекста (например, id = ANY('{1,2}'))
+    """
+    def __init__(self, template=None):
+        """ Конструктор класса
+            :param template: класс (или объект) трансформации элементов Pg*
+        """
+        self.__template = template
+        self.pg_pattern = '{0}' if template is None \
+            else template.pg_pattern + '[]'
+        PgTranslator.__init__(self, None)
+
+    def _translate(self, value):
+        if self.is_null(self.value):
+            return self.pg_pattern.format('NULL')
+        value = self.value
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        return self.pg_pattern.format("'%s'" % value.replace("'", "''"))
+
+    def __call__(self, values):
+        if values is None:
+            self._set_value(None)
+            return self
+        if isinstance(values, (str, unicode)):
+            raise ValueError(u"Элементы массива передаются "
+                             u"последовательностью")
+
+        values = list(values)
+        bulk = getattr(self.__template, 'bulk', None)
+        if bulk is not None:
+            try:
+                self._set_value(
+                    "{%s}" % ",".join(map(str, map(bulk, values))))
+                return self
+            except (TypeError, ValueError):
+                pass
+
+        self._set_value("{%s}" % ",".join(map(self.__encoder(), values)))
+        return self
+
+    def __encoder(self):
+        """ Функция кодирования одного элемента """
+        template = self.__template
+        if template is None:
+            def encode(value):
+                if value is None:
+                    return 'NULL'
+                if isinstance(value, bool):
+                    return 'true' if value else 'false'
+                if not isinstance(value, (str, unicode)):
+                    value = str(value)
+                return array_element(value)
+            return encode
+
+        if isinstance(template, PgTranslator):
+            worker = template
+        else:
+            worker = template.__new__(template)
+            if isinstance(worker, PgSizedTranslator):
+                worker._set_size(-1)
+
+        def encode(value):
+            if worker.is_null(value):
+                return 'NULL'
+            try:
+                worker._validate(value)
+            except Exception as err:
+                raise ValueError(err.message)
+            worker._set_value(value)
+            text = worker.raw()
+            if text is not None and not isinstance(text, (str, unicode)):
+                text = str(text)
+            return array_element(text)
+        return encode
+
+
 class PtnTranslator(object):
     """ Базовый класс трансформации переменных
         для форматирования полученных результатов.
@@ -128,6 +408,9 @@ class PtnTranslator(object):
         И базовый класс и наследники являются функторами:
         форматирование происходит в момент вызова объекта
     """
+    # Типы значений, которые преобразование оставляет без изменений
+    passthrough = (type(None), )
+
     def __init__(self, value):
         self.__value = None
         self.value = value
@@ -151,10 +434,7 @@ class PtnTranslator(object):
         self.__value = val
 
     def _translate(self, value):
-        try:
-            return eval(value)
-        except:
-            return value
+        return literal(value)
 
     def cast(self, value):
         return value
@@ -165,6 +445,28 @@ class PtnTranslator(object):
     def __call__(self):
         return None if self.value is None else self.cast(self.value)
 
+    @classmethod
+    def caster(cls):
+        """ Функция преобразования одиночного значения, равносильная
+            вызову cls(value)(), но без создания объекта на каждое значение.
+            Значения типов из passthrough возвращаются без изменений
+        """
+        worker = cls.__new__(cls)
+        set_value, validate, cast = \
+            worker._set_value, worker._validate, worker.cast
+        passthrough = cls.passthrough
+
+        def caster(value):
+            if value.__class__ in passthrough:
+                return value
+            value = set_value(value)
+            try:
+                validate(value)
+            except Exception as err:
+                raise ValueError(err.message)
+            return None if value is None else cast(value)
+        return caster
+
 
 class PtnSized(PtnTranslator):
     """ Класс трансформации переменных с возможностью
@@ -172,6 +474,8 @@ class PtnSized(PtnTranslator):
         Выполнен в виде метакласса для классов, обладающих свойством
         размерности (точности)
     """
+    passthrough = (type(None), )
+
     def cast(self, value):
         return self._apply_size(value)
 
@@ -185,20 +489,25 @@ class PtnArray(object):
     """ Класс преобразования массивов PostgreSQL в списки Python """
     def __init__(self, template):
         self.__template = template
+        if isinstance(template, type) and issubclass(template, PtnTranslator):
+            self.__cast = template.caster()
+        else:
+            self.__cast = template
 
     def __call__(self, value):
         if not value:
             return []
 
         if isinstance(value, (list, tuple)):
-            return [self.__template(item)() for item in value]
+            return self.__cast_all(value)
 
         if isinstance(value, (str, unicode)):
-            if value.startswith('{'):
-                value = '[' + value[1:]
-            if value.endswith('}'):
-                value = value[:-1] + ']'
-            lst = eval(value)
-            return [self.__template(item)() for item in lst]
-
-        return [self.__template(value)(), ]
+            return parse_array(value, self.__cast)
+
+        return [self.__cast(value), ]
+
+    def __cast_all(self, values):
+        """ Преобразование элементов массива, уже разобранного драйвером """
+        cast = self.__cast
+        return [self.__cast_all(item) if isinstance(item, list)
+                else cast(item) for item in values]
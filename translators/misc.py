@@ -7,8 +7,187 @@ import re
 import time
 import datetime
 
+from caches import LRUCache, MISSING
+
 DATE_TEMPLATE = re.compile('[-, .]')
 TIME_TEMPLATE = re.compile('[:.]')
+INTERVAL_TEMPLATE = re.compile(r'\d+')
+
+DATE_ERROR = u"Неверный формат даты"
+TIME_ERROR = u"Неверный формат времени"
+INTERVAL_ERROR = u"Невозможно получить интервал из {0}"
+
+# Кэш разобранных строк {(вид, строка[, параметры]): (значение, формат)},
+# общий для всех трансляторов дат и времени (None - без кэширования)
+cache = LRUCache(4096)
+
+
+def cache_stats():
+    """ Счетчики кэша разобранных значений (None, если кэш отключен) """
+    return None if cache is None else cache.stats()
+
+
+def _cached(kind, parse, text, *args):
+    """ Разбор строки с запоминанием результата
+        :param kind: вид значения (часть ключа кэша)
+        :param parse: функция разбора строки
+        :param text: строка
+        :param args: дополнительные аргументы функции разбора
+    """
+    store = cache
+    if store is None:
+        return parse(text, *args)
+    key = (kind, text) + args
+    parsed = store.get(key)
+    if parsed is MISSING:
+        parsed = parse(text, *args)
+        store.put(key, parsed)
+    return parsed
+
+
+def _parse_date(s_date):
+    """ Разбор строки даты
+        :return: (datetime.date, формат для PostgreSQL)
+    """
+    date_format = '%d.%m.%Y'
+    # Быстрый разбор форматов ДД.ММ.ГГГГ и ГГГГ-ММ-ДД (ISO 8601)
+    if len(s_date) == 10:
+        if s_date[2] == '.' and s_date[5] == '.':
+            digits = s_date[:2] + s_date[3:5] + s_date[6:]
+            parts = (s_date[6:], s_date[3:5], s_date[:2])
+        elif s_date[4] == '-' and s_date[7] == '-':
+            digits = s_date[:4] + s_date[5:7] + s_date[8:]
+            parts = (s_date[:4], s_date[5:7], s_date[8:])
+        else:
+            digits = None
+        if digits is not None and digits.isdigit():
+            try:
+                return (datetime.date(int(parts[0]), int(parts[1]),
+                                      int(parts[2])), date_format)
+            except ValueError:
+                raise ValueError(DATE_ERROR)
+
+    lst = re.split(DATE_TEMPLATE, s_date)
+    if not lst:
+        raise ValueError(DATE_ERROR)
+
+    # Предполагаем, что значение задано в формате ГГ(ГГ)ММДД
+    if len(lst) == 1:
+        try:
+            date_format = '%Y%m%d' if len(lst[0]) == 8 else '%y%m%d'
+            year, month, day = [int(p) for p in time.strptime(
+                lst[0], date_format)[:3]]
+        except StandardError:
+            raise ValueError(DATE_ERROR)
+    else:
+        try:
+            day, month, year = [int(p) for p in lst]
+        except StandardError:
+            raise ValueError(DATE_ERROR)
+        if len(str(year)) < 4:
+            # преобразование короткого года в полный
+            year += (datetime.date.today().year / 1000) * 1000
+    try:
+        return datetime.date(year, month, day), date_format
+    except StandardError:
+        raise ValueError(DATE_ERROR)
+
+
+def _parse_time(s_time):
+    """ Разбор строки времени
+        :return: (datetime.time, формат для PostgreSQL)
+    """
+    # Быстрый разбор форматов ЧЧ:ММ:СС и ЧЧ:ММ
+    length = len(s_time)
+    if length in (5, 8) and s_time[2] == ':' and \
+            (length == 5 or s_time[5] == ':'):
+        digits = s_time.replace(':', '')
+        if len(digits) == (4 if length == 5 else 6) and digits.isdigit():
+            try:
+                if length == 5:
+                    return (datetime.time(int(digits[:2]), int(digits[2:])),
+                            '%H:%M')
+                return (datetime.time(int(digits[:2]), int(digits[2:4]),
+                                      int(digits[4:])), '%H:%M:%S')
+            except ValueError:
+                raise ValueError(TIME_ERROR)
+
+    lst = re.split(TIME_TEMPLATE, s_time)
+    if not lst:
+        raise ValueError(TIME_ERROR)
+
+    try:
+        lst_time = [int(p) for p in lst]
+    except StandardError:
+        raise ValueError(TIME_ERROR)
+
+    if len(lst_time) == 2:
+        try:
+            return datetime.time(lst_time[0], lst_time[1]), '%H:%M'
+        except StandardError:
+            raise ValueError(TIME_ERROR)
+    elif len(lst_time) == 3:
+        try:
+            return (datetime.time(lst_time[0], lst_time[1], lst_time[2]),
+                    '%H:%M:%S')
+        except StandardError:
+            raise ValueError(TIME_ERROR)
+    raise ValueError(TIME_ERROR)
+
+
+def _parse_datetime(s_datetime, delimiter):
+    """ Разбор строки даты-времени
+        :return: (datetime.datetime, None)
+    """
+    # ГГГГ-ММ-ДД ЧЧ:ММ:СС[.мкс] (ISO 8601, в том числе с разделителем T)
+    if len(s_datetime) >= 19 and s_datetime[4] == '-' and \
+            s_datetime[10] in (delimiter, 'T'):
+        s_date = _parse_date(s_datetime[:10])[0]
+        s_time = _parse_time(s_datetime[11:19])[0]
+        fraction = s_datetime[20:]
+        if s_datetime[19:] and (s_datetime[19] != '.' or len(fraction) > 6
+                                or not fraction.isdigit()):
+            raise ValueError(TIME_ERROR)
+        return datetime.datetime(
+            s_date.year, s_date.month, s_date.day, s_time.hour,
+            s_time.minute, s_time.second,
+            int(fraction.ljust(6, '0')) if fraction else 0), None
+
+    s_date, s_time = s_datetime.split(delimiter)
+    s_date, s_time = _parse_date(s_date)[0], _parse_time(s_time)[0]
+    return datetime.datetime(s_date.year, s_date.month, s_date.day,
+                             s_time.hour, s_time.minute, s_time.second), None
+
+
+def _parse_interval(s_interval):
+    """ Разбор строки интервала
+        :return: (datetime.timedelta, None)
+    """
+    if ":" in s_interval:
+        args = {}
+        parts = ["seconds", "minutes", "hours"]
+        for idx, item in enumerate(s_interval.split(":")[::-1][:3]):
+            args[parts[idx]] = int(item)
+        return datetime.timedelta(**args), None
+
+    args = {}
+    num = INTERVAL_TEMPLATE.search(s_interval)
+    if num:
+        num = num.group()
+        if "{0} week".format(num) in s_interval:
+            args["weeks"] = int(num)
+        elif "{0} day".format(num) in s_interval:
+            args["days"] = int(num)
+        elif "{0} hour".format(num) in s_interval:
+            args["hours"] = int(num)
+        elif "{0} minute".format(num) in s_interval:
+            args["minutes"] = int(num)
+        elif "{0} second".format(num) in s_interval:
+            args["seconds"] = int(num)
+        else:
+            raise ValueError(INTERVAL_ERROR.format(s_interval))
+        return datetime.timedelta(**args), None
+    raise ValueError(INTERVAL_ERROR.format(s_interval))
 
 
 def make_date(s_date, translate=True):
@@ -20,7 +199,6 @@ def make_date(s_date, translate=True):
         :returns datetime.date, если флаг сброшен, иначе строковое представление
             даты для PostgreSQL в формате "ДД.ММ.ГГГГ"
     """
-    err_message = u"Неверный формат даты"
     if not s_date:
         if translate:
             return 'NULL'
@@ -34,30 +212,7 @@ def make_date(s_date, translate=True):
     elif isinstance(s_date, time.struct_time):
         arg = datetime.date(*s_date[:3])
     elif isinstance(s_date, (str, unicode)):
-        lst = re.split(DATE_TEMPLATE, s_date)
-        if not lst:
-            raise ValueError(err_message)
-
-        # Предполагаем, что значение задано в формате ГГ(ГГ)ММДД
-        if len(lst) == 1:
-            try:
-                date_format = '%Y%m%d' if len(lst[0]) == 8 else '%y%m%d'
-                year, month, day = [int(p) for p in time.strptime(
-                    lst[0], date_format)[:3]]
-            except StandardError:
-                raise ValueError(err_message)
-        else:
-            try:
-                day, month, year = [int(p) for p in lst]
-            except StandardError:
-                raise ValueError(err_message)
-            if len(str(year)) < 4:
-                # преобразование короткого года в полный
-                year += (datetime.date.today().year / 1000) * 1000
-        try:
-            arg = datetime.date(year, month, day)
-        except StandardError:
-            raise ValueError(err_message)
+        arg, date_format = _cached('date', _parse_date, s_date)
     else:
         raise TypeError(u"Невозможно получить дату из {0}".format(s_date))
 
@@ -75,7 +230,6 @@ def make_time(s_time, translate=True):
         :returns объект типа datetime.time, если флаг сброшен, или строковое
             представление типа time PostgreSQL в формате ЧЧ:ММ:СС
     """
-    err_message = u"Неверный формат времени"
     if not s_time:
         if translate:
             return 'NULL'
@@ -89,28 +243,7 @@ def make_time(s_time, translate=True):
     elif isinstance(s_time, time.struct_time):
         arg = datetime.time(*s_time[3:6])
     elif isinstance(s_time, (str, unicode)):
-        lst = re.split(TIME_TEMPLATE, s_time)
-        if not lst:
-            raise ValueError(err_message)
-
-        try:
-            lst_time = [int(p) for p in lst]
-        except StandardError:
-            raise ValueError(err_message)
-
-        if len(lst_time) == 2:
-            try:
-                arg = datetime.time(lst_time[0], lst_time[1])
-            except StandardError:
-                raise ValueError(err_message)
-            time_format = '%H:%M'
-        elif len(lst_time) == 3:
-            try:
-                arg = datetime.time(lst_time[0], lst_time[1], lst_time[2])
-            except StandardError:
-                raise ValueError(err_message)
-        else:
-            raise ValueError(err_message)
+        arg, time_format = _cached('time', _parse_time, s_time)
     else:
         raise TypeError(u"Невозможно получить время из {0}".format(s_time))
 
@@ -139,10 +272,7 @@ def make_datetime(s_datetime, translate=True, delimiter=' '):
     elif isinstance(s_datetime, time.struct_time):
         arg = datetime.datetime(*s_datetime[:6])
     elif isinstance(s_datetime, (str, unicode)):
-        s_date, s_time = s_datetime.split(delimiter)
-        s_date, s_time = make_date(s_date, False), make_time(s_time, False)
-        arg = datetime.datetime(s_date.year, s_date.month, s_date.day,
-                                s_time.hour, s_time.minute, s_time.second)
+        arg = _cached('datetime', _parse_datetime, s_datetime, delimiter)[0]
     else:
         raise TypeError(u"Невозможно получить дату-время из {0}".format(
             s_datetime))
@@ -162,7 +292,6 @@ def make_interval(s_interval, translate=True):
         :returns объект типа datetime.timedelta, если флаг сброшен, иначе
             строковое представление типа timedelta PostgreSQL (в секундах)
     """
-    err_message = u"Невозможно получить интервал из {0}"
     if not s_interval:
         if translate:
             return 'NULL'
@@ -173,34 +302,9 @@ def make_interval(s_interval, translate=True):
     elif isinstance(s_interval, int):
         arg = datetime.timedelta(hours=s_interval)
     elif isinstance(s_interval, (str, unicode)):
-        if ":" in s_interval:
-            args = {}
-            parts = ["seconds", "minutes", "hours"]
-            for idx, item in enumerate(s_interval.split(":")[::-1][:3]):
-                args[parts[idx]] = int(item)
-            arg = datetime.timedelta(**args)
-        else:
-            args = {}
-            num = re.search('\d+', s_interval)
-            if num:
-                num = num.group()
-                if "{0} week".format(num) in s_interval:
-                    args["weeks"] = int(num)
-                elif "{0} day".format(num) in s_interval:
-                    args["days"] = int(num)
-                elif "{0} hour".format(num) in s_interval:
-                    args["hours"] = int(num)
-                elif "{0} minute".format(num) in s_interval:
-                    args["minutes"] = int(num)
-                elif "{0} second".format(num) in s_interval:
-                    args["seconds"] = int(num)
-                else:
-                    raise ValueError(err_message.format(s_interval))
-                arg = datetime.timedelta(**args)
-            else:
-                raise ValueError(err_message.format(s_interval))
+        arg = _cached('interval', _parse_interval, s_interval)[0]
     else:
-        raise TypeError(err_message.format(s_interval))
+        raise TypeError(INTERVAL_ERROR.format(s_interval))
 
     if translate:
         return "{0} second".format(int(arg.total_seconds()))
@@ -9,13 +9,26 @@ import re
 import uuid
 import json
 
-from base_translators import PgTranslator, PgSizedTranslator
+from base_translators import MUTABLE, PgTranslator, PgSizedTranslator
 from misc import make_date, make_time, make_datetime, make_interval
 
 SAVE_TEMPLATE = re.compile("""[\\\\/;'"`$#]+""")
 ARRAY_TEMPLATE = re.compile("[\\{|\\}]")
 
 
+def _bulk_integer(low, high):
+    """ Преобразование элементов массива PgBulkArray для целых чисел.
+        Значения других типов и вне диапазона [low, high] отклоняются
+        (ValueError) и проверяются _validate класса преобразования
+    """
+    def bulk(value):
+        if isinstance(value, bool) or not isinstance(value, (int, long)) \
+                or not low <= value <= high:
+            raise ValueError(value)
+        return value
+    return staticmethod(bulk)
+
+
 class Bool(PgTranslator):
     """ Преобразование булевых значений """
     pg_pattern = '{0}::boolean'
@@ -26,6 +39,9 @@ class Bool(PgTranslator):
             return 'NULL::boolean'
         return "{0}".format(str(value).upper() in self.pattern)
 
+    def _raw(self, value):
+        return 'true' if str(value).upper() in self.pattern else 'false'
+
 
 class Int2(PgTranslator):
     """ Преобразование малых целых чисел """
@@ -45,6 +61,8 @@ class Int2(PgTranslator):
 class Int4(PgTranslator):
     """ Преобразование целых чисел """
     pg_pattern = '{0}::int4'
+    # Преобразование элементов массива PgBulkArray
+    bulk = _bulk_integer(-2 ** 31, 2 ** 31 - 1)
 
     def _validate(self, value):
         if not self.is_null(value):
@@ -53,10 +71,14 @@ class Int4(PgTranslator):
             except Exception as err:
                 raise ValueError(err.message)
 
+            if not -2 ** 31 <= int(value) < 2 ** 31:
+                raise ValueError(u"Целое должно быть в диапазоне int4")
+
 
 class Int8(PgTranslator):
     """ Преобразование больших целых чисел """
     pg_pattern = '{0}::int8'
+    bulk = _bulk_integer(-2 ** 63, 2 ** 63 - 1)
 
     def _validate(self, value):
         if not self.is_null(value):
@@ -65,6 +87,9 @@ class Int8(PgTranslator):
             except Exception as err:
                 raise ValueError(err.message)
 
+            if not -2 ** 63 <= int(value) < 2 ** 63:
+                raise ValueError(u"Большое целое должно быть в диапазоне int8")
+
 
 class FloatNumeric(PgSizedTranslator):
     """ Преобразование float в numeric """
@@ -112,89 +137,75 @@ class DecimalDouble(DecimalNumeric):
     pg_pattern = '{0}::double'
 
 
-class Date(PgTranslator):
-    """ Преобразование даты в тип date.
-        Дата может быть представлена объектом типа datetime.date,
-        временным кортежем или строкой
+class Formatted(PgTranslator):
+    """ Базовый класс значений, передаваемых строкой в кавычках.
+        Строка строится функцией format_value один раз при проверке
+        значения и используется при построении литерала и в raw().
+        Строка значения изменяемого типа (MUTABLE) не сохраняется
+        и строится заново при каждом обращении
     """
-    pg_pattern = "{0}::date"
+    # Функция построения строкового представления значения
+    format_value = None
+    # Последнее проверенное значение и его строковое представление
+    __formatted = (None, None)
 
     def _validate(self, value):
         try:
-            make_date(value)
+            text = self.format_value(value)
         except Exception as err:
             raise ValueError(err.message)
+        if not isinstance(value, MUTABLE):
+            self.__formatted = (value, text)
 
     def _translate(self, value):
         if self.is_null(value):
-            date = 'NULL'
+            text = 'NULL'
         else:
-            date = "'{0}'".format(make_date(value))
-        return self.pg_pattern.format(date)
+            text = "'{0}'".format(self._raw(value))
+        return self.pg_pattern.format(text)
+
+    def _raw(self, value):
+        checked, text = self.__formatted
+        if checked is value:
+            return text
+        return self.format_value(value)
+
+
+class Date(Formatted):
+    """ Преобразование даты в тип date.
+        Дата может быть представлена объектом типа datetime.date,
+        временным кортежем или строкой
+    """
+    pg_pattern = "{0}::date"
+    format_value = staticmethod(make_date)
 
 
-class Time(PgTranslator):
+class Time(Formatted):
     """ Преобразование времени в тип time.
         Время может быть представлено в виде объекта типа datetime.time,
         временного кортежа или строки
     """
     pg_pattern = "{0}::time"
+    format_value = staticmethod(make_time)
 
-    def _validate(self, value):
-        try:
-            make_time(value)
-        except Exception as err:
-            raise ValueError(err.message)
-
-    def _translate(self, value):
-        if self.is_null(value):
-            time = 'NULL'
-        else:
-            time = "'{0}'".format(make_time(value))
-        return self.pg_pattern.format(time)
 
-
-class DateTime(PgTranslator):
+class DateTime(Formatted):
     """ Преобразование даты и времени в timestamp.
         Значение может быть задано объектом типа datetime.datetime,
         временным кортежем или строкой
     """
     pg_pattern = "{0}::timestamp"
+    format_value = staticmethod(make_datetime)
 
-    def _validate(self, value):
-        try:
-            make_datetime(value)
-        except Exception as err:
-            raise ValueError(err.message)
 
-    def _translate(self, value):
-        if self.is_null(value):
-            datetime = 'NULL'
-        else:
-            datetime = "'{0}'".format(make_datetime(value))
-        return self.pg_pattern.format(datetime)
-
-
-class Interval(PgTranslator):
+class Interval(Formatted):
     """ Преобразование временного интервала в тип interval
         Значение может быть задано объектом datetime.timedelta, числом,
         обозначающим количество часов,
         либо строкой с указанием часов, минут и секунд, разделенных символом ':'
     """
     pg_pattern = "{0}::interval"
-
-    def _validate(self, value):
-        try:
-            make_interval(value)
-        except Exception as err:
-            raise ValueError(err.message)
-
-    def _translate(self, value):
-        if self.is_null(value):
-            interval = 'NULL'
-        else:
-            interval = "'{0}'".format(make_interval(value))
-        return self.pg_pattern.format(interval)
+    format_value = staticmethod(make_interval)
 
 
 class String(PgSizedTranslator):
@@ -283,9 +294,10 @@ class GUID(PgTranslator):
         return self.pg_pattern.format(value)
 
 
-class JSON(PgTranslator):
+class JSON(Formatted):
     """ Преобразование словаря в тип jsonb """
     pg_pattern = "{0}::jsonb"
+    format_value = staticmethod(json.dumps)
 
     def __init__(self, value):
         if not self.is_null(value):
@@ -295,10 +307,3 @@ class JSON(PgTranslator):
                 except Exception as err:
                     raise ValueError(err)
         super(JSON, self).__init__(value)
-
-    def _translate(self, value):
-        if self.is_null(value):
-            value = 'NULL'
-        else:
-            value = "'{0}'".format(json.dumps(value))
-        return self.pg_pattern.format(value)
@@ -5,6 +5,7 @@
     Профильные классы для форматирования результатов запроса
 """
 from decimal import Decimal
+import datetime
 import uuid
 import json
 
@@ -14,6 +15,7 @@ from base_translators import PtnTranslator
 
 class AsBool(PtnTranslator):
     """ Преобразование булевых значений """
+    passthrough = (type(None), bool)
     pattern = "TRUE1"
 
     def cast(self, value):
@@ -24,6 +26,11 @@ class AsBool(PtnTranslator):
 
 class AsInt2(PtnTranslator):
     """ Короткое целое """
+    passthrough = (type(None), int)
+    # Встроенное преобразование, равносильное полному для принимаемых им
+    # значений
+    fast_cast = int
+
     def _validate(self, value):
         if value is not None:
             return int(value)
@@ -31,6 +38,21 @@ class AsInt2(PtnTranslator):
     def cast(self, value):
         return int(value) if value is not None else None
 
+    @classmethod
+    def caster(cls):
+        """ Функция преобразования значения. Значения, которые принимает
+            встроенный конструктор, преобразуются им напрямую
+        """
+        slow = super(AsInt2, cls).caster()
+        fast = cls.fast_cast
+
+        def caster(value):
+            try:
+                return fast(value)
+            except (TypeError, ValueError):
+                return slow(value)
+        return caster
+
 
 class AsInt4(AsInt2):
     """ Целое """
@@ -38,6 +60,9 @@ class AsInt4(AsInt2):
 
 class AsInt8(AsInt2):
     """ Длинное целое """
+    passthrough = (type(None), long)
+    fast_cast = long
+
     def _validate(self, value):
         if value is not None:
             return long(value)
@@ -48,6 +73,8 @@ class AsInt8(AsInt2):
 
 class AsFloat(PtnTranslator):
     """ Преобразование во float """
+    passthrough = (type(None), float)
+
     def _set_value(self, val):
         val = super(AsFloat, self)._set_value(val)
         if val is not None:
@@ -68,6 +95,8 @@ class AsFloat(PtnTranslator):
 
 class AsDecimal(PtnTranslator):
     """ Преобразование в Decimal """
+    passthrough = (type(None), Decimal)
+
     def _set_value(self, val):
         val = super(AsDecimal, self)._set_value(val)
         if val is not None:
@@ -86,6 +115,8 @@ class AsDecimal(PtnTranslator):
 
 class AsDate(PtnTranslator):
     """ Преобразование в datetime.date """
+    passthrough = (type(None), datetime.date)
+
     def _validate(self, value):
         return make_date(value)
 
@@ -108,6 +139,8 @@ class AsTime(PtnTranslator):
 
 class AsDateTime(PtnTranslator):
     """ Преобразование в datetime.datetime """
+    passthrough = (type(None), datetime.datetime)
+
     def _validate(self, value):
         return make_datetime(value)
 
@@ -130,6 +163,8 @@ class AsInterval(PtnTranslator):
 
 class AsUnicode(PtnTranslator):
     """ Преобразование в юникод с возможностью ограничения по длине """
+    passthrough = (type(None), unicode)
+
     def _translate(self, value):
         return value
 
@@ -145,6 +180,8 @@ class AsUnicode(PtnTranslator):
 
 class AsString(AsUnicode):
     """ Преобразование в строку с возможностью ограничения по длине """
+    passthrough = (type(None), str)
+
     def _translate(self, value):
         return value
 
@@ -160,6 +197,8 @@ class AsString(AsUnicode):
 
 class AsGUID(PtnTranslator):
     """ Преобразование в uuid """
+    passthrough = (type(None), uuid.UUID)
+
     def _validate(self, value):
         if value is not None:
             return uuid.UUID('{%s}' % value)
@@ -172,6 +211,8 @@ class AsGUID(PtnTranslator):
 
 class AsJSON(PtnTranslator):
     """ Преобразование в словарь """
+    passthrough = (type(None), dict)
+
     def _translate(self, value):
         return value
 